@@ -29,6 +29,9 @@ def with_attributes(
         heartbeat_timeout=settings.ACTIVITY_HEARTBEAT_TIMEOUT,
         idempotent=None,
         meta=None,
+        cacheable=False,
+        cache_ttl=None,
+        inline=False,
 ):
     """
     Decorator: wrap a function/class into an Activity.
@@ -55,6 +58,16 @@ def with_attributes(
     :type idempotent: Optional[bool]
     :param meta:
     :type meta: str
+    :param cacheable: True if the result only depends on the arguments, and
+        can be reused by other executions (see `simpleflow.result_cache`).
+    :type cacheable: bool
+    :param cache_ttl: maximum age of a reused result in seconds, defaults to
+        SIMPLEFLOW_ACTIVITY_CACHE_TTL.
+    :type cache_ttl: Optional[int]
+    :param inline: True if the activity is quick and has small arguments and
+        result: the SWF decider executes it itself (see
+        `simpleflow.swf.executor.Executor.resume_inline`).
+    :type inline: bool
     :rtype: () -> Activity[()]
 
     """
@@ -70,6 +83,9 @@ def with_attributes(
             task_priority=task_priority,
             idempotent=idempotent,
             meta=meta,
+            cacheable=cacheable,
+            cache_ttl=cache_ttl,
+            inline=inline,
         )
 
     return wrap
@@ -88,7 +104,10 @@ class Activity(object):
                  heartbeat_timeout=None,
                  task_priority=PRIORITY_NOT_SET,
                  idempotent=None,
-                 meta=None):
+                 meta=None,
+                 cacheable=False,
+                 cache_ttl=None,
+                 inline=False):
         self._callable = callable
 
         self._name = name
@@ -103,6 +122,9 @@ class Activity(object):
         self.task_schedule_to_start_timeout = schedule_to_start_timeout
         self.task_heartbeat_timeout = heartbeat_timeout
         self.meta = meta if meta is not None else {}
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+        self.inline = inline
 
         self.register()
 
@@ -27,6 +27,7 @@ from simpleflow.swf import helpers
 from simpleflow.swf.constants import VALID_PROCESS_MODES
 from simpleflow.swf.process import decider, worker
 from simpleflow.swf.task import ActivityTask
+from simpleflow.swf.archive import HistoryArchive, get_history
 from simpleflow.swf.utils import get_workflow_execution
 from simpleflow.utils import json_dumps
 
@@ -144,6 +145,12 @@ def transform_input(wf_input):
 @click.option('--local', default=False, is_flag=True,
               required=False,
               help='Run the workflow locally without calling Amazon SWF.')
+@click.option('--local-workers', type=int,
+              required=False,
+              help='With --local, number of activities run concurrently.')
+@click.option('--local-pool', type=click.Choice(['thread', 'process']),
+              required=False,
+              help='With --local, run activities in processes (default) or threads.')
 @click.option('--input', '-i',
               required=False,
               help='JSON input of the workflow.')
@@ -181,7 +188,9 @@ def start_workflow(workflow,
                    decision_tasks_timeout,
                    input,
                    input_file,
-                   local):
+                   local,
+                   local_workers,
+                   local_pool):
     workflow_class = get_workflow(workflow)
 
     wf_input = {}
@@ -191,7 +200,7 @@ def start_workflow(workflow,
     if local:
         from .local import Executor
 
-        Executor(workflow_class).run(wf_input)
+        Executor(workflow_class, max_workers=local_workers, pool=local_pool).run(wf_input)
 
         return
 
@@ -260,6 +269,20 @@ def with_format(ctx):
     )
 
 
+def print_with_format(ctx, func, *args, **kwargs):
+    """
+    Print the output of a `pretty` function. CSV and TSV rows are printed as
+    soon as they are available, other formats once all rows are.
+    """
+    fmt = ctx.parent.params['format']
+    if fmt not in pretty.STREAMED_FORMATS:
+        print(with_format(ctx)(func)(*args, **kwargs))
+        return
+    for chunk in pretty.streamed(fmt)(func)(*args, **kwargs):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+
 @click.argument('run_id', required=False)
 @click.argument('workflow_id')
 @click.argument('domain',
@@ -318,10 +341,12 @@ def status(ctx, domain, workflow_id, run_id, nb_tasks):
 @click.option('--status', '-s', default='open', show_default=True, type=click.Choice(['open', 'closed']),
               help='Open/Closed')
 @click.option('--started-since', '-d', default=30, show_default=True, help='Started since N days.')
+@click.option('--max-workers', '-w', default=1, show_default=True,
+              help='Number of time ranges listed concurrently.')
 @click.pass_context
-def list_workflows(ctx, domain, status, started_since):
-    print(with_format(ctx)(helpers.list_workflow_executions)(domain, status=status.upper(),
-                                                             start_oldest_date=started_since))
+def list_workflows(ctx, domain, status, started_since, max_workers):
+    print_with_format(ctx, helpers.list_workflow_executions, domain, status=status.upper(),
+                      start_oldest_date=started_since, max_workers=max_workers)
 
 
 @click.argument('domain',
@@ -336,23 +361,59 @@ def list_workflows(ctx, domain, status, started_since):
 @click.option('--workflow-type-name', default=None, help='Workflow Name.')
 @click.option('--workflow-type-version', default=None, help='Workflow Version (name needed).')
 @click.option('--started-since', '-d', default=30, show_default=True, help='Started since N days.')
+@click.option('--max-workers', '-w', default=1, show_default=True,
+              help='Number of time ranges listed concurrently.')
 @click.pass_context
 def filter_workflows(ctx, domain, status, tag,
                      workflow_id, workflow_type_name,
-                     workflow_type_version, started_since):
+                     workflow_type_version, started_since, max_workers):
+    status = status.upper()
+    kwargs = {}
+    if status == swf.models.workflow.WorkflowExecution.STATUS_OPEN:
+        kwargs['oldest_date'] = started_since
+    else:
+        kwargs['start_oldest_date'] = started_since
+    print_with_format(ctx, helpers.filter_workflow_executions, domain, status=status.upper(),
+                      tag=tag,
+                      workflow_id=workflow_id,
+                      workflow_type_name=workflow_type_name,
+                      workflow_type_version=workflow_type_version,
+                      max_workers=max_workers,
+                      **kwargs)
+
+
+@click.argument('domain',
+                envvar='SWF_DOMAIN',
+                )
+@cli.command('workflow.profile_many',
+             help='Aggregated task timings (percentiles, failure and retry rates) of filtered executions.')
+@click.option('--status', '-s', default='closed', show_default=True, type=click.Choice(['open', 'closed']),
+              help='Open/Closed')
+@click.option('--tag', default=None, help='Tag.')
+@click.option('--workflow-id', default=None, help='Workflow ID.')
+@click.option('--workflow-type-name', default=None, help='Workflow Name.')
+@click.option('--workflow-type-version', default=None, help='Workflow Version (name needed).')
+@click.option('--started-since', '-d', default=30, show_default=True, help='Started since N days.')
+@click.option('--max-workers', '-w', default=8, show_default=True,
+              help='Number of histories fetched concurrently.')
+@click.pass_context
+def profile_many(ctx, domain, status, tag,
+                 workflow_id, workflow_type_name,
+                 workflow_type_version, started_since, max_workers):
     status = status.upper()
     kwargs = {}
     if status == swf.models.workflow.WorkflowExecution.STATUS_OPEN:
         kwargs['oldest_date'] = started_since
     else:
         kwargs['start_oldest_date'] = started_since
-    print(with_format(ctx)(helpers.filter_workflow_executions)(domain, status=status.upper(),
-                                                               tag=tag,
-                                                               workflow_id=workflow_id,
-                                                               workflow_type_name=workflow_type_name,
-                                                               workflow_type_version=workflow_type_version,
-                                                               **kwargs
-                                                               ))
+    print(with_format(ctx)(helpers.show_workflows_profile)(domain, status=status,
+                                                           tag=tag,
+                                                           workflow_id=workflow_id,
+                                                           workflow_type_name=workflow_type_name,
+                                                           workflow_type_version=workflow_type_version,
+                                                           max_workers=max_workers,
+                                                           **kwargs
+                                                           ))
 
 
 @click.argument('task_id')
@@ -370,6 +431,48 @@ def task_info(ctx, domain, workflow_id, task_id, details):
     print(with_format(ctx)(helpers.get_task)(domain, workflow_id, task_id, details))
 
 
+@click.option('--started-since', '-d', default=1, show_default=True,
+              help='Without WORKFLOW_ID, prefetch executions started since N days.')
+@click.argument('run_id', required=False)
+@click.argument('workflow_id', required=False)
+@click.argument('domain',
+                envvar='SWF_DOMAIN',
+                )
+@cli.command('history.prefetch', help='Store histories of closed executions in the local archive.')
+def history_prefetch(domain, workflow_id, run_id, started_since):
+    archive = HistoryArchive()
+    if workflow_id:
+        executions = [helpers.get_workflow_execution(domain, workflow_id, run_id)]
+    else:
+        query = swf.querysets.WorkflowExecutionQuerySet(swf.models.Domain(domain))
+        executions = query.filter(
+            status=swf.models.WorkflowExecution.STATUS_CLOSED,
+            start_oldest_date=started_since,
+        )
+    nb_archived = 0
+    for execution in executions:
+        if execution.status != execution.STATUS_CLOSED:
+            logger.warning('skipping execution workflow_id={} run_id={}: not closed'.format(
+                execution.workflow_id, execution.run_id))
+            continue
+        get_history(execution, archive=archive)
+        nb_archived += 1
+    print('{} histories archived in {} ({} bytes)'.format(nb_archived, archive.directory, archive.size()))
+
+
+@click.option('--max-size', type=int,
+              help='Evict least recently used histories until the archive fits in this number of bytes '
+                   '(defaults to SIMPLEFLOW_HISTORY_ARCHIVE_MAX_SIZE; 0 empties the archive).')
+@cli.command('history.prune', help='Evict histories from the local archive.')
+def history_prune(max_size):
+    archive = HistoryArchive()
+    nb_evicted = archive.prune(max_size)
+    print('{} histories evicted from {} ({} bytes left)'.format(nb_evicted, archive.directory, archive.size()))
+
+
+@click.option('--max-processes', type=int,
+              help='Autoscale between --nb-processes (or 1) and this number of processes, '
+                   'depending on the number of pending decision tasks.')
 @click.option('--nb-processes', '-N', type=int)
 @click.option('--log-level', '-l')
 @click.option('--task-list')
@@ -379,7 +482,7 @@ def task_info(ctx, domain, workflow_id, task_id, details):
               help='SWF Domain')
 @click.argument('workflows', nargs=-1, required=True)
 @cli.command('decider.start', help='Start a decider process to manage workflow executions.')
-def start_decider(workflows, domain, task_list, log_level, nb_processes):
+def start_decider(workflows, domain, task_list, log_level, nb_processes, max_processes):
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
@@ -390,6 +493,7 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
         task_list,
         None,
         nb_processes,
+        max_processes=max_processes,
     )
 
 
@@ -409,6 +513,12 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
               required=False,
               default=60,
               help='Heartbeat interval in seconds (0 to disable heartbeating).')
+@click.option('--preload',
+              envvar='SIMPLEFLOW_PRELOAD_MODULES',
+              help='Comma-separated list of activity modules to import before forking processes.')
+@click.option('--max-processes', type=int,
+              help='Autoscale between --nb-processes (or 1) and this number of processes, '
+                   'depending on the number of pending activity tasks.')
 @click.option('--nb-processes', '-N', type=int)
 @click.option('--log-level', '-l')
 @click.option('--task-list')
@@ -417,7 +527,8 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
               required=True,
               help='SWF Domain')
 @cli.command('worker.start', help='Start a worker process to handle activity tasks.')
-def start_worker(domain, task_list, log_level, nb_processes, heartbeat, one_task, process_mode, poll_data):
+def start_worker(domain, task_list, log_level, nb_processes, max_processes, preload, heartbeat, one_task,
+                 process_mode, poll_data):
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
@@ -439,6 +550,8 @@ def start_worker(domain, task_list, log_level, nb_processes, heartbeat, one_task
         one_task,
         process_mode,
         poll_data,
+        max_processes=max_processes,
+        preload_modules=[m.strip() for m in preload.split(',') if m.strip()] if preload else None,
     )
 
 
@@ -551,7 +664,7 @@ def standalone(context,
             'workflow_id={} run_id={}'.format(domain, repair, repair_run_id)
         )
         workflow_execution = get_workflow_execution(domain, repair, run_id=repair_run_id)
-        previous_history = History(workflow_execution.history())
+        previous_history = History(get_history(workflow_execution))
         repair_run_id = workflow_execution.run_id
         previous_history.parse()
         # get the previous execution input if none passed
@@ -681,7 +794,7 @@ def activity_rerun(domain,
     logger.info("Found execution: workflowId={} runId={}".format(wfe.workflow_id, wfe.run_id))
 
     # now rerun the specified activity
-    history = History(wfe.history())
+    history = History(get_history(wfe))
     history.parse()
     task, args, kwargs, meta, params = helpers.find_activity(
         history, scheduled_id=scheduled_id, activity_id=activity_id, input=input_override,
@@ -741,10 +854,4 @@ def info(sections):
 @cli.command("binaries.download", help="Downloads some binaries with simpleflow.download module. "
                                        "It expects a list of locations as <binary>=<s3_location> arguments.")
 def binaries_download(locations):
-    pool = multiprocessing.Pool(5)
-    pool.map(_download_binary, locations)
-
-
-def _download_binary(spec):
-    progname, location = spec.split("=", 2)
-    download_binaries({progname: location})
+    download_binaries(dict(spec.split("=", 1) for spec in locations))
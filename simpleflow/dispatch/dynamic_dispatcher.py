@@ -1,11 +1,37 @@
 # -*- coding: utf-8 -*-
 import importlib
+import time
 
+from simpleflow import logger
 from simpleflow.activity import Activity
 
 from .exceptions import DispatchError
 
 
+# Activities resolved by name. It's a module-level dict so it's filled once in
+# the poller (see `preload()`) then inherited by forked children.
+_activities = {}
+
+
+def _resolve_activity(name):
+    module_name, activity_name = name.rsplit('.', 1)
+    module = importlib.import_module(module_name)
+    activity = getattr(module, activity_name, None)
+    if not activity:
+        # We were not able to import a function at all.
+        raise DispatchError("unable to import '{}'".format(name))
+    if not isinstance(activity, Activity):
+        # We managed to import a function (or callable) but it's not an
+        # "Activity". We will transform it into an Activity now. That way
+        # we can accept functions that are *not* decorated with
+        # "@activity.with_attributes()" or equivalent. This dispatcher is
+        # used in the context of an activity worker, so we don't actually
+        # care if the task is decorated or not. We only need the decorated
+        # function for the decider (options to schedule, retry, fail, etc.).
+        activity = Activity(activity, activity_name)
+    return activity
+
+
 class Dispatcher(object):
     """
     Dispatch by name, like simpleflow.swf.process.worker.dispatch.by_module.ModuleDispatcher
@@ -21,19 +47,35 @@ class Dispatcher(object):
         :rtype: Activity
         :raise DispatchError: if doesn't exist or not an activity
         """
-        module_name, activity_name = name.rsplit('.', 1)
-        module = importlib.import_module(module_name)
-        activity = getattr(module, activity_name, None)
-        if not activity:
-            # We were not able to import a function at all.
-            raise DispatchError("unable to import '{}'".format(name))
-        if not isinstance(activity, Activity):
-            # We managed to import a function (or callable) but it's not an
-            # "Activity". We will transform it into an Activity now. That way
-            # we can accept functions that are *not* decorated with
-            # "@activity.with_attributes()" or equivalent. This dispatcher is
-            # used in the context of an activity worker, so we don't actually
-            # care if the task is decorated or not. We only need the decorated
-            # function for the decider (options to schedule, retry, fail, etc.).
-            activity = Activity(activity, activity_name)
+        activity = _activities.get(name)
+        if activity is None:
+            activity = _resolve_activity(name)
+            _activities[name] = activity
         return activity
+
+
+def preload(module_names):
+    """
+    Import activity modules and memoize the activities they define, typically
+    in the worker before it forks so children get them for free.
+
+    :param module_names: names of the modules to import
+    :type module_names: list[str]
+    :return: number of modules, number of activities and time spent
+    :rtype: dict
+    """
+    start = time.time()
+    nb_activities = 0
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for attr, value in vars(module).items():
+            if isinstance(value, Activity):
+                _activities['{}.{}'.format(module_name, attr)] = value
+                nb_activities += 1
+    stats = {
+        'modules': len(module_names),
+        'activities': nb_activities,
+        'duration': time.time() - start,
+    }
+    logger.info('preloaded {modules} modules ({activities} activities) in {duration:.3f}s'.format(**stats))
+    return stats
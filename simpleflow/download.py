@@ -2,12 +2,26 @@ import errno
 import functools
 import hashlib
 import os
+import re
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
 
 from lockfile import FileLock
 
-from simpleflow import logger
+from simpleflow import logger, settings, storage
 from simpleflow.settings import SIMPLEFLOW_BINARIES_DIRECTORY
-from simpleflow.storage import pull
+
+# Binaries are stored once per content in this directory, then linked in the
+# directory of each (name, remote location).
+CACHE_DIRECTORY = os.path.join(SIMPLEFLOW_BINARIES_DIRECTORY, '.objects')
+
+# An S3 etag is the MD5 of the object, unless it was uploaded in parts
+MD5_ETAG = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ChecksumError(Exception):
+    pass
 
 
 class RemoteBinary(object):
@@ -21,7 +35,8 @@ class RemoteBinary(object):
         """
         :param name: name of the binary to be downloaded
         :type  name: str
-        :param remote_location: remote location where to download the binary from (only S3 for now)
+        :param remote_location: remote location where to download the binary from (only S3 for now),
+                                optionally followed by its checksum: "s3://bucket/path#sha256=<hex digest>"
         :type  remote_location: str
         """
         self.name = name
@@ -29,6 +44,9 @@ class RemoteBinary(object):
         # limit ourselves to S3 for now
         assert remote_location.startswith("s3://")
         self.remote_location = remote_location
+        url, _, fragment = remote_location.partition("#")
+        self.bucket, self.path = url.replace("s3://", "", 1).split("/", 1)
+        self.sha256 = fragment[len("sha256="):].lower() if fragment.startswith("sha256=") else None
         self.local_directory = self._compute_local_directory()
         self.local_location = self._compute_local_location()
         self.lock_location = self._compute_lock_location()
@@ -62,18 +80,109 @@ class RemoteBinary(object):
         return os.access(self.local_location, os.X_OK)
 
     def _download_binary(self):
-        logger.info("Downloading binary: {} -> {}".format(self.remote_location, self.local_location))
-        bucket, path = self.remote_location.replace("s3://", "", 1).split("/", 1)
-        # with FileLock(dest):
-        pull(bucket, path, self.local_location)
-        os.chmod(self.local_location, 0o755)
+        key = storage.get_key(self.bucket, self.path, new_connection=True)
+        if key is None:
+            raise ValueError("binary not found: {}".format(self.remote_location))
+        etag = key.etag.strip('"')
+        if self.sha256:
+            content_id = "sha256-{}".format(self.sha256)
+        else:
+            content_id = "etag-{}".format(re.sub(r'[^\w-]', '_', etag))
+        cached_location = os.path.join(CACHE_DIRECTORY, content_id)
+
+        if not os.path.exists(cached_location):
+            logger.info("Downloading binary: {} -> {}".format(self.remote_location, cached_location))
+            self._mkdir_p(CACHE_DIRECTORY)
+            fd, tmp_location = tempfile.mkstemp(dir=CACHE_DIRECTORY, prefix=".{}-".format(content_id))
+            os.close(fd)
+            try:
+                download_object(self.bucket, self.path, tmp_location, key.size, key.etag)
+                self._verify(tmp_location, key.size, etag)
+                os.chmod(tmp_location, 0o755)
+                # atomic: concurrent downloads of the same content are harmless
+                os.rename(tmp_location, cached_location)
+            except BaseException:
+                os.unlink(tmp_location)
+                raise
+
+        logger.info("Linking binary: {} -> {}".format(cached_location, self.local_location))
+        if os.path.lexists(self.local_location):
+            os.unlink(self.local_location)
+        try:
+            os.link(cached_location, self.local_location)
+        except OSError:
+            shutil.copy2(cached_location, self.local_location)
+
+    def _verify(self, location, size, etag):
+        if os.path.getsize(location) != size:
+            raise ChecksumError("{}: expected {} bytes, got {}".format(
+                self.remote_location, size, os.path.getsize(location)))
+        if self.sha256:
+            expected, actual = self.sha256, file_digest(location, hashlib.sha256)
+        elif MD5_ETAG.match(etag):
+            expected, actual = etag, file_digest(location, hashlib.md5)
+        else:
+            return
+        if expected != actual:
+            raise ChecksumError("{}: expected checksum {}, got {}".format(self.remote_location, expected, actual))
+
+
+def file_digest(location, algorithm):
+    digest = algorithm()
+    with open(location, "rb") as f:
+        for chunk in iter(functools.partial(f.read, 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_object(bucket, path, dest_file, size, etag=None):
+    """
+    Download an S3 object. Objects larger than SIMPLEFLOW_BINARIES_PART_SIZE
+    are downloaded in parts, by concurrent ranged GETs.
+
+    :param size: size of the object, in bytes
+    :type  size: int
+    :param etag: etag of the object; if it changes during the download,
+                 storage.ObjectChangedError is raised instead of mixing parts
+                 of several versions.
+    :type  etag: Optional[str]
+    """
+    part_size = settings.SIMPLEFLOW_BINARIES_PART_SIZE
+    with open(dest_file, "wb") as f:
+        f.truncate(size)
+    if size <= part_size:
+        if size:
+            storage.pull_range(bucket, path, dest_file, 0, size - 1, etag)
+        return
+
+    ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+    pool = ThreadPool(min(settings.SIMPLEFLOW_BINARIES_DOWNLOAD_WORKERS, len(ranges)))
+    try:
+        pool.map(lambda bounds: storage.pull_range(bucket, path, dest_file, bounds[0], bounds[1], etag), ranges)
+    finally:
+        pool.terminate()
 
 
 # convenience helpers
 def download_binaries(binaries_map):
-    for binary, remote_location in binaries_map.items():
-        binary = RemoteBinary(binary, remote_location)
-        binary.download()
+    """
+    Download the missing binaries concurrently, then prepend their directories
+    to $PATH.
+
+    :param binaries_map: remote locations by binary name
+    :type  binaries_map: dict[str, str]
+    """
+    binaries = [RemoteBinary(binary, remote_location) for binary, remote_location in binaries_map.items()]
+    if len(binaries) > 1:
+        pool = ThreadPool(min(settings.SIMPLEFLOW_BINARIES_DOWNLOAD_WORKERS, len(binaries)))
+        try:
+            pool.map(RemoteBinary.download, binaries)
+        finally:
+            pool.terminate()
+    else:
+        for binary in binaries:
+            binary.download()
+    for binary in binaries:
         os.environ["PATH"] = binary.local_directory + ":" + os.environ["PATH"]
 
 
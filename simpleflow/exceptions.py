@@ -2,6 +2,19 @@ class ExecutionBlocked(Exception):
     pass
 
 
+class ContinueAsNew(Exception):
+    """
+    Close the execution and start a new run of the workflow, with an empty
+    history.
+
+    :ivar input: input of the new run, ``{"args": [...], "kwargs": {...}}``
+    :type input: dict
+    """
+    def __init__(self, input):
+        self.input = input
+        super(ContinueAsNew, self).__init__(input)
+
+
 class TaskException(Exception):
     """
     Wrap an exception raised by a task.
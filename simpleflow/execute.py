@@ -1,9 +1,13 @@
 from __future__ import absolute_import, print_function
 
+import atexit
 import errno
 import os
+import select
+import struct
 import sys
 import json
+import threading
 
 import time
 from typing import TYPE_CHECKING
@@ -24,7 +28,7 @@ from builtins import map
 
 from future.utils import iteritems
 
-from simpleflow import compat, format
+from simpleflow import compat, format, logging_context, settings
 from simpleflow import logger as simpleflow_logger
 from simpleflow.exceptions import ExecutionError, ExecutionTimeoutError
 from simpleflow.utils import json_dumps
@@ -36,6 +40,9 @@ if TYPE_CHECKING:
 
 MAX_ARGUMENTS_JSON_LENGTH = 65536
 
+# Number of calls after which a persistent interpreter is recycled
+DEFAULT_PERSISTENT_MAX_CALLS = 100
+
 
 __all__ = ['program', 'python']
 
@@ -189,7 +196,8 @@ def wait_subprocess(process, timeout=None, command_info=None):
     return process.wait()
 
 
-def python(interpreter='python', logger_name=__name__, timeout=None, kill_children=False):
+def python(interpreter='python', logger_name=__name__, timeout=None, kill_children=False,
+           persistent=False, max_calls=DEFAULT_PERSISTENT_MAX_CALLS):
     """
     Execute a callable as an external Python program.
 
@@ -198,21 +206,43 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
 
     Arguments of the decorated callable must be serializable in JSON.
 
+    With ``persistent=True``, calls are sent to a long-lived interpreter taken
+    from a process-local pool (see :class:`InterpreterPool`) instead of
+    starting a new one each time, saving the interpreter startup and module
+    imports. Interpreters are recycled after an error, a timeout, or
+    ``max_calls`` calls.
+
+    The decorated callable has an ``encoded`` attribute returning the result
+    as a :class:`simpleflow.format.EncodedJSON`, skipping the decoding.
+
     """
 
     def wrap_callable(func):
-        @functools.wraps(func)
-        def execute(*args, **kwargs):
-            logger = logging.getLogger(logger_name)
+        def run(*args, **kwargs):
+            """
+            Execute the callable and return its raw JSON-encoded result.
+
+            :rtype: bytes
+            """
             command = 'simpleflow.execute'  # name of a module.
             sys.stdout.flush()
             sys.stderr.flush()
-            result_str = None  # useless
             context = kwargs.pop('context', {})
-            with tempfile.TemporaryFile() as result_fd, tempfile.TemporaryFile() as error_fd:
+            arguments_json = format_arguments_json(*args, **kwargs)
+            if persistent:
+                return interpreter_pool.execute(
+                    interpreter,
+                    get_name(func),
+                    arguments_json,
+                    context=context,
+                    logger_name=logger_name,
+                    kill_children=kill_children,
+                    timeout=timeout,
+                    max_calls=max_calls,
+                )
+            with anonymous_file('result') as result_fd, anonymous_file('error') as error_fd:
                 dup_result_fd = os.dup(result_fd.fileno())  # remove FD_CLOEXEC
                 dup_error_fd = os.dup(error_fd.fileno())  # remove FD_CLOEXEC
-                arguments_json = format_arguments_json(*args, **kwargs)
                 full_command = [
                     interpreter, '-m', command,  # execute module a script.
                     get_name(func),
@@ -226,7 +256,7 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
                     arg_file = None
                     arg_fd = None
                 else:
-                    arg_file = tempfile.TemporaryFile()
+                    arg_file = anonymous_file('arguments')
                     arg_file.write(arguments_json.encode('utf-8'))
                     arg_file.flush()
                     arg_file.seek(0)
@@ -248,11 +278,13 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
                     bufsize=-1,
                     close_fds=close_fds,
                     pass_fds=pass_fds,
+                    env=logging_context.environ(),
                 )
                 rc = wait_subprocess(process, timeout=timeout, command_info=full_command)
                 os.close(dup_result_fd)
                 os.close(dup_error_fd)
                 if arg_file:
+                    os.close(arg_fd)
                     arg_file.close()
                 if rc:
                     error_fd.seek(0)
@@ -263,27 +295,294 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
                     raise ExecutionError(err_output)
 
                 result_fd.seek(0)
-                result_str = result_fd.read()
+                return result_fd.read()
 
+        @functools.wraps(func)
+        def execute(*args, **kwargs):
+            logger = logging.getLogger(logger_name)
+            return _decode_result(run(*args, **kwargs), logger)
+
+        def encoded(*args, **kwargs):
+            """
+            Same as calling the decorated callable, but return the result as an
+            EncodedJSON instead of decoding it, so it can be passed as is to
+            format.result() (and jumbo fields) without being re-serialized.
+            """
+            result_str = run(*args, **kwargs)
             if not result_str:
                 return None
-            try:
-                if not compat.PY2:
-                    result_str = result_str.decode('utf-8', errors='replace')
-                result = format.decode(result_str)
-                return result
-            except BaseException as ex:
-                logger.exception('Exception in python.execute: {} {}'.format(ex.__class__.__name__, ex))
-                logger.warning('%r', result_str)
+            if not compat.PY2:
+                result_str = result_str.decode('utf-8', errors='replace')
+            return format.EncodedJSON(result_str)
 
         # Not automatically assigned in python < 3.2.
         execute.__wrapped__ = func
         execute.add_context_in_kwargs = True
+        execute.encoded = encoded
         return execute
 
     return wrap_callable
 
 
+def anonymous_file(name):
+    """
+    Return an unnamed read/write file living in memory (memfd) when the
+    platform supports it, so results and arguments exchanged with the
+    subprocess never touch the disk. Falls back to a temporary file.
+
+    :param name: name of the file, only visible in /proc/<pid>/fd
+    :type name: str
+    """
+    memfd_create = getattr(os, 'memfd_create', None)
+    if memfd_create is not None:
+        try:
+            # NB: memfd_create() sets the close-on-exec flag by default
+            return os.fdopen(memfd_create('simpleflow-{}'.format(name)), 'w+b')
+        except OSError:
+            pass
+    return tempfile.TemporaryFile()
+
+
+def _decode_result(result_str, logger):
+    if not result_str:
+        return None
+    try:
+        if not compat.PY2:
+            result_str = result_str.decode('utf-8', errors='replace')
+        result = format.decode(result_str)
+        return result
+    except BaseException as ex:
+        logger.exception('Exception in python.execute: {} {}'.format(ex.__class__.__name__, ex))
+        logger.warning('%r', result_str)
+
+
+def _write_frame(fd, kind, payload):
+    """
+    Write a frame on a pipe: 1 byte for the kind, 4 bytes for the payload
+    length (big endian), then the payload.
+    """
+    data = struct.pack('>cI', kind, len(payload)) + payload
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _read_exactly(fd, size, deadline=None):
+    chunks = []
+    while size:
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise ExecutionTimeoutError(command=None, timeout_value=None)
+        chunk = os.read(fd, min(size, 1024 * 1024))
+        if not chunk:
+            raise EOFError()
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _read_frame(fd, deadline=None):
+    """
+    Read a frame written by _write_frame.
+
+    :returns: (kind, payload)
+    :rtype: (bytes, bytes)
+    :raises: EOFError if the other end is closed, ExecutionTimeoutError if
+        the deadline is reached.
+    """
+    kind, size = struct.unpack('>cI', _read_exactly(fd, 5, deadline))
+    return kind, _read_exactly(fd, size, deadline)
+
+
+FRAME_REQUEST = b'Q'
+FRAME_ARGUMENTS = b'A'
+FRAME_RESULT = b'R'
+FRAME_ERROR = b'E'
+
+
+class PersistentInterpreter(object):
+    """
+    A long-lived ``python -m simpleflow.execute --serve`` process executing
+    calls sent as frames on a dedicated pipe (stdin and stdout are left to the
+    executed code).
+    """
+
+    def __init__(self, interpreter, max_calls=DEFAULT_PERSISTENT_MAX_CALLS):
+        self.interpreter = interpreter
+        self.max_calls = max_calls
+        self.nb_calls = 0
+
+        request_r, self._request_w = os.pipe()
+        self._response_r, response_w = os.pipe()
+        self.command = [
+            interpreter, '-m', 'simpleflow.execute', '--serve',
+            '--request-fd={}'.format(request_r),
+            '--response-fd={}'.format(response_w),
+        ]
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                close_fds=True,
+                pass_fds=[request_r, response_w],
+                env=logging_context.environ(),
+            )
+        except Exception:
+            os.close(self._request_w)
+            os.close(self._response_r)
+            raise
+        finally:
+            os.close(request_r)
+            os.close(response_w)
+
+    @property
+    def exhausted(self):
+        return self.nb_calls >= self.max_calls
+
+    def call(self, funcname, arguments_json, context=None, logger_name=None,
+             kill_children=False, timeout=None):
+        """
+        Execute a callable in the interpreter.
+
+        :returns: the JSON-encoded result
+        :rtype: bytes
+        :raises: ExecutionError, ExecutionTimeoutError; in both cases the
+            interpreter is not usable anymore and must be closed.
+        """
+        self.nb_calls += 1
+        request = json_dumps({
+            'funcname': funcname,
+            'context': context,
+            'logger_name': logger_name,
+            'kill_children': kill_children,
+        })
+        if not compat.PY2:
+            request = request.encode('utf-8')
+            arguments_json = arguments_json.encode('utf-8')
+        deadline = time.time() + timeout if timeout else None
+        try:
+            _write_frame(self._request_w, FRAME_REQUEST, request)
+            _write_frame(self._request_w, FRAME_ARGUMENTS, arguments_json)
+            kind, payload = _read_frame(self._response_r, deadline)
+        except ExecutionTimeoutError:
+            raise ExecutionTimeoutError(command=self.command + [funcname], timeout_value=timeout)
+        except (EOFError, OSError, IOError) as err:
+            raise ExecutionError('persistent interpreter {} died: {}'.format(
+                self.process.pid, err.__class__.__name__))
+        if kind == FRAME_ERROR:
+            if not compat.PY2:
+                payload = payload.decode('utf-8', errors='replace')
+            raise ExecutionError(payload)
+        return payload
+
+    def close(self, kill=False):
+        """
+        Stop the interpreter: closing the request pipe makes it exit gracefully,
+        `kill` sends a SIGTERM first, e.g. if it's stuck on a timed out call,
+        then a SIGKILL if it's still alive after ACTIVITY_SIGTERM_WAIT_SEC.
+        """
+        for fd in (self._request_w, self._response_r):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if kill:
+            self._signal(self.process.terminate)
+            deadline = time.time() + settings.ACTIVITY_SIGTERM_WAIT_SEC
+            while self.process.poll() is None and time.time() < deadline:
+                time.sleep(0.05)
+            if self.process.poll() is None:
+                simpleflow_logger.warning('persistent interpreter {} did not respond to SIGTERM, killing it'.format(
+                    self.process.pid))
+                self._signal(self.process.kill)
+        self.process.wait()
+
+    @staticmethod
+    def _signal(send):
+        try:
+            send()
+        except OSError as e:
+            # already terminated
+            if e.errno != errno.ESRCH:
+                raise
+
+
+class InterpreterPool(object):
+    """
+    Process-local pool of :class:`PersistentInterpreter`, keyed by
+    (interpreter, module of the executed callable) so modules stay imported
+    from one call to the next.
+
+    The pool isn't shared across forks: a forked process starts with an empty
+    pool instead of writing to the parent's pipes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._idle = {}
+            self._pid = os.getpid()
+
+    def acquire(self, interpreter, module_name, max_calls=DEFAULT_PERSISTENT_MAX_CALLS):
+        key = (interpreter, module_name)
+        with self._lock:
+            self._check_fork()
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return PersistentInterpreter(interpreter, max_calls=max_calls)
+
+    def release(self, module_name, worker):
+        if worker.exhausted or worker.process.poll() is not None:
+            worker.close()
+            return
+        key = (worker.interpreter, module_name)
+        with self._lock:
+            self._check_fork()
+            self._idle.setdefault(key, []).append(worker)
+
+    def execute(self, interpreter, funcname, arguments_json, context=None, logger_name=None,
+                kill_children=False, timeout=None, max_calls=DEFAULT_PERSISTENT_MAX_CALLS):
+        """
+        Execute a callable on an interpreter of the pool. Interpreters are
+        discarded on errors and timeouts since their state is unknown.
+
+        :returns: the JSON-encoded result
+        :rtype: bytes
+        """
+        module_name = funcname.rsplit('.', 1)[0]
+        worker = self.acquire(interpreter, module_name, max_calls=max_calls)
+        try:
+            result = worker.call(
+                funcname, arguments_json,
+                context=context,
+                logger_name=logger_name,
+                kill_children=kill_children,
+                timeout=timeout,
+            )
+        except BaseException:
+            worker.close(kill=True)
+            raise
+        self.release(module_name, worker)
+        return result
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                for workers in self._idle.values():
+                    for worker in workers:
+                        worker.close()
+            self._idle = {}
+
+
+interpreter_pool = InterpreterPool()
+atexit.register(interpreter_pool.close)
+
+
 def is_buggy_subprocess32():
     """
     subprocess32 < 3.5.0:
@@ -338,7 +637,8 @@ def program(path=None, argument_format=format_arguments):
             command = path or func.__name__
             return subprocess.check_output(
                 [command] + argument_format(*args, **kwargs),
-                universal_newlines=True)
+                universal_newlines=True,
+                env=logging_context.environ())
 
         try:
             args, varargs, varkw, defaults, kwonlyargs, kwonlydefaults, ann = inspect.getfullargspec(func)
@@ -401,6 +701,127 @@ def make_callable(funcname):
     return callable_
 
 
+def kill_child_processes():
+    process = psutil.Process(os.getpid())
+    children = process.children(recursive=True)
+
+    for child in children:
+        try:
+            child.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, still_alive = psutil.wait_procs(children, timeout=0.3)
+    for child in still_alive:
+        try:
+            child.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+def _get_logger(logger_name):
+    if logger_name:
+        return logging.getLogger(logger_name)
+    return simpleflow_logger
+
+
+def execute_callable(funcname, arguments, context=None):
+    """
+    Resolve a callable by name and call it with the decoded arguments; if it's
+    a class with an ``execute`` method (e.g. an activity Task), instantiate it
+    and run it.
+
+    :param funcname: name of the callable
+    :type funcname: str
+    :param arguments: {'args': [...], 'kwargs': {...}}
+    :type arguments: dict
+    :param context: activity context
+    :type context: Optional[dict]
+    :return: the callable result
+    """
+    callable_ = make_callable(funcname)
+    if hasattr(callable_, '__wrapped__'):
+        callable_ = callable_.__wrapped__
+    args = arguments.get('args', ())
+    kwargs = arguments.get('kwargs', {})
+    if hasattr(callable_, 'execute'):
+        inst = callable_(*args, **kwargs)
+        if context is not None:
+            inst.context = context
+        result = inst.execute()
+        if hasattr(inst, 'post_execute'):
+            inst.post_execute()
+    else:
+        if context is not None:
+            callable_.context = context
+        result = callable_(*args, **kwargs)
+    return result
+
+
+def format_exception_details():
+    """
+    JSON-encoded details about the exception being handled.
+
+    :rtype: bytes
+    """
+    exc_type, exc_value, exc_traceback = sys.exc_info()
+    tb = traceback.format_tb(exc_traceback)
+    details = json_dumps(
+        {
+            'error': exc_type.__name__,
+            'message': str(exc_value),
+            'traceback': tb,
+        },
+        default=repr,
+    )
+    if not compat.PY2:
+        details = details.encode('utf-8')
+    return details
+
+
+def serve(request_fd, response_fd):
+    """
+    Main loop of a persistent interpreter (see :class:`PersistentInterpreter`):
+    read requests from `request_fd` and write results or errors to
+    `response_fd` until the request pipe is closed.
+    """
+    while True:
+        try:
+            _, request = _read_frame(request_fd)
+            _, content = _read_frame(request_fd)
+        except EOFError:
+            break
+        if not compat.PY2:
+            request = request.decode('utf-8')
+            content = content.decode('utf-8')
+        request = json.loads(request)
+        logger = _get_logger(request.get('logger_name'))
+        try:
+            result = execute_callable(request['funcname'], format.decode(content), request.get('context'))
+        except Exception as err:
+            logger.error('Exception: {}'.format(err))
+            kind, payload = FRAME_ERROR, format_exception_details()
+        else:
+            payload = json_dumps(result)
+            if not compat.PY2:
+                payload = payload.encode('utf-8')
+            kind = FRAME_RESULT
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if request.get('kill_children'):
+            kill_child_processes()
+        _write_frame(response_fd, kind, payload)
+
+
+def serve_main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--serve', action='store_true', help='run as a persistent interpreter')
+    parser.add_argument('--request-fd', type=int, required=True, metavar='N', help='request file descriptor')
+    parser.add_argument('--response-fd', type=int, required=True, metavar='N', help='response file descriptor')
+    cmd_arguments = parser.parse_args()
+    serve(cmd_arguments.request_fd, cmd_arguments.response_fd)
+
+
 def main():
     """
     When executed as a script, this module expects the name of a callable as
@@ -485,22 +906,6 @@ def main():
     )
     cmd_arguments = parser.parse_args()
 
-    def kill_child_processes():
-        process = psutil.Process(os.getpid())
-        children = process.children(recursive=True)
-
-        for child in children:
-            try:
-                child.terminate()
-            except psutil.NoSuchProcess:
-                pass
-        _, still_alive = psutil.wait_procs(children, timeout=0.3)
-        for child in still_alive:
-            try:
-                child.kill()
-            except psutil.NoSuchProcess:
-                pass
-
     funcname = cmd_arguments.funcname
     if cmd_arguments.arguments_json_fd is None:
         content = cmd_arguments.funcargs
@@ -514,44 +919,15 @@ def main():
     except Exception:
         raise ValueError('cannot load arguments from {}'.format(
             content))
-    if cmd_arguments.logger_name:
-        logger = logging.getLogger(cmd_arguments.logger_name)
-    else:
-        logger = simpleflow_logger
-    callable_ = make_callable(funcname)
-    if hasattr(callable_, '__wrapped__'):
-        callable_ = callable_.__wrapped__
-    args = arguments.get('args', ())
-    kwargs = arguments.get('kwargs', {})
+    logger = _get_logger(cmd_arguments.logger_name)
     context = json.loads(cmd_arguments.context) if cmd_arguments.context is not None else None
     try:
-        if hasattr(callable_, 'execute'):
-            inst = callable_(*args, **kwargs)
-            if context is not None:
-                inst.context = context
-            result = inst.execute()
-            if hasattr(inst, 'post_execute'):
-                inst.post_execute()
-        else:
-            if context is not None:
-                callable_.context = context
-            result = callable_(*args, **kwargs)
+        result = execute_callable(funcname, arguments, context)
     except Exception as err:
         logger.error('Exception: {}'.format(err))
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        tb = traceback.format_tb(exc_traceback)
-        details = json_dumps(
-            {
-                'error': exc_type.__name__,
-                'message': str(exc_value),
-                'traceback': tb,
-            },
-            default=repr,
-        )
+        details = format_exception_details()
         if cmd_arguments.error_fd == 2:
             sys.stderr.flush()
-        if not compat.PY2:
-            details = details.encode('utf-8')
         os.write(cmd_arguments.error_fd, details)
         if cmd_arguments.kill_children:
             kill_child_processes()
@@ -569,4 +945,7 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    if sys.argv[1:2] == ['--serve']:
+        serve_main()
+    else:
+        main()
@@ -1,5 +1,6 @@
 import abc
 
+from . import exceptions
 from ._decorators import deprecated
 
 if False:
@@ -131,6 +132,27 @@ class Executor(object):
         """
         pass
 
+    def continue_as_new(self, *args, **kwargs):
+        """
+        Close the execution and start a new run of the workflow, called
+        with *args* and *kwargs*.
+
+        :raise: exceptions.ContinueAsNew, handled by `run`
+        """
+        raise exceptions.ContinueAsNew({'args': args, 'kwargs': kwargs})
+
+    def checkpoint(self, name, func, *args, **kwargs):
+        """
+        Return the result of a phase of the workflow, *func* called with
+        *args* and *kwargs*. Executors replaying the workflow record it, so
+        that the next replays skip the phase.
+
+        :param name: name of the checkpoint, unique in the workflow
+        :type name: str
+        :type func: Callable
+        """
+        return func(*args, **kwargs)
+
     def before_replay(self):
         pass
 
@@ -17,6 +17,21 @@ class JumboTooLargeError(ValueError):
     pass
 
 
+class EncodedJSON(object):
+    """
+    A value that is already JSON-encoded, e.g. the result of an activity
+    executed in a subprocess. Passing it to `result()` avoids decoding then
+    re-encoding it.
+    """
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content
+
+    def __repr__(self):
+        return 'EncodedJSON({!r})'.format(self.content[:100])
+
+
 def _jumbo_fields_bucket():
     # wrapped into a function so easier to override for tests
     bucket = os.getenv("SIMPLEFLOW_JUMBO_FIELDS_BUCKET")
@@ -183,6 +198,8 @@ def reason(message):
 
 
 def result(message):
+    if isinstance(message, EncodedJSON):
+        return encode(message.content, constants.MAX_RESULT_LENGTH)
     return encode(json_dumps(message), constants.MAX_RESULT_LENGTH)
 
 
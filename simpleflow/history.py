@@ -3,6 +3,19 @@ import collections
 from simpleflow import logger
 
 
+class _EventsById(object):
+    """
+    Give parsers the ``events[event_id - 1]`` access they use on a complete
+    history, over a partial one. Events outside of it raise a KeyError.
+    """
+
+    def __init__(self, events):
+        self._events = {event.id: event for event in events}
+
+    def __getitem__(self, index):
+        return self._events[index + 1]
+
+
 # noinspection PyUnresolvedReferences
 class History(object):
     """
@@ -43,6 +56,7 @@ class History(object):
         self._cancel_failed = None
         self.started_decision_id = None
         self.completed_decision_id = None
+        self.continued_execution_run_id = None
 
     @property
     def swf_history(self):
@@ -436,7 +450,10 @@ class History(object):
         :param events:
         :param event:
         """
-        if event.state == 'signaled':
+        if event.state == 'started':
+            # the execution continues this run, see Workflow.continue_as_new
+            self.continued_execution_run_id = getattr(event, 'continued_execution_run_id', None)
+        elif event.state == 'signaled':
             signal = {
                 'type': 'signal',
                 'name': event.signal_name,
@@ -659,6 +676,28 @@ class History(object):
             if parser:
                 parser(self, events, event)
 
+    def parse_tail(self):
+        """
+        Parse the last events of a history, e.g. fetched in reverse order and
+        truncated to a few pages.
+
+        These events are a suffix of the complete history: tasks started
+        inside it are parsed as usual, while events about tasks started
+        before it (a completion whose scheduling event is missing...) are
+        skipped. So ``tasks`` holds the last tasks of the execution, in their
+        usual order; an activity rescheduled inside the window, though, is
+        positioned at this scheduling and its ``retry`` count is partial.
+        """
+        events = sorted(self.events, key=lambda e: e.id)
+        events_by_id = _EventsById(events)
+        for event in events:
+            parser = self.TYPE_TO_PARSER.get(event.type)
+            if parser:
+                try:
+                    parser(self, events_by_id, event)
+                except (KeyError, IndexError):
+                    continue
+
     @staticmethod
     def get_event_id(event):
         for event_id_key in (  # FIXME add a universal name?..
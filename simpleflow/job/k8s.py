@@ -2,6 +2,7 @@ from base64 import b64encode
 import jinja2
 import json
 import os
+import threading
 import yaml
 
 import kubernetes.config
@@ -9,52 +10,136 @@ import kubernetes.client
 
 from simpleflow.utils import json_dumps
 
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Jinja2 environments by template directory: they keep the compiled
+# templates, and only check the modification time of their files.
+_environments = {}
+_environments_lock = threading.Lock()
+
+# BatchV1Api of the current process, with the config it was built from
+_api = None
+
+
+def get_template(job_template):
+    """
+    Compiled job template, from a cache.
+
+    :param job_template: path of the template
+    :type job_template: str
+    :rtype: jinja2.Template
+    """
+    path, filename = os.path.split(job_template)
+    path = path or './'
+    env = _environments.get(path)
+    if env is None:
+        with _environments_lock:
+            env = _environments.get(path)
+            if env is None:
+                env = _environments[path] = jinja2.Environment(
+                    loader=jinja2.FileSystemLoader(path),
+                    undefined=jinja2.StrictUndefined,
+                )
+    return env.get_template(filename)
+
+
+def load_config():
+    """
+    Load config in the current Kubernetes cluster, either via in cluster config
+    or via the local kube config if on a development machine.
+    """
+    try:
+        kubernetes.config.load_incluster_config()
+    except kubernetes.config.ConfigException:
+        kubernetes.config.load_kube_config()
+
+
+def get_batch_api():
+    """
+    Kubernetes batch API client, built once per process: a forked process
+    doesn't share the connections of its parent.
+
+    :rtype: kubernetes.client.BatchV1Api
+    """
+    global _api
+    pid = os.getpid()
+    if _api is None or _api[0] != pid:
+        load_config()
+        _api = (pid, kubernetes.client.BatchV1Api())
+    return _api[1]
+
+
+def get_job_meta(response):
+    """
+    Extract the "meta" of the task input, where the job template is.
+
+    :param response: raw SWF poll response
+    :type response: dict
+    :rtype: dict
+    """
+    input = response.get("input")
+    if not input:
+        raise ValueError("Cannot extract job template from empty input")
+    meta = json.loads(input).get("meta")
+    if not meta:
+        raise ValueError("Cannot extract 'meta' key from task input")
+    if "k8s_job_template" not in meta:
+        raise ValueError("Cannot extract 'k8s_job_template' key from task meta")
+    return meta
+
 
 class KubernetesJob(object):
-    def __init__(self, job_name, domain, response):
+    """
+    Kubernetes job processing an activity task, or a batch of activity tasks
+    using the same template and data.
+
+    The template gets the environment variables, the "k8s_job_data" of the
+    tasks, and:
+
+    - JOB_NAME: name of the job
+    - PAYLOAD: the SWF response to pass to `worker.start --poll-data`
+      (base64-encoded JSON; a list of responses for a batch)
+    - NB_TASKS: number of tasks the job processes
+    """
+    def __init__(self, job_name, domain, response, api=None):
+        """
+        :param response: raw SWF poll response, or list of responses
+        :type response: dict | list[dict]
+        :param api: batch API client, defaults to the one of the process
+        :type api: Optional[kubernetes.client.BatchV1Api]
+        """
         self.job_name = job_name
         self.response = response
         self.domain = domain
+        self.api = api
+
+    @property
+    def responses(self):
+        return self.response if isinstance(self.response, list) else [self.response]
 
     def load_config(self):
-        """
-        Load config in the current Kubernetes cluster, either via in cluster config
-        or via the local kube config if on a development machine.
-        """
-        try:
-            kubernetes.config.load_incluster_config()
-        except kubernetes.config.ConfigException:
-            kubernetes.config.load_kube_config()
+        load_config()
 
     def compute_job_definition(self):
         """
         Compute a job definition from the SWF response
         """
         # extract job template location
-        input = self.response.get("input")
-        if not input:
-            raise ValueError("Cannot extract job template from empty input")
-        meta = json.loads(input).get("meta")
-        if not meta:
-            raise ValueError("Cannot extract 'meta' key from task input")
+        meta = get_job_meta(self.responses[0])
         job_template = meta["k8s_job_template"]
 
         # setup variables that will be interpolated in the template
         variables = dict(os.environ)
-        for key, value in meta.get("k8s_job_data", {}):
+        for key, value in meta.get("k8s_job_data", {}).items():
             variables[key] = value
         variables["JOB_NAME"] = self.job_name
-        variables["PAYLOAD"] = b64encode(json_dumps(self.response))
+        variables["PAYLOAD"] = b64encode(json_dumps(self.response).encode("utf-8")).decode("ascii")
+        variables["NB_TASKS"] = len(self.responses)
 
         # render the job template with those context variables
-        path, filename = os.path.split(job_template)
-        env = jinja2.Environment(
-            loader=jinja2.FileSystemLoader(path or './'),
-            undefined=jinja2.StrictUndefined,
-        )
-        rendered = env.get_template(filename).render(variables)
+        rendered = get_template(job_template).render(variables)
 
-        return yaml.load(rendered)
+        return yaml.load(rendered, Loader=YAML_LOADER)
 
     def schedule(self):
         """
@@ -64,10 +149,7 @@ class KubernetesJob(object):
         # build job definition
         job_definition = self.compute_job_definition()
 
-        # load cluster config
-        self.load_config()
-
         # schedule job
-        api = kubernetes.client.BatchV1Api()
+        api = self.api or get_batch_api()
         namespace = os.getenv("K8S_NAMESPACE", "default")
         api.create_namespaced_job(body=job_definition, namespace=namespace)
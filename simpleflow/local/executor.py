@@ -1,15 +1,23 @@
 import collections
+import functools
+import multiprocessing
 import sys
 import traceback
 import uuid
+from multiprocessing.pool import ThreadPool
+
+import six
+from six.moves import queue
 
 from simpleflow import (
     exceptions,
     executor,
     futures,
     logger,
+    settings,
 )
 from simpleflow.base import Submittable
+from simpleflow.dispatch.dynamic_dispatcher import Dispatcher
 from simpleflow.marker import Marker
 from simpleflow.signal import WaitForSignal
 from simpleflow.task import ActivityTask, WorkflowTask, SignalTask, MarkerTask
@@ -19,14 +27,78 @@ from simpleflow.workflow import Workflow
 from swf.models.history import builder
 from simpleflow.history import History
 
+POOLS = ('thread', 'process')
+
+
+def _failure(exc_value, exc_traceback=None):
+    details = json_dumps(
+        {
+            'error': type(exc_value).__name__,
+            'message': str(exc_value),
+            'traceback': traceback.format_tb(exc_traceback) if exc_traceback else [],
+        },
+        default=repr
+    )
+    return 'failed', None, exc_value, (format_exc(exc_value), details)
+
+
+def execute_task(task):
+    """
+    Executes a task and rescues its exception.
+
+    :type task: simpleflow.base.Submittable
+    :returns: state, result, exception, (message, details) of the failure
+    :rtype: (str, Any, Optional[Exception], Optional[(str, str)])
+    """
+    try:
+        result = task.execute()
+        if hasattr(task, 'post_execute'):
+            task.post_execute()
+    except exceptions.ExecutionBlocked:
+        raise
+    except Exception:
+        _, exc_value, exc_traceback = sys.exc_info()
+        logger.exception('rescuing exception: {}'.format(exc_value))
+        return _failure(exc_value, exc_traceback)
+    return 'completed', result, None, None
+
+
+def execute_activity(name, args, kwargs, context):
+    """
+    Executes an activity in a pool process: like workers, it is found by its
+    name, as activities cannot be pickled.
+    """
+    try:
+        activity = Dispatcher.dispatch_activity(name)
+    except Exception as err:
+        return _failure(err)
+    return execute_task(ActivityTask(activity, context=context, *args, **kwargs))
+
 
 class Executor(executor.Executor):
     """
-    Executes all tasks synchronously in a single local process.
+    Executes a workflow locally, without Amazon SWF.
 
+    By default, tasks are executed synchronously, as soon as they are
+    submitted. With *max_workers* > 1, activities run in a pool of threads or
+    processes instead: ``submit()`` returns a pending future and the workflow
+    is replayed, as by a decider, each time some of them are finished. The
+    other tasks (child workflows, signals, markers) are still executed in the
+    main thread.
+
+    :ivar max_workers: number of activities executed at the same time
+    :type max_workers: int
+    :ivar pool: ``process`` (default) or ``thread``; in processes, activities
+                are found by name (like workers do), and their arguments and
+                results must be picklable; in threads, plain function
+                activities share their ``context`` attribute
+    :type pool: str
     """
 
-    def __init__(self, workflow_class):
+    # Seconds between checks of failed tasks on Python 2
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, workflow_class, max_workers=None, pool=None):
         super(Executor, self).__init__(workflow_class)
         self.update_workflow_class()
         self.nb_activities = 0
@@ -36,6 +108,22 @@ class Executor(executor.Executor):
         self.wf_run_id = []
         self.wf_id = []
 
+        if max_workers is None:
+            max_workers = settings.SIMPLEFLOW_LOCAL_MAX_WORKERS
+        pool = pool or settings.SIMPLEFLOW_LOCAL_POOL
+        if pool not in POOLS:
+            raise ValueError('invalid pool {!r}: expected one of {}'.format(pool, ', '.join(POOLS)))
+        self.max_workers = max_workers
+        self.pool = pool
+
+        # Concurrent executions: tasks are identified by their submission
+        # order in their workflow, which is the same on each replay
+        self._pool = None
+        self._scopes = [[(), 0]]
+        self._outcomes = {}
+        self._pending = {}
+        self._completed = queue.Queue()
+
     def update_workflow_class(self):
         """
         Returns the workflow class with all the needed attributes for
@@ -64,12 +152,58 @@ class Executor(executor.Executor):
         self.wf_run_id.pop()
         self.wf_id.pop()
 
+    def _next_task_key(self):
+        scope = self._scopes[-1]
+        key = scope[0] + (scope[1],)
+        scope[1] += 1
+        return key
+
+    def _get_future(self, func, outcome):
+        state, result, exception, failure = outcome
+        future = futures.Future()
+        future._result = result
+        future._exception = exception
+        future._state = futures.FINISHED
+        if state == 'failed' and (isinstance(func, Activity) or issubclass_(func, Workflow)) and \
+                getattr(func, 'raises_on_failure', None):
+            message, details = failure
+            raise exceptions.TaskFailed(
+                func.name,
+                message,
+                details,
+            )
+        return future
+
+    def _record(self, key, func, task_id, args, kwargs, outcome):
+        if self._pool is not None:
+            self._outcomes[key] = outcome
+        if issubclass_(func, Workflow):
+            self._history.add_child_workflow(
+                func,
+                last_state=outcome[0],
+                workflow_id=task_id,
+                input={'args': args, 'kwargs': kwargs},
+                result=outcome[1])
+        elif func:
+            self._history.add_activity_task(
+                func,
+                decision_id=None,
+                last_state=outcome[0],
+                activity_id=task_id,
+                input={'args': args, 'kwargs': kwargs},
+                result=outcome[1])
+
     def submit(self, func, *args, **kwargs):
+        key = self._next_task_key()
+        activity = getattr(func, 'activity', None) if isinstance(func, Submittable) else func
+        if key in self._outcomes:
+            return self._get_future(activity, self._outcomes[key])
+        if key in self._pending:
+            return futures.Future()
+
         logger.info('executing task {}(args={}, kwargs={})'.format(
             func, args, kwargs))
 
-        future = futures.Future()
-
         context = self.get_run_context()
         context["activity_id"] = str(self.nb_activities)
         self.nb_activities += 1
@@ -89,7 +223,6 @@ class Executor(executor.Executor):
         if isinstance(func, Submittable):
             task = func  # *args, **kwargs already resolved.
             task.context = context
-            func = getattr(task, 'activity', None)
         elif isinstance(func, Activity):
             task = ActivityTask(func, context=context, *args, **kwargs)
         elif issubclass(func, Workflow):
@@ -98,49 +231,107 @@ class Executor(executor.Executor):
             raise TypeError('invalid type {} for {}'.format(
                 type(func), func))
 
+        if self._pool is not None and isinstance(task, ActivityTask):
+            self._schedule(key, task, activity, context["activity_id"], args, kwargs)
+            return futures.Future()
+
+        task_id = context["activity_id"]
         if isinstance(task, WorkflowTask):
             self.on_new_workflow(task)
-
+            self._scopes.append([key, 0])
+            task_id = self.wf_id[-1]
         try:
-            future._result = task.execute()
-            if hasattr(task, 'post_execute'):
-                task.post_execute()
-            state = 'completed'
-        except Exception:
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            future._exception = exc_value
-            logger.exception('rescuing exception: {}'.format(exc_value))
-            if (isinstance(func, Activity) or issubclass_(func, Workflow)) and getattr(func, 'raises_on_failure', None):
-                tb = traceback.format_tb(exc_traceback)
-                message = format_exc(exc_value)
-                details = json_dumps(
-                    {
-                        'error': exc_type.__name__,
-                        'message': str(exc_value),
-                        'traceback': tb,
-                    },
-                    default=repr
-                )
-                raise exceptions.TaskFailed(
-                    func.name,
-                    message,
-                    details,
-                )
-            state = 'failed'
+            outcome = execute_task(task)
+        except exceptions.ExecutionBlocked:
+            # A child workflow waits for its activities: it will be replayed.
+            return futures.Future()
         finally:
             if isinstance(task, WorkflowTask):
+                self._scopes.pop()
                 self.on_completed_workflow()
-            future._state = futures.FINISHED
 
-        if func:
-            self._history.add_activity_task(
-                func,
-                decision_id=None,
-                last_state=state,
-                activity_id=context["activity_id"],
-                input={'args': args, 'kwargs': kwargs},
-                result=future.result)
-        return future
+        self._record(key, activity, task_id, args, kwargs, outcome)
+        return self._get_future(activity, outcome)
+
+    def _schedule(self, key, task, activity, activity_id, args, kwargs):
+        callbacks = {'callback': functools.partial(self._on_task_done, key)}
+        if six.PY3:
+            # e.g. unpicklable arguments or result
+            callbacks['error_callback'] = lambda err: self._on_task_done(key, _failure(err))
+        if self.pool == 'process':
+            result = self._pool.apply_async(
+                execute_activity,
+                (task.activity.name, task.args, task.kwargs, task.context),
+                **callbacks
+            )
+        else:
+            result = self._pool.apply_async(execute_task, (task,), **callbacks)
+        self._pending[key] = (activity, activity_id, args, kwargs, result)
+
+    def _on_task_done(self, key, outcome):
+        # Called by a thread of the pool
+        self._completed.put((key, outcome))
+
+    def _next_completed(self):
+        if six.PY3:
+            return self._completed.get()
+        # Without error_callback, a task failing in the pool itself (e.g.
+        # unpicklable arguments or result) is only seen on its result.
+        while True:
+            try:
+                return self._completed.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                pass
+            for key, pending in list(self._pending.items()):
+                result = pending[-1]
+                if result.ready() and not result.successful():
+                    try:
+                        result.get()
+                    except Exception as err:
+                        return key, _failure(err)
+
+    def _wait_for_tasks(self):
+        """
+        Waits until at least one running activity is finished, then records
+        all the finished ones.
+        """
+        done = [self._next_completed()]
+        while True:
+            try:
+                done.append(self._completed.get_nowait())
+            except queue.Empty:
+                break
+        for key, outcome in done:
+            activity, activity_id, args, kwargs, _ = self._pending.pop(key)
+            self._record(key, activity, activity_id, args, kwargs, outcome)
+
+    def _make_pool(self):
+        if self.pool == 'process':
+            return multiprocessing.Pool(self.max_workers)
+        return ThreadPool(self.max_workers)
+
+    def _run_concurrently(self, args, kwargs):
+        self._pool = self._make_pool()
+        try:
+            while True:
+                self._scopes = [[(), 0]]
+                try:
+                    result = self.run_workflow(*args, **kwargs)
+                except exceptions.ExecutionBlocked:
+                    if not self._pending:
+                        raise
+                    self._wait_for_tasks()
+                    continue
+                # Like synchronous executions, don't leave activities the
+                # workflow didn't wait for behind
+                while self._pending:
+                    self._wait_for_tasks()
+                return result
+        finally:
+            self._pool.terminate()
+            self._pool = None
+            self._outcomes = {}
+            self._pending = {}
 
     def run(self, input=None):
         if input is None:
@@ -152,7 +343,20 @@ class Executor(executor.Executor):
         self.initialize_history(input)
 
         self.before_replay()
-        result = self.run_workflow(*args, **kwargs)
+        while True:
+            try:
+                if self.max_workers > 1:
+                    result = self._run_concurrently(args, kwargs)
+                else:
+                    result = self.run_workflow(*args, **kwargs)
+            except exceptions.ContinueAsNew as err:
+                logger.info('continuing as a new run')
+                args = err.input['args']
+                kwargs = err.input['kwargs']
+                self._markers = collections.OrderedDict()
+                self.initialize_history(err.input)
+                continue
+            break
 
         # Hack: self._history must be available to the callback as a
         # simpleflow.history.History, not a swf.models.history.builder.History
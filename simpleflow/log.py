@@ -1,6 +1,13 @@
 from datetime import datetime
+import atexit
+import json
 import logging.config
+import os
 import sys
+import threading
+from multiprocessing import util as multiprocessing_util
+
+from six.moves import queue
 
 from . import logging_context, settings
 
@@ -21,10 +28,21 @@ class ColorModes(object):
 
 color_mode = 'auto'
 
+_stdout_isatty = None
+_formatter = logging.Formatter()
+
+
+def _isatty():
+    # cached: it's a syscall
+    global _stdout_isatty
+    if _stdout_isatty is None:
+        _stdout_isatty = sys.stdout.isatty()
+    return _stdout_isatty
+
 
 def colorize(level, message):
     # if not in a tty, we're likely redirected or piped
-    if color_mode == ColorModes.NEVER or (color_mode == ColorModes.AUTO and not sys.stdout.isatty()):
+    if color_mode == ColorModes.NEVER or (color_mode == ColorModes.AUTO and not _isatty()):
         return message
 
     # color mappings
@@ -68,12 +86,18 @@ class SimpleflowFormatter(logging.Formatter):
     #     'levelname': 'INFO',
     #     'msecs': 513.8020515441895,
     # }
+    _last_second = None
+    _last_isodate = None
+
     def format(self, record):
         # self.formatTime() is documented as using ISO8601 format,
         # but in fact not, so we roll our own formatting
         # NB: we strip microseconds out so things are readable
-        date = datetime.fromtimestamp(record.created).replace(microsecond=0)
-        record.isodate = date.isoformat()
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_isodate = datetime.fromtimestamp(second).isoformat()
+            self._last_second = second
+        record.isodate = self._last_isodate
 
         # don't risk bad interpolation if args is empty (in most cases it's because the
         # logged string is already formatted)
@@ -134,10 +158,11 @@ class SyslogFormatter(logging.Formatter):
     # }
     def format(self, record):
         msg = []
-        workflow_id = logging_context.get("workflow_id")[0:64]
+        context = get_context(record)
+        workflow_id = context.get("workflow_id", "")[0:64]
         if workflow_id:
             msg.append(workflow_id + ":")
-            msg.append("{}#{}".format(logging_context.get("task_type"), logging_context.get("event_id")))
+            msg.append("{}#{}".format(context.get("task_type", ""), context.get("event_id", "")))
 
         msg.append(record.levelname)
         msg.append("pid={}".format(record.process))
@@ -145,6 +170,131 @@ class SyslogFormatter(logging.Formatter):
         return " ".join(msg)
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    One compact JSON object per record, with the logging context fields.
+    """
+    def format(self, record):
+        data = {
+            "time": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "pid": record.process,
+            "message": record.getMessage(),
+        }
+        data.update(get_context(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, separators=(",", ":"), default=str)
+
+
+def get_context(record):
+    """
+    Logging context of a record: as captured when it was queued by a
+    `BackgroundHandler`, else the current one.
+
+    :rtype: dict[str, str]
+    """
+    context = getattr(record, "context", None)
+    if context is None:
+        context = logging_context.snapshot()
+    return context
+
+
+class BackgroundHandler(logging.Handler):
+    """
+    Hand records over to a thread that formats and emits them with
+    *handlers*, so that the logging thread only pays for a queue put.
+
+    Messages are interpolated and exceptions formatted before queueing,
+    and the logging context is captured. When the queue is full, records
+    are dropped rather than blocking; a warning tells how many.
+
+    The thread is started again in forked processes, with new locks for
+    *handlers*, and drained on exit.
+    """
+    def __init__(self, handlers, capacity=10000):
+        logging.Handler.__init__(self)
+        self.handlers = handlers
+        self.capacity = capacity
+        self.dropped = 0
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _start(self):
+        if self._pid is not None:
+            # Forked: the thread of the parent may have been emitting a
+            # record, and no thread would release the locks it held.
+            for handler in self.handlers:
+                handler.createLock()
+        self._queue = queue.Queue(self.capacity)
+        self._thread = threading.Thread(target=self._run, name="simpleflow-logging")
+        self._thread.daemon = True
+        self._thread.start()
+        self._pid = os.getpid()
+        # Processes of multiprocessing don't run atexit handlers
+        multiprocessing_util.Finalize(self, self.stop, exitpriority=0)
+
+    def stop(self):
+        """
+        Emit the queued records and stop the thread.
+        """
+        if self._pid != os.getpid():
+            return
+        self._pid = None
+        self._queue.put(None)
+        self._thread.join()
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        record.message = record.msg
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.context = logging_context.snapshot()
+        return record
+
+    def emit(self, record):
+        try:
+            if self._pid != os.getpid():
+                with self._start_lock:
+                    if self._pid != os.getpid():
+                        self._start()
+            self._queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self._handle(logging.makeLogRecord({
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": "logging queue full: {} records dropped".format(dropped),
+                }))
+            self._handle(record)
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
 def setup_logging():
     base_settings = settings.base.load()
     config = base_settings["LOGGING"]
@@ -154,8 +304,36 @@ def setup_logging():
         host, port = syslog_target.rsplit(":", 1)
         config = setup_syslog_logging(config, host, int(port))
 
+    if base_settings.get("SIMPLEFLOW_LOG_FORMAT") == "json":
+        config = setup_json_logging(config)
+
     logging.config.dictConfig(config)
 
+    if base_settings.get("SIMPLEFLOW_LOG_QUEUE"):
+        setup_background_logging(logging.getLogger("simpleflow"))
+
+
+def setup_json_logging(config):
+    config["formatters"]["json_formatter"] = {
+        "()": "simpleflow.log.JsonFormatter",
+    }
+    for handler in config["handlers"].values():
+        if handler.get("formatter") == "simpleflow_formatter":
+            handler["formatter"] = "json_formatter"
+    return config
+
+
+def setup_background_logging(logger):
+    """
+    Move the handlers of *logger* to a `BackgroundHandler`.
+    """
+    handlers = [handler for handler in logger.handlers if not isinstance(handler, BackgroundHandler)]
+    if not handlers:
+        return
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(BackgroundHandler(handlers))
+
 
 def setup_syslog_logging(config, host, port):
     config["loggers"]["simpleflow"]["handlers"].append("syslog")
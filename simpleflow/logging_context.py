@@ -1,3 +1,10 @@
+"""
+Fields describing the task being processed, added to log records.
+
+They are kept in memory: setting them is a dict update rather than an
+environment change. Subprocesses started for a task get them through their
+environment (see `environ()`), and load them from it on import.
+"""
 import os
 
 
@@ -10,17 +17,49 @@ ENV_KEYS = {
     "workflow_id": "_SWF_CONTEXT_WORKFLOW_ID",
 }
 
+_context = {}
+
 
 def set(key, value):
-    env_var = ENV_KEYS[key]
-    os.environ[env_var] = str(value)
+    if key not in ENV_KEYS:
+        raise KeyError(key)
+    _context[key] = str(value)
 
 
 def get(key):
-    env_var = ENV_KEYS[key]
-    return os.getenv(env_var, "")
+    if key not in ENV_KEYS:
+        raise KeyError(key)
+    return _context.get(key, "")
 
 
 def reset():
-    for env_var in ENV_KEYS.values():
-        os.environ[env_var] = ""
+    _context.clear()
+
+
+def snapshot():
+    """
+    :return: the fields currently set
+    :rtype: dict[str, str]
+    """
+    return dict(_context)
+
+
+def environ():
+    """
+    :return: a copy of the environment with the fields, for subprocesses
+    :rtype: dict[str, str]
+    """
+    env = dict(os.environ)
+    for key, env_var in ENV_KEYS.items():
+        env[env_var] = _context.get(key, "")
+    return env
+
+
+def _load(env):
+    for key, env_var in ENV_KEYS.items():
+        value = env.get(env_var)
+        if value:
+            _context[key] = value
+
+
+_load(os.environ)
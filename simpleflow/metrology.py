@@ -1,20 +1,132 @@
 import abc
+import bisect
 import json
 import os
 import re
+import tempfile
+import threading
 import time
-from collections import OrderedDict
+from array import array
+from collections import OrderedDict, defaultdict
+from multiprocessing.pool import ThreadPool
 try:
     from urllib.parse import quote_plus  # py 3.x
 except ImportError:
     from urllib import quote_plus  # py 2.x
 
-from . import storage, settings
+try:
+    import resource
+except ImportError:  # not on all platforms
+    resource = None
+
+from . import logger, storage, settings
 from .swf.stats.pretty import dump_history_to_json
 from .workflow import Workflow
 
 ACTIVITY_KEY_RE = re.compile(r'activity\.(.+)\.json')
 
+_fetcher = threading.local()
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+DEFAULT_HISTOGRAM_BOUNDS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+_uploads = []
+_uploads_lock = threading.Lock()
+
+
+def _read_proc(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def sample_resources():
+    """
+    Resources used by the current process so far: CPU times in seconds, and
+    memory and I/O in bytes. Memory and I/O come from ``/proc`` and are None
+    when it isn't available.
+
+    :rtype: dict[str, Optional[float]]
+    """
+    times = os.times()
+    sample = {
+        'cpu_user': times[0],
+        'cpu_system': times[1],
+        'rss': None,
+        'read_bytes': None,
+        'write_bytes': None,
+        'read_chars': None,
+        'write_chars': None,
+    }
+    statm = _read_proc('/proc/self/statm')
+    if statm:
+        sample['rss'] = int(statm.split()[1]) * PAGE_SIZE
+    io = _read_proc('/proc/self/io')
+    if io:
+        values = dict(line.split(': ') for line in io.splitlines() if ': ' in line)
+        sample['read_bytes'] = int(values.get('read_bytes', 0))
+        sample['write_bytes'] = int(values.get('write_bytes', 0))
+        sample['read_chars'] = int(values.get('rchar', 0))
+        sample['write_chars'] = int(values.get('wchar', 0))
+    return sample
+
+
+class Counter(object):
+    """
+    Counter of a step, e.g. of the records it processed.
+    """
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+
+    def add(self, value=1):
+        self.value += value
+
+
+class Histogram(object):
+    """
+    Distribution of values in fixed buckets: the counts are pre-allocated in
+    an array, so observing a value doesn't allocate anything.
+
+    :ivar bounds: upper bounds (included) of the buckets, sorted; a last
+                  bucket counts the values above the last bound
+    :type bounds: tuple[float]
+    """
+    __slots__ = ('name', 'bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, name, bounds=DEFAULT_HISTOGRAM_BOUNDS):
+        self.name = name
+        self.bounds = tuple(sorted(bounds))
+        self.counts = array('l', [0] * (len(self.bounds) + 1))
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def get_stats(self):
+        return OrderedDict([
+            ('count', self.count),
+            ('sum', self.sum),
+            ('min', self.min),
+            ('max', self.max),
+            ('mean', float(self.sum) / self.count if self.count else None),
+            ('bounds', list(self.bounds)),
+            ('counts', self.counts.tolist()),
+        ])
+
 
 class StepIO(object):
     def __init__(self):
@@ -44,6 +156,10 @@ class Step(object):
         self.task = task
         self.read = StepIO()
         self.write = StepIO()
+        self.counters = OrderedDict()
+        self.histograms = OrderedDict()
+        self.resources_started = sample_resources()
+        self.resources_finished = None
         self.time_started = time.time()
         self.time_finished = None
         self.time_total = None
@@ -52,6 +168,47 @@ class Step(object):
     def done(self):
         self.time_finished = time.time()
         self.time_total = self.time_finished - self.time_started
+        self.resources_finished = sample_resources()
+
+    def counter(self, name):
+        """
+        Get or create a counter, to be kept in a local variable in loops.
+
+        :rtype: Counter
+        """
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = Counter(name)
+        return counter
+
+    def histogram(self, name, bounds=DEFAULT_HISTOGRAM_BOUNDS):
+        """
+        Get or create a histogram, to be kept in a local variable in loops.
+
+        :rtype: Histogram
+        """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(name, bounds)
+        return histogram
+
+    def get_resources_stats(self):
+        """
+        Resources used during the step; `rss` is the resident memory at its end.
+        """
+        started = self.resources_started
+        finished = self.resources_finished or sample_resources()
+        stats = OrderedDict()
+        for name in ('cpu_user', 'cpu_system', 'read_bytes', 'write_bytes', 'read_chars', 'write_chars'):
+            if started[name] is None or finished[name] is None:
+                stats[name] = None
+            else:
+                stats[name] = finished[name] - started[name]
+        stats['rss'] = finished['rss']
+        if resource is not None:
+            # kB on Linux
+            stats['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return stats
 
     def get_stats(self):
         stats = OrderedDict([
@@ -62,6 +219,9 @@ class Step(object):
             ('time_total', self.time_total),
             ('read', self.read.get_stats(self.time_total)),
             ('write', self.write.get_stats(self.time_total)),
+            ('resources', self.get_resources_stats()),
+            ('counters', OrderedDict((name, c.value) for name, c in self.counters.items())),
+            ('histograms', OrderedDict((name, h.get_stats()) for name, h in self.histograms.items())),
         ])
         return stats
 
@@ -110,27 +270,76 @@ class MetrologyTask(object):
         self.steps.append(step)
         return step_exec
 
-    def upload_stats(self):
+    def get_stats(self):
+        return {
+            "steps": [step.get_stats() for step in getattr(self, 'steps', [])],
+            "meta": getattr(self, 'meta', None),
+        }
+
+    def upload_stats(self, content=None):
         if not self.can_upload():
             return
 
-        content = {"steps": [], "meta": getattr(self, 'meta', None)}
-
-        for step in getattr(self, 'steps', []):
-            content["steps"].append(step.get_stats())
-
+        if content is None:
+            content = self.get_stats()
         storage.push_content(
             settings.METROLOGY_BUCKET,
             self.metrology_path,
             json.dumps(content, indent=2),
             content_type="application/json")
 
+    def upload_stats_async(self):
+        """
+        Upload the stats in a thread, so that it overlaps with the completion
+        of the task. See `wait_for_uploads()`.
+        """
+        if not self.can_upload():
+            return
+
+        # Stats are gathered now, while serializing and uploading them are left
+        # to the thread.
+        thread = threading.Thread(target=_upload, args=(self, self.get_stats()))
+        with _uploads_lock:
+            _uploads.append(thread)
+        thread.start()
+
     @abc.abstractmethod
     def execute(self):
         pass
 
     def post_execute(self):
-        self.upload_stats()
+        if settings.METROLOGY_ASYNC_UPLOAD:
+            self.upload_stats_async()
+        else:
+            self.upload_stats()
+
+
+def _upload(task, content):
+    try:
+        task.upload_stats(content)
+    except Exception as err:
+        logger.warning('cannot upload metrology to {}: {}'.format(task.metrology_path, err))
+
+
+def wait_for_uploads(timeout=None):
+    """
+    Wait for the uploads started by `MetrologyTask.upload_stats_async()`.
+
+    :param timeout: maximum seconds to wait for all the uploads
+    :type timeout: Optional[float]
+    """
+    with _uploads_lock:
+        threads = list(_uploads)
+        del _uploads[:]
+    deadline = time.time() + timeout if timeout is not None else None
+    for thread in threads:
+        if deadline is not None:
+            thread.join(max(deadline - time.time(), 0))
+        else:
+            thread.join()
+        if thread.is_alive():
+            logger.warning('metrology upload still running after {}s, not waiting for it'.format(timeout))
+            return
 
 
 class MetrologyWorkflow(Workflow):
@@ -154,26 +363,72 @@ class MetrologyWorkflow(Workflow):
         """
         Fetch workflow history and merge it with metrology
         """
-        activity_keys = [obj for obj in storage.list_keys(
-            settings.METROLOGY_BUCKET,
-            self.metrology_path)]
-        history_dumped = dump_history_to_json(history)
-        history = json.loads(history_dumped)
-
-        for key in activity_keys:
-            if not key.key.startswith(os.path.join(self.metrology_path, 'activity.')):
-                continue
-            contents = key.get_contents_as_string(encoding='utf-8')
-            result = json.loads(contents)
-            search = ACTIVITY_KEY_RE.search(key.name)
-            name = search.group(1)
-            for h in history:
-                if h[0] == name:
-                    h[1]["metrology"] = result
-
-        storage.push_content(
-            settings.METROLOGY_BUCKET,
-            os.path.join(self.metrology_path, 'metrology.json'),
-            json.dumps(history, indent=2),
-            content_type="application/json"
-        )
+        # With local executions, activities run in this process
+        wait_for_uploads()
+        prefix = os.path.join(self.metrology_path, 'activity.')
+        key_names = [key.name for key in storage.list_keys(settings.METROLOGY_BUCKET, prefix)]
+        history = json.loads(dump_history_to_json(history))
+        tasks_by_id = defaultdict(list)
+        for task_id, task in history:
+            tasks_by_id[task_id].append(task)
+
+        for key_name, result in fetch_metrology(settings.METROLOGY_BUCKET, key_names):
+            name = ACTIVITY_KEY_RE.search(key_name).group(1)
+            for task in tasks_by_id.get(name, ()):
+                task["metrology"] = result
+
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.json') as f:
+            dump_json_list(history, f)
+            f.flush()
+            storage.push(
+                settings.METROLOGY_BUCKET,
+                os.path.join(self.metrology_path, 'metrology.json'),
+                f.name,
+                content_type="application/json"
+            )
+
+
+def _init_fetcher(bucket):
+    # One connection per thread
+    _fetcher.bucket = storage.get_bucket(bucket, new_connection=True)
+
+
+def _fetch(key_name):
+    # The keys were just listed: skip the HEAD request of get_key()
+    contents = _fetcher.bucket.new_key(key_name).get_contents_as_string(encoding='utf-8')
+    return key_name, json.loads(contents)
+
+
+def fetch_metrology(bucket, key_names, max_workers=None):
+    """
+    Download and parse metrology files concurrently.
+
+    :param key_names: keys of the files, those not matching `ACTIVITY_KEY_RE`
+                      are ignored
+    :type key_names: list[str]
+    :param max_workers: defaults to `settings.METROLOGY_DOWNLOAD_WORKERS`
+    :type max_workers: Optional[int]
+    :return: (key name, content) in no particular order
+    :rtype: Iterator[(str, Any)]
+    """
+    key_names = [name for name in key_names if ACTIVITY_KEY_RE.search(name)]
+    if not key_names:
+        return
+    max_workers = max_workers or settings.METROLOGY_DOWNLOAD_WORKERS
+    pool = ThreadPool(max(1, min(max_workers, len(key_names))), _init_fetcher, (bucket,))
+    try:
+        for item in pool.imap_unordered(_fetch, key_names):
+            yield item
+    finally:
+        pool.terminate()
+
+
+def dump_json_list(values, f):
+    """
+    Write *values* as a JSON list to *f*, one item at a time.
+    """
+    f.write('[')
+    for i, value in enumerate(values):
+        f.write(',\n' if i else '\n')
+        json.dump(value, f, indent=2)
+    f.write('\n]' if values else ']')
@@ -0,0 +1,89 @@
+import math
+
+from simpleflow import logger
+
+
+class Autoscaler(object):
+    """
+    Computes how many children a `Supervisor` should run, depending on the
+    backlog of tasks waiting to be picked.
+
+    The backlog is given by a `counter` callable returning a number of pending
+    tasks, typically `swf.actors.ActivityWorker.count_pending` (which calls
+    CountPendingActivityTasks) or `swf.actors.Decider.count_pending`, but any
+    local probe returning a count works.
+
+    The policy is deliberately simple:
+    - if some tasks are pending, every child is busy: grow by one child per
+      `backlog_per_child` pending tasks;
+    - if nothing has been pending for `scale_down_delay` seconds, shrink by
+      one child;
+    - the result is always kept between `min_children` and `max_children`.
+    """
+
+    def __init__(self, counter, min_children=1, max_children=None,
+                 backlog_per_child=1, interval=30, scale_down_delay=300):
+        """
+        :param counter: callable returning the number of pending tasks
+        :type counter: callable
+        :param min_children: lower bound on the number of children
+        :type min_children: int
+        :param max_children: upper bound on the number of children
+        :type max_children: int
+        :param backlog_per_child: number of pending tasks triggering one more child
+        :type backlog_per_child: int
+        :param interval: number of seconds between two backlog checks
+        :type interval: float
+        :param scale_down_delay: number of seconds without backlog before shrinking
+        :type scale_down_delay: float
+        """
+        if max_children is None:
+            max_children = min_children
+        if min_children < 0 or max_children < min_children:
+            raise ValueError("invalid autoscaling bounds: min={} max={}".format(
+                min_children, max_children))
+        self.counter = counter
+        self.min_children = min_children
+        self.max_children = max_children
+        self.backlog_per_child = max(1, backlog_per_child)
+        self.interval = interval
+        self.scale_down_delay = scale_down_delay
+
+        self._idle_since = None
+
+    def clamp(self, nb_children):
+        return max(self.min_children, min(self.max_children, nb_children))
+
+    def compute(self, current, now):
+        """
+        Return the number of children we want, given the current one.
+
+        :param current: current number of children
+        :type current: int
+        :param now: current (monotonic) time, in seconds
+        :type now: float
+        :rtype: int
+        """
+        try:
+            backlog = self.counter()
+        except Exception as err:
+            logger.warning("autoscaler: cannot count pending tasks: {}".format(err))
+            return self.clamp(current)
+
+        if backlog > 0:
+            self._idle_since = None
+            wanted = current + int(math.ceil(float(backlog) / self.backlog_per_child))
+        else:
+            if self._idle_since is None:
+                self._idle_since = now
+            wanted = current
+            if now - self._idle_since >= self.scale_down_delay:
+                wanted = current - 1
+                # wait another full delay before shrinking again
+                self._idle_since = now
+
+        wanted = self.clamp(wanted)
+        if wanted != current:
+            logger.info("autoscaler: backlog={} children: {} -> {}".format(
+                backlog, current, wanted))
+        return wanted
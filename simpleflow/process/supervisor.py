@@ -1,12 +1,13 @@
+import errno
+import fcntl
 import functools
 import multiprocessing
 import os
+import select
 import signal
 import time
 import types
 
-import psutil
-
 from simpleflow import logger
 from .named_mixin import NamedMixin, with_state
 
@@ -23,6 +24,11 @@ def reset_signal_handlers(func):
         signal.signal(signal.SIGTERM, signal.SIG_DFL)
         signal.signal(signal.SIGINT, signal.SIG_DFL)
         signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        try:
+            # don't wake up the supervisor loop when the child catches a signal
+            signal.set_wakeup_fd(-1)
+        except ValueError:  # not in the main thread
+            pass
         return func(*args, **kwargs)
 
     wrapped.__wrapped__ = func
@@ -45,6 +51,50 @@ def _void_handle_sigchld(signum, frame):
     pass
 
 
+# time.monotonic() is not available on python 2
+_now = getattr(time, "monotonic", time.time)
+
+
+def _set_non_blocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+class _Slot(object):
+    """
+    Book-keeping for one worker "slot" of a Supervisor: the process currently
+    occupying it and some restart statistics.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.started_at = None
+        self.nb_starts = 0
+        self.consecutive_failures = 0
+        self.next_start_at = 0.0
+        self.draining = False
+
+    @property
+    def restarts(self):
+        return max(0, self.nb_starts - 1)
+
+    @property
+    def uptime(self):
+        if self.process is None or self.started_at is None:
+            return 0.0
+        return _now() - self.started_at
+
+    def as_dict(self):
+        return {
+            "slot": self.index,
+            "pid": self.process.pid if self.process is not None else None,
+            "uptime": self.uptime,
+            "restarts": self.restarts,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
 class Supervisor(NamedMixin):
     """
     The `Supervisor` class is responsible for managing one or many worker processes
@@ -56,9 +106,29 @@ class Supervisor(NamedMixin):
     It also has its roots in the former simpleflow process manager and some of Botify
     private code which wasn't really well tested, and was re-written in a TDD-y
     style.
-    """
 
-    def __init__(self, payload, arguments=None, nb_children=None, background=False):
+    The supervisor loop is event-driven: it sleeps on a self-pipe registered
+    with `signal.set_wakeup_fd()`, so a SIGCHLD (or SIGTERM/SIGINT) wakes it up
+    immediately and dead children are reaped with a non-blocking `waitpid()`
+    instead of scanning /proc. Children that die shortly after being started
+    (less than `min_uptime` seconds) are considered crash-looping, and their
+    slot is restarted with an exponential backoff capped at `max_restart_backoff`.
+
+    If an `Autoscaler` is passed, the number of children is adjusted to the
+    backlog every `autoscaler.interval` seconds; extra children are drained
+    with a SIGTERM so they finish their current task before exiting.
+    """
+    # a child living less than this number of seconds is considered a crash
+    min_uptime = 10.0
+    # backoff applied to a crash-looping slot: base * 2^(consecutive crashes - 2),
+    # i.e. the first crash is restarted immediately
+    restart_backoff = 1.0
+    max_restart_backoff = 60.0
+    # safety net in case we cannot rely on signal.set_wakeup_fd()
+    fallback_poll_interval = 5.0
+
+    def __init__(self, payload, arguments=None, nb_children=None, background=False,
+                 autoscaler=None):
         """
         Initializes a Manager() instance, with a payload (a callable that will be
         executed on worker processes), some arguments (a list or tuple of arguments
@@ -73,12 +143,20 @@ class Supervisor(NamedMixin):
         :type nb_children: int
         :param background: wether the supervisor process should launch in background
         :type background: bool
+        :param autoscaler: optional policy adjusting nb_children to the backlog
+        :type autoscaler: simpleflow.process.Autoscaler
         """
         # NB: below, compare explicitly to "None" there because nb_children could be 0
         if nb_children is None:
-            self._nb_children = multiprocessing.cpu_count()
-        else:
-            self._nb_children = nb_children
+            if autoscaler is not None:
+                nb_children = autoscaler.min_children
+            else:
+                nb_children = multiprocessing.cpu_count()
+        if autoscaler is not None:
+            nb_children = autoscaler.clamp(nb_children)
+        self._nb_children = nb_children
+        self._autoscaler = autoscaler
+        self._next_autoscale_at = 0.0
         self._payload = payload
         self._payload_friendly_name = self.payload_friendly_name()
         self._named_mixin_properties = ["_payload_friendly_name", "_nb_children"]
@@ -86,7 +164,10 @@ class Supervisor(NamedMixin):
         self._background = background
 
         self._processes = {}
+        self._slots = []
         self._terminating = False
+        self._started_at = None
+        self._wakeup_fds = None
 
         super(Supervisor, self).__init__()
 
@@ -103,34 +184,82 @@ class Supervisor(NamedMixin):
         else:
             self.target()
 
-    def _cleanup_worker_processes(self):
-        # cleanup children
-        to_remove = []
-        for pid, child in self._processes.items():
-            try:
-                name, status = child.name(), child.status()
-            except psutil.NoSuchProcess:  # May be untimely deceased
-                name, status = "unknown", "unknown"
-            logger.debug("  child: name=%s pid=%d status=%s" % (name, child.pid, status))
-            if status in (psutil.STATUS_ZOMBIE, "unknown"):
-                logger.debug("  process {} is zombie, will cleanup".format(child.pid))
-                # join process to clean it up
-                child.wait()
-                # set the process to be removed from self._processes
-                to_remove.append(pid)
-
-        # cleanup our internal state (self._processes)
-        for pid in to_remove:
-            del self._processes[pid]
+    @property
+    def total_restarts(self):
+        return sum(slot.restarts for slot in self._slots)
+
+    def stats(self):
+        """
+        Counters about the supervised processes, useful for monitoring crash loops.
+
+        :rtype: dict
+        """
+        return {
+            "uptime": _now() - self._started_at if self._started_at is not None else 0.0,
+            "nb_children": self._nb_children,
+            "restarts": self.total_restarts,
+            "slots": [slot.as_dict() for slot in self._slots],
+        }
+
+    def _compute_restart_delay(self, slot):
+        """
+        Delay before restarting a slot, depending on how many times in a row
+        its process crashed.
+
+        :type slot: _Slot
+        :rtype: float
+        """
+        if slot.consecutive_failures <= 1:
+            return 0.0
+        delay = self.restart_backoff * 2 ** (slot.consecutive_failures - 2)
+        return min(delay, self.max_restart_backoff)
+
+    def _reap_worker_processes(self):
+        """
+        Remove finished children from our internal state. This only issues a
+        non-blocking `waitpid()` per child (through `Process.exitcode`).
+        """
+        now = _now()
+        for slot in self._slots:
+            child = slot.process
+            if child is None or child.exitcode is None:
+                continue
+            uptime = now - slot.started_at
+            logger.debug("  process {} exited with code={} after {:.1f}s".format(
+                child.pid, child.exitcode, uptime))
+            del self._processes[child.pid]
+            slot.process = None
+            slot.started_at = None
+            if slot.draining:
+                # stopped on purpose, not a crash
+                slot.draining = False
+                slot.next_start_at = now
+                continue
+            if uptime < self.min_uptime:
+                slot.consecutive_failures += 1
+            else:
+                slot.consecutive_failures = 0
+            delay = self._compute_restart_delay(slot)
+            if delay:
+                logger.warning(
+                    "process: slot={} is crash-looping ({} consecutive failures), "
+                    "restarting in {:.1f}s".format(slot.index, slot.consecutive_failures, delay))
+            slot.next_start_at = now + delay
 
     def _start_worker_processes(self):
         """
         Start missing worker processes depending on self._nb_children and the current
-        processes stored in self._processes.
+        state of self._slots. Slots in backoff are left empty until their delay expires.
         """
         if self._terminating:
             return
-        for _ in range(len(self._processes), self._nb_children):
+        for index in range(len(self._slots), self._nb_children):
+            self._slots.append(_Slot(index))
+
+        now = _now()
+        for slot in self._slots[:self._nb_children]:
+            if slot.process is not None or slot.next_start_at > now:
+                continue
             child = multiprocessing.Process(
                 target=reset_signal_handlers(self._payload),
                 args=self._args
@@ -144,7 +273,85 @@ class Supervisor(NamedMixin):
             # fork. So no big risk, but I add an assertion just in case anyway.
             pid = child.pid
             assert pid, "Cannot add process with pid={}: {}".format(pid, child)
-            self._processes[pid] = psutil.Process(pid)
+            slot.nb_starts += 1
+            slot.process = child
+            slot.started_at = now
+            self._processes[pid] = child
+
+    def resize(self, nb_children):
+        """
+        Change the number of children. Extra children are sent a SIGTERM so they
+        stop gracefully after their current task; missing ones are started by the
+        main loop.
+
+        :param nb_children: new number of children
+        :type nb_children: int
+        """
+        if nb_children == self._nb_children:
+            return
+        logger.info("process: resizing from {} to {} children".format(
+            self._nb_children, nb_children))
+        self._nb_children = nb_children
+        for slot in self._slots[nb_children:]:
+            if slot.process is not None and not slot.draining:
+                logger.info("process: draining slot={} pid={}".format(slot.index, slot.process.pid))
+                slot.draining = True
+                slot.process.terminate()
+        self.set_process_name()
+
+    def _autoscale(self):
+        if self._autoscaler is None or self._terminating:
+            return
+        now = _now()
+        if now < self._next_autoscale_at:
+            return
+        self._next_autoscale_at = now + self._autoscaler.interval
+        self.resize(self._autoscaler.compute(self._nb_children, now))
+
+    def _next_wakeup_timeout(self):
+        """
+        Number of seconds the main loop can sleep if no signal happens: until the
+        next slot in backoff can be restarted or the next autoscaling check, or
+        forever.
+
+        :rtype: float | None
+        """
+        now = _now()
+        pending = [
+            slot.next_start_at for slot in self._slots[:self._nb_children]
+            if slot.process is None
+        ]
+        if self._autoscaler is not None:
+            pending.append(self._next_autoscale_at)
+        timeout = max(0.0, min(pending) - now) if pending else None
+        if self._wakeup_fds is None:
+            timeout = min(timeout, self.fallback_poll_interval) if timeout is not None \
+                else self.fallback_poll_interval
+        return timeout
+
+    def _wait_for_events(self, timeout):
+        """
+        Sleep until a signal is caught or timeout expires.
+        """
+        if self._wakeup_fds is None:
+            # a caught signal interrupts time.sleep() anyway (see _void_handle_sigchld)
+            time.sleep(timeout)
+            return
+        read_fd = self._wakeup_fds[0]
+        try:
+            readable, _, _ = select.select([read_fd], [], [], timeout)
+        except (select.error, OSError) as err:
+            # python 2 doesn't retry on EINTR (PEP 475)
+            if err.args[0] != errno.EINTR:
+                raise
+            return
+        if readable:
+            try:
+                while os.read(read_fd, 4096):
+                    pass
+            except OSError as err:
+                if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise
 
     def target(self):
         """
@@ -158,28 +365,27 @@ class Supervisor(NamedMixin):
         if len(self._processes) != 0:
             raise Exception("Child processes map is not empty, already called .start() ?")
 
+        self._started_at = _now()
+
         # wait for all processes to finish
         while True:
             # if terminating, join all processes and exit the loop so we finish
             # the supervisor process
             if self._terminating:
-                for proc in self._processes.values():
+                for proc in list(self._processes.values()):
                     logger.info("process: waiting for proces={} to finish.".format(proc))
-                    proc.wait()
+                    proc.join()
                 break
 
-            # start worker processes
-            self._cleanup_worker_processes()
+            # reap dead children and (re)start worker processes
+            self._autoscale()
+            self._reap_worker_processes()
             self._start_worker_processes()
 
-            # re-evaluate state at least every 5 seconds ; if a SIGCHLD happens during
-            # the "time.sleep()" below, it will be interrupted, making the code above
-            # run nearly immediately ; but if a SIGCHLD happens during the two calls
-            # above, the "time.sleep()" here won't be stopped, so better have it
-            # relatively short, but not too short since the above methods involve
-            # scanning a bunch of entries in /proc so that could become slow if we do
-            # it every 0.1s.
-            time.sleep(5)
+            # sleep until something happens: a SIGCHLD, SIGTERM or SIGINT writes
+            # to the wakeup fd, so there's no lost wake-up even if the signal
+            # arrives during the two calls above.
+            self._wait_for_events(self._next_wakeup_timeout())
 
     def bind_signal_handlers(self):
         """
@@ -187,6 +393,9 @@ class Supervisor(NamedMixin):
         - SIGTERM and SIGINT lead to a graceful shutdown
         - SIGCHLD is intentionally left to a void handler, see comment
         - other signals are not modified for now
+
+        Caught signals are also written to a self-pipe (see `signal.set_wakeup_fd()`)
+        the main loop is waiting on.
         """
 
         # NB: Function is nested to have a reference to *self*.
@@ -204,6 +413,19 @@ class Supervisor(NamedMixin):
         # bind SIGCHLD
         signal.signal(signal.SIGCHLD, _void_handle_sigchld)
 
+        # wake the main loop up on signals
+        if self._wakeup_fds is None:
+            read_fd, write_fd = os.pipe()
+            _set_non_blocking(read_fd)
+            _set_non_blocking(write_fd)
+            try:
+                signal.set_wakeup_fd(write_fd)
+            except ValueError:  # not in the main thread: fall back to polling
+                os.close(read_fd)
+                os.close(write_fd)
+            else:
+                self._wakeup_fds = (read_fd, write_fd)
+
     @with_state("stopping")
     def terminate(self):
         """
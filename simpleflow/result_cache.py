@@ -0,0 +1,191 @@
+"""
+Results of activities marked as cacheable, shared by workflow executions.
+
+Workers store the result of these activities under a key computed from the
+activity's name and version and the task's arguments. Before scheduling such
+an activity, the SWF decider looks the key up: on a hit, the result is
+recorded in a marker instead and the activity isn't executed.
+
+The cache is configured with `SIMPLEFLOW_ACTIVITY_CACHE`: either
+``s3://bucket/prefix`` or a local directory.
+"""
+import abc
+import errno
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+import six
+
+from simpleflow import format, logger, settings, storage
+from simpleflow.utils import json_dumps
+
+CACHE_MARKER = 'simpleflow.cache'
+
+
+def make_key(activity, args, kwargs):
+    """
+    Key of the result of *activity* called with *args* and *kwargs*.
+
+    :type activity: simpleflow.activity.Activity
+    :type args: Sequence
+    :type kwargs: dict
+    :rtype: str
+    """
+    arguments = json_dumps({'version': activity.version, 'args': args, 'kwargs': kwargs})
+    digest = hashlib.sha256(arguments.encode('utf-8')).hexdigest()
+    return '{}/{}'.format(re.sub(r'[^\w.-]', '_', activity.name), digest)
+
+
+@six.add_metaclass(abc.ABCMeta)
+class ResultCache(object):
+    """
+    Storage of JSON-encoded results. Entries are stored with their creation
+    time, so that readers can ignore the old ones.
+    """
+    def get(self, key, ttl=None):
+        """
+        :param ttl: maximum age of the entry in seconds, if any
+        :type ttl: Optional[int]
+        :return: the JSON-encoded result, or None if missing or expired
+        :rtype: Optional[str]
+        """
+        data = self._read(key)
+        if data is None:
+            return None
+        created_at, _, content = data.partition('\n')
+        if ttl is not None and float(created_at) + ttl < time.time():
+            return None
+        return content
+
+    def set(self, key, content):
+        """
+        :param content: JSON-encoded result
+        :type content: str
+        """
+        self._write(key, '{!r}\n{}'.format(time.time(), content))
+
+    @abc.abstractmethod
+    def _read(self, key):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _write(self, key, data):
+        raise NotImplementedError
+
+
+class DiskResultCache(ResultCache):
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self.directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, *key.split('/'))
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read().decode('utf-8')
+        except (IOError, OSError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return None
+
+    def _write(self, key, data):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data.encode('utf-8'))
+            # atomic: readers never see a partial entry
+            os.rename(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class S3ResultCache(ResultCache):
+    def __init__(self, bucket, prefix=''):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self.bucket, self.prefix)
+
+    def _path(self, key):
+        return '{}/{}'.format(self.prefix, key) if self.prefix else key
+
+    def _read(self, key):
+        s3_key = storage.get_key(self.bucket, self._path(key))
+        if s3_key is None:
+            return None
+        return s3_key.get_contents_as_string(encoding='utf-8')
+
+    def _write(self, key, data):
+        storage.push_content(self.bucket, self._path(key), data, content_type='text/plain')
+
+
+def get_result_cache(location=None):
+    """
+    :param location: ``s3://bucket/prefix`` or a local directory; defaults
+                     to `SIMPLEFLOW_ACTIVITY_CACHE`
+    :type location: Optional[str]
+    :return: the cache, or None if not configured
+    :rtype: Optional[ResultCache]
+    """
+    location = location or settings.SIMPLEFLOW_ACTIVITY_CACHE
+    if not location:
+        return None
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        return S3ResultCache(bucket, prefix)
+    if location.startswith('file://'):
+        location = location[len('file://'):]
+    return DiskResultCache(location)
+
+
+def get_ttl(activity):
+    """
+    :type activity: simpleflow.activity.Activity
+    :return: maximum age of the cached results of *activity*, in seconds
+    :rtype: Optional[int]
+    """
+    if activity.cache_ttl is not None:
+        return activity.cache_ttl
+    return settings.SIMPLEFLOW_ACTIVITY_CACHE_TTL or None
+
+
+def store_result(activity, args, kwargs, result, cache=None):
+    """
+    Store the result of a cacheable activity. Errors are logged: the result
+    is only missing for later executions.
+
+    :type activity: simpleflow.activity.Activity
+    :param result: result, possibly already JSON-encoded
+    :type result: Any | simpleflow.format.EncodedJSON
+    :type cache: Optional[ResultCache]
+    """
+    cache = cache or get_result_cache()
+    if cache is None:
+        return
+    if isinstance(result, format.EncodedJSON):
+        content = result.content
+    else:
+        content = json_dumps(result)
+    key = make_key(activity, args, kwargs)
+    try:
+        cache.set(key, content)
+    except Exception as err:
+        logger.warning('cannot store result of {} in {}: {}'.format(activity.name, cache, err))
+    else:
+        logger.debug('stored result of {} in {}: {}'.format(activity.name, cache, key))
@@ -1,6 +1,7 @@
 import sys
 
 from future.utils import iteritems
+from six import string_types
 
 from . import default
 
@@ -59,6 +60,13 @@ def str_or_none(val):
     return val or None
 
 
+def str_to_bool(val):
+    # environment variables are strings
+    if isinstance(val, string_types):
+        return val.lower() in ('1', 'true', 'yes', 'on')
+    return bool(val)
+
+
 WORKFLOW_DEFAULT_TASK_LIST = str
 WORKFLOW_DEFAULT_VERSION = str
 WORKFLOW_DEFAULT_EXECUTION_TIME = str
@@ -74,6 +82,8 @@ ACTIVITY_HEARTBEAT_TIMEOUT = str
 
 LOGGING = dict
 SIMPLEFLOW_SYSLOG_TARGET = str_or_none
+SIMPLEFLOW_LOG_FORMAT = str
+SIMPLEFLOW_LOG_QUEUE = str_to_bool
 
 SIMPLEFLOW_S3_HOST = str
 SIMPLEFLOW_S3_SSE = bool
@@ -82,8 +92,33 @@ STEP_BUCKET = str
 
 METROLOGY_BUCKET = str
 METROLOGY_PATH_PREFIX = str_or_none
+METROLOGY_DOWNLOAD_WORKERS = int
+METROLOGY_ASYNC_UPLOAD = str_to_bool
+METROLOGY_UPLOAD_TIMEOUT = float
 
 SIMPLEFLOW_ENABLE_DISK_CACHE = bool
 SIMPLEFLOW_BINARIES_DIRECTORY = str
+SIMPLEFLOW_BINARIES_DOWNLOAD_WORKERS = int
+SIMPLEFLOW_BINARIES_PART_SIZE = int
+
+SIMPLEFLOW_ENABLE_HISTORY_ARCHIVE = str_to_bool
+SIMPLEFLOW_HISTORY_ARCHIVE_DIRECTORY = str
+SIMPLEFLOW_HISTORY_ARCHIVE_MAX_SIZE = int
+
+SIMPLEFLOW_RETRY_MAX_DELAY = float
+SIMPLEFLOW_RETRY_BUDGET_RATIO = float
+
+SIMPLEFLOW_LOCAL_MAX_WORKERS = int
+SIMPLEFLOW_LOCAL_POOL = str
+
+SIMPLEFLOW_ACTIVITY_CACHE = str_or_none
+SIMPLEFLOW_ACTIVITY_CACHE_TTL = int
+
+SIMPLEFLOW_INLINE_ACTIVITY_TIMEOUT = float
+SIMPLEFLOW_INLINE_ACTIVITIES_BUDGET = float
+SIMPLEFLOW_INLINE_ACTIVITY_MAX_SIZE = int
+
+SIMPLEFLOW_K8S_BATCH_SIZE = int
+SIMPLEFLOW_K8S_BATCH_MAX_WAIT = float
 
 ACTIVITY_SIGTERM_WAIT_SEC = float
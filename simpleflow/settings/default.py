@@ -22,6 +22,12 @@ STEP_BUCKET = 'step_bucket'
 
 METROLOGY_BUCKET = 'metrology_bucket'
 METROLOGY_PATH_PREFIX = None
+# Number of activities metrology files downloaded concurrently by the decider
+METROLOGY_DOWNLOAD_WORKERS = 8
+# Upload the metrology of an activity while its task is being completed
+METROLOGY_ASYNC_UPLOAD = True
+# Maximum seconds an activity worker waits for these uploads
+METROLOGY_UPLOAD_TIMEOUT = 30.0
 
 LOGGING = {
     'version': 1,
@@ -51,9 +57,48 @@ LOGGING = {
     }
 }
 SIMPLEFLOW_SYSLOG_TARGET = None
+# Log in JSON lines ('json') instead of text ('text')
+SIMPLEFLOW_LOG_FORMAT = 'text'
+# Format and write logs in a background thread
+SIMPLEFLOW_LOG_QUEUE = False
 
 SIMPLEFLOW_ENABLE_DISK_CACHE = False
 SIMPLEFLOW_BINARIES_DIRECTORY = '/tmp/simpleflow-binaries'
+# Number of binaries, or of parts of a large binary, downloaded concurrently
+SIMPLEFLOW_BINARIES_DOWNLOAD_WORKERS = 4
+SIMPLEFLOW_BINARIES_PART_SIZE = 16 * 1024 * 1024  # bytes
+
+# Local archive of closed workflow executions histories
+SIMPLEFLOW_ENABLE_HISTORY_ARCHIVE = False
+SIMPLEFLOW_HISTORY_ARCHIVE_DIRECTORY = '/tmp/simpleflow-histories'
+SIMPLEFLOW_HISTORY_ARCHIVE_MAX_SIZE = 512 * 1024 * 1024  # bytes
+
+# Retries of SWF calls by pollers: maximum delay between two attempts, and
+# retries allowed per call over a minute (at least 10)
+SIMPLEFLOW_RETRY_MAX_DELAY = 60  # seconds
+SIMPLEFLOW_RETRY_BUDGET_RATIO = 0.2
+
+# Local executions: number of activities run at the same time, in a pool of
+# processes or threads (where activities share their `context` attribute)
+SIMPLEFLOW_LOCAL_MAX_WORKERS = 1
+SIMPLEFLOW_LOCAL_POOL = 'process'
+
+# Results of cacheable activities: "s3://bucket/prefix" or a local directory,
+# and how long they can be reused
+SIMPLEFLOW_ACTIVITY_CACHE = None
+SIMPLEFLOW_ACTIVITY_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# Inline activities, executed by the SWF decider: time limit of each one,
+# total time spent on them by a decision, and maximum size of their JSON
+# arguments and result. Beyond, they are scheduled on workers.
+SIMPLEFLOW_INLINE_ACTIVITY_TIMEOUT = 1.0  # seconds
+SIMPLEFLOW_INLINE_ACTIVITIES_BUDGET = 5.0  # seconds
+SIMPLEFLOW_INLINE_ACTIVITY_MAX_SIZE = 8192  # bytes
+
+# Kubernetes process mode: number of polled activity tasks a job can process
+SIMPLEFLOW_K8S_BATCH_SIZE = 1
+# ... and maximum seconds a batch waits for more tasks, checked before each poll
+SIMPLEFLOW_K8S_BATCH_MAX_WAIT = 10.0
 
 # Activity management
 
@@ -0,0 +1,141 @@
+import json
+import os
+import re
+
+from simpleflow import format, storage
+from simpleflow.constants import MAX_DETAILS_LENGTH
+from simpleflow.utils import json_dumps, retry
+from .constants import UNKNOWN_CONTEXT
+
+MANIFEST_MARKER = 'step.manifest'
+
+
+@retry.with_delay(nb_times=3, delay=retry.exponential, name='step_manifest')
+def _get_key(bucket, path):
+    return storage.get_key(bucket, path)
+
+
+@retry.with_delay(nb_times=3, delay=retry.exponential, name='step_manifest')
+def _list_keys(bucket, prefix):
+    return list(storage.list_keys(bucket, prefix))
+
+
+@retry.with_delay(nb_times=3, delay=retry.exponential, name='step_manifest')
+def _push_content(bucket, path, content):
+    storage.push_content(bucket, path, content, content_type='application/json')
+
+
+class StepManifest(object):
+    """
+    Steps done, stored in one S3 object per execution instead of one object
+    per step. Each execution writes the steps it did next to the manifest:
+
+        steps.executions/<run_id>.json: {"steps": {"my_step": {"run_id": ..., "workflow_id": ..., "version": ...}}}
+
+    so executions sharing the steps never overwrite each other's ones, and
+    reading the manifest merges them. The manifest itself, ``steps.json``,
+    is only read, e.g. if written by an older version.
+
+    :ivar steps: context of the execution that did each step, by step name
+    :type steps: dict[str, dict]
+    """
+
+    def __init__(self, steps=None):
+        self.steps = steps or {}
+
+    def __repr__(self):
+        return '<{} steps={}>'.format(self.__class__.__name__, sorted(self.steps))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(dict(data.get('steps') or {}))
+
+    def to_dict(self):
+        return {'steps': self.steps}
+
+    @classmethod
+    def from_marker_details(cls, details):
+        steps = details['steps']
+        if not isinstance(steps, list):
+            steps = format.decode(steps, use_proxy=False)
+        return cls({step: {} for step in steps})
+
+    def to_marker_details(self):
+        """
+        Details of a marker keeping the manifest: only the step names, as a
+        jumbo field if they don't fit.
+
+        :rtype: dict
+        :raise: format.JumboTooLargeError
+        """
+        details = {'steps': sorted(self.steps)}
+        if len(json_dumps(details)) > MAX_DETAILS_LENGTH:
+            # JSON strings are at most twice longer once escaped
+            details['steps'] = format.encode(json_dumps(details['steps']), (MAX_DETAILS_LENGTH - 1024) // 2)
+        return details
+
+    @staticmethod
+    def get_executions_prefix(path):
+        """
+        :param path: path of the manifest
+        :type path: str
+        :return: path prefix of the objects of the executions
+        :rtype: str
+        """
+        return '{}.executions/'.format(os.path.splitext(path)[0])
+
+    @classmethod
+    def load(cls, bucket, path, legacy_prefix=None):
+        """
+        Read the manifest, merged with the steps of each execution. If it
+        doesn't exist, steps marked as done by `MarkStepDoneTask` under
+        *legacy_prefix* are taken instead.
+
+        :param bucket: bucket, possibly prefixed by its host
+        :type bucket: str
+        :param path: path of the manifest
+        :type path: str
+        :param legacy_prefix: path prefix of the per-step objects
+        :type legacy_prefix: Optional[str]
+        :rtype: StepManifest
+        """
+        key = _get_key(bucket, path)
+        if key is not None:
+            manifest = cls.from_dict(json.loads(key.get_contents_as_string(encoding='utf-8')))
+        else:
+            manifest = cls()
+            if legacy_prefix:
+                prefix = legacy_prefix.rstrip('/') + '/'
+                for key in _list_keys(bucket, prefix):
+                    manifest.steps[key.key[len(prefix):]] = {}
+        for key in _list_keys(bucket, cls.get_executions_prefix(path)):
+            manifest.steps.update(cls.from_dict(json.loads(key.get_contents_as_string(encoding='utf-8'))).steps)
+        return manifest
+
+    @classmethod
+    def save_execution_steps(cls, bucket, path, context, step_names):
+        """
+        Add *step_names* to the steps done by the execution of *context*.
+        Only this execution writes its object, so reading it first is safe;
+        local executions, which share theirs, run one after the other.
+
+        :type bucket: str
+        :param path: path of the manifest
+        :type path: str
+        :type context: dict
+        :type step_names: collections.Iterable[str]
+        """
+        content = {
+            key: context.get(key, default) for key, default in UNKNOWN_CONTEXT.items()
+        }
+        execution_path = '{}{}.json'.format(
+            cls.get_executions_prefix(path),
+            re.sub(r'[^\w.=-]', '_', content['run_id']),
+        )
+        key = _get_key(bucket, execution_path)
+        if key is not None:
+            manifest = cls.from_dict(json.loads(key.get_contents_as_string(encoding='utf-8')))
+        else:
+            manifest = cls()
+        manifest.steps.update((step_name, content) for step_name in step_names)
+        _push_content(bucket, execution_path, json.dumps(manifest.to_dict(), sort_keys=True))
@@ -59,15 +59,22 @@ class Step(SubmittableContainer):
                 marker_done["status"] = "completed"
 
                 workflow.add_forced_steps(self.force_steps_if_executed, 'Dep of {}'.format(self.step_name))
-                chain += (
-                    workflow.record_marker('log.step', marker),
-                    self.activities,
-                    (activity.Activity(MarkStepDoneTask, **workflow._get_step_activity_params()),
-                     workflow.get_step_bucket(),
-                     workflow.get_step_path_prefix(),
-                     self.step_name),
-                    workflow.record_marker('log.step', marker_done)
-                )
+                if getattr(workflow, 'use_step_manifest', False):
+                    chain += (
+                        workflow.record_marker('log.step', marker),
+                        self.activities,
+                        FuncGroup(workflow.save_step_done, self.step_name, marker_done),
+                    )
+                else:
+                    chain += (
+                        workflow.record_marker('log.step', marker),
+                        self.activities,
+                        (activity.Activity(MarkStepDoneTask, **workflow._get_step_activity_params()),
+                         workflow.get_step_bucket(),
+                         workflow.get_step_path_prefix(),
+                         self.step_name),
+                        workflow.record_marker('log.step', marker_done)
+                    )
             else:
                 marker["status"] = "skipped"
                 if step_is_skipped_by_force(self.step_name, skipped_steps):
@@ -90,6 +97,9 @@ class Step(SubmittableContainer):
             chain.bubbles_exception_on_failure = self.bubbles_exception_on_failure
             return chain
 
+        if getattr(workflow, 'use_step_manifest', False):
+            return workflow.submit(fn_steps_done(workflow.get_steps_done_from_manifest()))
+
         return workflow.submit(Chain(
             workflow.get_steps_done_activity(),
             FuncGroup(fn_steps_done),
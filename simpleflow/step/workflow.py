@@ -3,12 +3,17 @@ import copy
 from collections import defaultdict
 
 from .constants import STEP_ACTIVITY_PARAMS_DEFAULT
+from .manifest import MANIFEST_MARKER, StepManifest
 from .submittable import Step
 from .tasks import GetStepsDoneTask
 from simpleflow import activity, settings, task
 
 
 class WorkflowStepMixin(object):
+    # Keep the steps done in a manifest, read once per execution by the
+    # decider, instead of an activity listing them for each step and another
+    # one marking each step done.
+    use_step_manifest = False
 
     def get_step_bucket(self):
         """
@@ -87,3 +92,69 @@ class WorkflowStepMixin(object):
     def get_steps_done(self):
         return self.submit(
             self.get_steps_done_activity()).result
+
+    def get_step_manifest_path(self):
+        """
+        Return the S3 path of the steps manifest, next to the steps prefix
+        """
+        return self.get_step_path_prefix().rstrip('/') + '.json'
+
+    def get_step_manifest(self):
+        """
+        Return the steps manifest as of the start of the execution: it's read
+        on the first decision and its step names are recorded in a marker that
+        later decisions replay.
+
+        :rtype: StepManifest
+        :raise: format.JumboTooLargeError if the step names don't fit in a
+                marker and there's no jumbo fields bucket
+        """
+        for marker in self.list_markers(all=True):
+            if marker.name == MANIFEST_MARKER:
+                return StepManifest.from_marker_details(marker.details)
+        manifest = getattr(self, '_step_manifest', None)
+        if manifest is None:
+            manifest = self._step_manifest = self.load_step_manifest()
+        # Without the marker, the next decisions would read steps done since
+        self.submit(self.record_marker(MANIFEST_MARKER, manifest.to_marker_details()))
+        return manifest
+
+    def load_step_manifest(self):
+        return StepManifest.load(
+            self.get_step_bucket(),
+            self.get_step_manifest_path(),
+            legacy_prefix=self.get_step_path_prefix(),
+        )
+
+    def get_steps_completed(self):
+        """
+        Return the steps completed by this execution, from their markers
+        """
+        return set(
+            marker.details['step'] for marker in self.list_markers(all=True)
+            if marker.name == 'log.step' and isinstance(marker.details, dict) and
+            marker.details.get('status') == 'completed'
+        )
+
+    def get_steps_done_from_manifest(self):
+        return list(set(self.get_step_manifest().steps) | self.get_steps_completed())
+
+    def save_step_done(self, step_name, marker_done):
+        """
+        Add *step_name* to the steps of this execution, then return the marker
+        recording its completion. The decision recording the marker also
+        writes these steps, in an object of this execution only.
+        """
+        steps_completed = self.get_steps_completed()
+        if step_name not in steps_completed:
+            # Steps saved by this decision aren't in the history yet
+            if not hasattr(self, 'steps_saved'):
+                self.steps_saved = set()
+            self.steps_saved.add(step_name)
+            StepManifest.save_execution_steps(
+                self.get_step_bucket(),
+                self.get_step_manifest_path(),
+                self.get_run_context(),
+                steps_completed | self.steps_saved,
+            )
+        return self.record_marker('log.step', marker_done)
@@ -15,6 +15,10 @@ BUCKET_CACHE = {}
 BUCKET_LOCATIONS_CACHE = {}
 
 
+class ObjectChangedError(Exception):
+    pass
+
+
 def get_connection(host_or_region):
     # type: (str) -> connection.S3Connection
     # first case: we got a valid DNS (host)
@@ -73,10 +77,17 @@ def sanitize_bucket_and_host(bucket):
     return bucket, location
 
 
-def get_bucket(bucket_name):
-    # type: (str) -> Bucket
+def get_bucket(bucket_name, new_connection=False):
+    # type: (str, bool) -> Bucket
+    """
+    :param new_connection: return a bucket with a connection of its own
+                           instead of the cached one, e.g. to call S3 from
+                           several threads.
+    """
     bucket_name, location = sanitize_bucket_and_host(bucket_name)
     conn = get_connection(location)
+    if new_connection:
+        return conn.get_bucket(bucket_name, validate=False)
     if bucket_name not in BUCKET_CACHE:
         bucket = conn.get_bucket(bucket_name, validate=False)
         BUCKET_CACHE[bucket_name] = bucket
@@ -90,6 +101,43 @@ def pull(bucket, path, dest_file):
     key.get_contents_to_filename(dest_file)
 
 
+def get_key(bucket, path, new_connection=False):
+    # type: (str, str, bool) -> Optional[Key]
+    """
+    Key of an existing object, with its size, etag and metadata.
+
+    :param new_connection: use a connection of its own instead of the cached
+                           bucket's one, e.g. to call S3 from several threads.
+    """
+    return get_bucket(bucket, new_connection=new_connection).get_key(path)
+
+
+def pull_range(bucket, path, dest_file, start, end, etag=None):
+    # type: (str, str, str, int, int, Optional[str]) -> None
+    """
+    Download the bytes *start* to *end* (included) of an object at the same
+    offset of *dest_file*, which must exist. It uses a connection of its own,
+    so that ranges can be pulled concurrently.
+
+    :param etag: if set, the object must still have this etag, so that all
+                 the ranges come from the same version of the object.
+    :raises ObjectChangedError: the object doesn't have *etag* anymore.
+    """
+    bucket_name, location = sanitize_bucket_and_host(bucket)
+    key = Key(get_connection(location).get_bucket(bucket_name, validate=False), path)
+    headers = {'Range': 'bytes={}-{}'.format(start, end)}
+    if etag:
+        headers['If-Match'] = etag
+    with open(dest_file, 'r+b') as f:
+        f.seek(start)
+        try:
+            key.get_contents_to_file(f, headers=headers)
+        except S3ResponseError as e:
+            if e.status == 412:
+                raise ObjectChangedError('s3://{}/{}: etag is not {} anymore'.format(bucket, path, etag))
+            raise
+
+
 def pull_content(bucket, path):
     # type: (str, str) -> str
     bucket = get_bucket(bucket)
@@ -0,0 +1,280 @@
+from __future__ import absolute_import
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+
+from simpleflow import logger, settings
+from swf.models.history import History as SwfHistory
+
+if False:
+    from typing import Any, Dict, List, Optional, Tuple  # NOQA
+    from swf.models import WorkflowExecution  # NOQA
+
+
+INDEX_FILENAME = 'index.json'
+LOCK_FILENAME = 'index.lock'
+ENTRY_SUFFIX = '.json.z'
+
+
+def _entry_key(domain, workflow_id, run_id):
+    return '\0'.join((domain, workflow_id, run_id))
+
+
+def _entry_filename(domain, workflow_id, run_id):
+    key = _entry_key(domain, workflow_id, run_id)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest() + ENTRY_SUFFIX
+
+
+def _domain_name(workflow_execution):
+    domain = workflow_execution.domain
+    return getattr(domain, 'name', domain)
+
+
+class HistoryArchive(object):
+    """
+    On-disk archive of the histories of closed workflow executions.
+
+    A closed execution's history cannot change anymore, so once fetched it
+    can be reused by every later inspection (``workflow.info``, ``task.info``,
+    ``standalone --repair``...) without calling SWF again.
+
+    Each history is stored as a zlib-compressed JSON list of raw events in
+    its own file, named after a hash of (domain, workflow_id, run_id). An
+    ``index.json`` file maps entries to their size; it is only rewritten
+    (atomically, under an exclusive lock) when entries are added or evicted,
+    so several processes can share the same directory. Reads just touch the
+    entry file: its mtime is the last access time, and least recently used
+    entries are evicted when the archive grows over ``max_size`` bytes.
+
+    :ivar directory: archive directory
+    :type directory: str
+    :ivar max_size: maximum size of the archive in bytes (0 for unbounded)
+    :type max_size: int
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = directory or settings.SIMPLEFLOW_HISTORY_ARCHIVE_DIRECTORY
+        if max_size is None:
+            max_size = settings.SIMPLEFLOW_HISTORY_ARCHIVE_MAX_SIZE
+        self.max_size = max_size
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename)
+
+    @contextmanager
+    def _locked_index(self, write=False):
+        """
+        Yield the index, holding the archive lock. If `write` is set, the
+        (possibly modified) index is saved on exit.
+        """
+        try:
+            os.makedirs(self.directory)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        with open(self._path(LOCK_FILENAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+            try:
+                index = self._read_index()
+                yield index
+                if write:
+                    self._write_file(INDEX_FILENAME, json.dumps(index).encode('utf-8'))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        # type: () -> Dict[str, Dict[str, Any]]
+        try:
+            with open(self._path(INDEX_FILENAME), 'rb') as fp:
+                return json.loads(fp.read().decode('utf-8'))
+        except (IOError, OSError):
+            return {}
+        except ValueError:
+            logger.warning('history archive: corrupted index in {}, starting over'.format(self.directory))
+            return {}
+
+    def _write_file(self, filename, content):
+        """
+        Write a file atomically: readers see either the old or the new content.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(content)
+            os.rename(tmp_path, self._path(filename))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, domain, workflow_id, run_id):
+        """
+        Return the raw events of an archived history.
+
+        :type domain: str
+        :type workflow_id: str
+        :type run_id: str
+        :return: events, or None if not archived
+        :rtype: Optional[List[Dict[str, Any]]]
+        """
+        filename = _entry_filename(domain, workflow_id, run_id)
+        path = self._path(filename)
+        try:
+            with open(path, 'rb') as fp:
+                content = fp.read()
+            events = json.loads(zlib.decompress(content).decode('utf-8'))
+        except (IOError, OSError):
+            return None
+        except (zlib.error, ValueError):
+            logger.warning('history archive: cannot read {}, ignoring it'.format(filename))
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass  # evicted meanwhile
+        return events
+
+    def _accessed_at(self, filename, entry):
+        try:
+            return os.stat(self._path(filename)).st_mtime
+        except OSError:
+            return entry['accessed_at']
+
+    def put(self, domain, workflow_id, run_id, events):
+        """
+        Archive the raw events of a history, then evict old entries if needed.
+
+        :type domain: str
+        :type workflow_id: str
+        :type run_id: str
+        :type events: List[Dict[str, Any]]
+        """
+        filename = _entry_filename(domain, workflow_id, run_id)
+        content = zlib.compress(json.dumps(events, separators=(',', ':')).encode('utf-8'))
+        with self._locked_index(write=True) as index:
+            self._write_file(filename, content)
+            index[filename] = {
+                'domain': domain,
+                'workflow_id': workflow_id,
+                'run_id': run_id,
+                'size': len(content),
+                'nb_events': len(events),
+                'accessed_at': time.time(),
+            }
+            if self.max_size:
+                self._evict(index, self.max_size)
+
+    def entries(self):
+        """
+        :return: archived entries, most recently used first
+        :rtype: List[Dict[str, Any]]
+        """
+        with self._locked_index() as index:
+            entries = []
+            for filename, entry in index.items():
+                entry = dict(entry, accessed_at=self._accessed_at(filename, entry))
+                entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['accessed_at'], reverse=True)
+
+    def size(self):
+        """
+        :return: total size of the archived histories
+        :rtype: int
+        """
+        return sum(entry['size'] for entry in self.entries())
+
+    def prune(self, max_size=None):
+        """
+        Evict least recently used entries until the archive fits in `max_size`
+        bytes (defaults to the archive's limit; 0 empties it).
+
+        :type max_size: Optional[int]
+        :return: number of evicted entries
+        :rtype: int
+        """
+        if max_size is None:
+            max_size = self.max_size
+        with self._locked_index(write=True) as index:
+            return self._evict(index, max_size)
+
+    def _evict(self, index, max_size):
+        total = sum(entry['size'] for entry in index.values())
+        evicted = 0
+        for filename in sorted(index, key=lambda f: self._accessed_at(f, index[f])):
+            if total <= max_size:
+                break
+            total -= index[filename]['size']
+            del index[filename]
+            try:
+                os.unlink(self._path(filename))
+            except OSError:
+                pass
+            evicted += 1
+        if evicted:
+            logger.debug('history archive: evicted {} entries'.format(evicted))
+        return evicted
+
+
+def _default_archive():
+    if settings.SIMPLEFLOW_ENABLE_HISTORY_ARCHIVE:
+        return HistoryArchive()
+    return None
+
+
+def _archive_key(workflow_execution):
+    return _domain_name(workflow_execution), workflow_execution.workflow_id, workflow_execution.run_id
+
+
+def get_archived_history(workflow_execution, archive=None):
+    """
+    Return the history of a workflow execution if it's in the local archive.
+
+    :type workflow_execution: swf.models.WorkflowExecution
+    :type archive: Optional[HistoryArchive]
+    :rtype: Optional[swf.models.history.History]
+    """
+    archive = archive or _default_archive()
+    if archive is None or workflow_execution.status != workflow_execution.STATUS_CLOSED:
+        return None
+    key = _archive_key(workflow_execution)
+    try:
+        events = archive.get(*key)
+    except (IOError, OSError) as err:
+        logger.warning('history archive: {}'.format(err))
+        return None
+    if events is None:
+        return None
+    logger.debug('history archive: found domain={} workflow_id={} run_id={}'.format(*key))
+    return SwfHistory.from_event_list(events)
+
+
+def get_history(workflow_execution, archive=None):
+    """
+    Return the history of a workflow execution, served from the local archive
+    when the execution is closed.
+
+    :type workflow_execution: swf.models.WorkflowExecution
+    :param archive: archive to use; defaults to one configured by settings,
+                    if enabled
+    :type archive: Optional[HistoryArchive]
+    :rtype: swf.models.history.History
+    """
+    archive = archive or _default_archive()
+    history = get_archived_history(workflow_execution, archive)
+    if history is not None:
+        return history
+
+    history = workflow_execution.history()
+    if archive is not None and workflow_execution.status == workflow_execution.STATUS_CLOSED:
+        try:
+            archive.put(*(_archive_key(workflow_execution) + (history.raw,)))
+        except (IOError, OSError) as err:
+            logger.warning('history archive: {}'.format(err))
+    return history
@@ -4,8 +4,8 @@ import copy
 import inspect
 import hashlib
 import json
-import multiprocessing
 import re
+import time
 import traceback
 
 import simpleflow.task as base_task
@@ -18,16 +18,19 @@ from simpleflow import (
     format,
     futures,
     logger,
+    result_cache,
+    settings,
     task,
     compat,
 )
 from simpleflow.activity import Activity, PRIORITY_NOT_SET
 from simpleflow.base import Submittable
+from simpleflow.constants import MAX_DETAILS_LENGTH
 from simpleflow.history import History
 from simpleflow.marker import Marker
 from simpleflow.signal import WaitForSignal
 from simpleflow.swf import constants
-from simpleflow.swf.helpers import swf_identity
+from simpleflow.swf.repair import RepairService, fake_task_list_name
 from simpleflow.swf.utils import DecisionsAndContext
 from simpleflow.swf.task import (
     SwfTask,
@@ -39,13 +42,13 @@ from simpleflow.swf.task import (
     CancelTimerTask,
 )
 from simpleflow.utils import (
+    format_exc,
     hex_hash,
     issubclass_,
     json_dumps,
-    retry,
+    time_limit,
 )
 from simpleflow.workflow import Workflow
-from swf.core import ConnectedSWFObject
 
 # noinspection PyUnreachableCode
 if False:
@@ -53,75 +56,11 @@ if False:
 
 __all__ = ['Executor']
 
+# Results of inline activities, executed by the decider
+INLINE_MARKER = 'simpleflow.inline'
 
-# if "poll_for_activity_task" doesn't contain a "taskToken"
-# key, then retry ; it happens (not often) that the decider
-# doesn't get the scheduled task while it should...
-@retry.with_delay(nb_times=3,
-                  delay=retry.exponential,
-                  on_exceptions=KeyError)
-def run_fake_activity_task(domain, task_list, result):
-    conn = ConnectedSWFObject().connection
-    resp = conn.poll_for_activity_task(
-        domain,
-        task_list,
-        identity=swf_identity(),
-    )
-    conn.respond_activity_task_completed(
-        resp['taskToken'],
-        result,
-    )
-
-
-# Same retry condition as run_fake_activity_task
-@retry.with_delay(nb_times=3,
-                  delay=retry.exponential,
-                  on_exceptions=KeyError)
-def run_fake_child_workflow_task(domain, task_list, result=None):
-    conn = ConnectedSWFObject().connection
-    resp = conn.poll_for_decision_task(
-        domain,
-        task_list,
-        identity=swf_identity(),
-    )
-    conn.respond_decision_task_completed(
-        resp['taskToken'],
-        decisions=[
-            {
-                'decisionType': 'CompleteWorkflowExecution',
-                'completeWorkflowExecutionDecisionAttributes': {
-                    'result': result,
-                },
-            }
-        ]
-    )
-
-
-def run_fake_task_worker(domain, task_list, former_event):
-    if former_event['type'] == 'activity':
-        worker_proc = multiprocessing.Process(
-            target=run_fake_activity_task,
-            args=(
-                domain,
-                task_list,
-                former_event['result'],
-            ),
-        )
-    elif former_event['type'] == 'child_workflow':
-        worker_proc = multiprocessing.Process(
-            target=run_fake_child_workflow_task,
-            args=(
-                domain,
-                task_list,
-            ),
-            kwargs={
-                'result': former_event['result'],
-            },
-        )
-    else:
-        raise Exception('Wrong event type {}'.format(former_event['type']))
-
-    worker_proc.start()
+# Results of the workflow's checkpoints
+SNAPSHOT_MARKER = 'simpleflow.snapshot'
 
 
 class TaskRegistry(dict):
@@ -183,6 +122,7 @@ class Executor(executor.Executor):
         self.repair_with = repair_with
         self._repair_workflow_id = repair_workflow_id
         self._repair_run_id = repair_run_id
+        self._repair_service = None  # type: Optional[RepairService]
         if force_activities:
             self.force_activities = re.compile(force_activities)
         else:
@@ -196,6 +136,9 @@ class Executor(executor.Executor):
         self.current_priority = None
         self.handled_failures = {}
         self.created_activity_types = set()
+        self.result_cache = result_cache.get_result_cache()
+        self._recorded_results = {}
+        self._inline_time = 0.
 
     def reset(self):
         """
@@ -214,6 +157,8 @@ class Executor(executor.Executor):
         self.current_priority = None
         self.handled_failures = {}
         self.created_activity_types = set()
+        self._recorded_results = {}
+        self._inline_time = 0.
         self.create_workflow()
 
     def _make_task_id(self, a_task, workflow_id, run_id, *args, **kwargs):
@@ -905,16 +850,12 @@ class Executor(executor.Executor):
                     'faking task completed successfully in previous '
                     'workflow: {}'.format(former_event['id'])
                 )
-                json_hash = hashlib.md5(json_dumps(former_event).encode('utf-8')).hexdigest()
-                fake_task_list = "FAKE-" + json_hash
-
-                # schedule task on a fake task list
-                self.schedule_task(a_task, task_list=fake_task_list)
+                # schedule task on the fake task list, the repair service
+                # started by the decider poller completes it with the former
+                # result
+                self.schedule_task(a_task, task_list=self.get_repair_service().task_list)
                 future = futures.Future()
 
-                # start a dedicated process to handle the fake activity
-                run_fake_task_worker(self.domain.name, fake_task_list, former_event)
-
         # back to normal execution flow
         if event:
             ttf = self.EVENT_TYPE_TO_FUTURE.get(event['type'])
@@ -928,6 +869,12 @@ class Executor(executor.Executor):
                 if future and future.state in (futures.PENDING, futures.RUNNING):
                     self._open_activity_count += 1
 
+        if not future and isinstance(a_task, ActivityTask) and a_task.activity.inline:
+            future = self.resume_inline(a_task)
+
+        if not future and isinstance(a_task, ActivityTask) and a_task.activity.cacheable:
+            future = self.resume_from_cache(a_task)
+
         if not future:
             self.schedule_task(a_task, task_list=self.task_list)
             future = futures.Future()  # return a pending future.
@@ -939,6 +886,165 @@ class Executor(executor.Executor):
 
         return future
 
+    def get_recorded_results(self, marker_name):
+        """
+        Details of the markers named *marker_name* written by
+        `record_result`, by ID.
+
+        :type marker_name: str
+        :return: details; their JSON-encoded ``result`` may be a jumbo field
+        :rtype: dict[str, dict[str, Any]]
+        """
+        results = self._recorded_results.get(marker_name)
+        if results is None:
+            results = self._recorded_results[marker_name] = {}
+            for marker in self._history.markers.get(marker_name, []):
+                if marker['state'] == 'recorded':
+                    details = json.loads(marker['details'])
+                    results[details['id']] = details
+        return results
+
+    def record_result(self, marker_name, id, content, **extra):
+        """
+        Record a result in a marker, so that the next replays find it in
+        `get_recorded_results` instead of computing it again.
+
+        :type marker_name: str
+        :param id: ID of the result, e.g. the task's one
+        :type id: str
+        :param content: JSON-encoded result
+        :type content: str
+        :param extra: other details of the marker
+        :return: the recorded details, or None if they are too large for a
+                 marker
+        :rtype: Optional[dict[str, Any]]
+        """
+        details = dict(extra, id=id, result=content)
+        if len(json_dumps(details)) > MAX_DETAILS_LENGTH:
+            try:
+                # JSON strings are at most twice longer once escaped
+                details['result'] = format.encode(content, (MAX_DETAILS_LENGTH - 1024) // 2)
+            except format.JumboTooLargeError:
+                return None
+        marker = MarkerTask(marker_name, details)
+        marker.id = id
+        append_timer = self._append_timer
+        self.schedule_task(marker)
+        # the workflow goes on with the result: no need to wake it up
+        self._append_timer = append_timer
+        self.get_recorded_results(marker_name)[id] = details
+        return details
+
+    def resume_from_cache(self, a_task):
+        """
+        Resume a cacheable activity from its cached result, without
+        executing it. A result found in the result cache is recorded in a
+        marker, so that the next replays don't depend on the cache.
+
+        :param a_task:
+        :type a_task: ActivityTask
+        :return: finished future, or None if the result isn't cached
+        :rtype: Optional[futures.Future]
+        """
+        details = self.get_recorded_results(result_cache.CACHE_MARKER).get(a_task.id)
+        if details is None:
+            if self.result_cache is None:
+                return None
+            key = result_cache.make_key(a_task.activity, a_task.args, a_task.kwargs)
+            try:
+                content = self.result_cache.get(key, result_cache.get_ttl(a_task.activity))
+            except Exception as err:
+                logger.warning('cannot get result of {} from {}: {}'.format(a_task.id, self.result_cache, err))
+                return None
+            if content is None:
+                return None
+            details = self.record_result(result_cache.CACHE_MARKER, a_task.id, content)
+            if details is None:
+                return None
+            logger.info('result of {} found in {}: {}'.format(a_task.id, self.result_cache, key))
+
+        future = futures.Future()
+        future.set_finished(format.decode(details['result']))
+        return future
+
+    def resume_inline(self, a_task):
+        """
+        Resume an inline activity by executing it in the decider. Its result
+        is recorded in a marker: the next replays take it from there
+        instead of executing it again.
+
+        The activity is scheduled on workers instead, with its usual retries,
+        if its arguments or result are larger than
+        SIMPLEFLOW_INLINE_ACTIVITY_MAX_SIZE, if it fails, or if it exceeds
+        SIMPLEFLOW_INLINE_ACTIVITY_TIMEOUT, or when the decision already
+        spent SIMPLEFLOW_INLINE_ACTIVITIES_BUDGET on inline activities.
+
+        :param a_task:
+        :type a_task: ActivityTask
+        :return: finished future, or None if the activity must be scheduled
+        :rtype: Optional[futures.Future]
+        """
+        details = self.get_recorded_results(INLINE_MARKER).get(a_task.id)
+        if details is None:
+            max_size = settings.SIMPLEFLOW_INLINE_ACTIVITY_MAX_SIZE
+            timeout = min(
+                settings.SIMPLEFLOW_INLINE_ACTIVITY_TIMEOUT,
+                settings.SIMPLEFLOW_INLINE_ACTIVITIES_BUDGET - self._inline_time,
+            )
+            if timeout <= 0:
+                logger.info('inline activities budget spent: scheduling {}'.format(a_task.id))
+                return None
+            if len(json_dumps({'args': a_task.args, 'kwargs': a_task.kwargs})) > max_size:
+                logger.warning('input of {} too large to execute inline'.format(a_task.id))
+                return None
+
+            context = {
+                'name': a_task.activity.name,
+                'version': a_task.activity.version,
+                'workflow_id': self._workflow_id,
+                'run_id': self._run_id,
+                'activity_id': a_task.id,
+                'input': None,
+                'domain_name': self.domain.name,
+            }
+            # a copy: execute() may add the context to the kwargs
+            inline_task = base_task.ActivityTask(a_task.activity, *a_task.args, context=context, **a_task.kwargs)
+            start = time.time()
+            try:
+                with time_limit(timeout):
+                    content = json_dumps(inline_task.execute())
+            except Exception as err:
+                logger.warning('cannot execute {} inline: {}'.format(a_task.id, format_exc(err)))
+                return None
+            finally:
+                self._inline_time += time.time() - start
+            if len(content) > max_size:
+                logger.warning('result of {} too large to be recorded'.format(a_task.id))
+                return None
+            details = self.record_result(INLINE_MARKER, a_task.id, content)
+            if details is None:
+                return None
+            logger.debug('executed {} inline'.format(a_task.id))
+
+        future = futures.Future()
+        future.set_finished(format.decode(details['result']))
+        return future
+
+    def get_repair_service(self):
+        """
+        Return the service completing faked tasks in repair mode, shared by
+        all the tasks of this executor. Its task list only depends on the
+        repaired execution: it's the same in the processes forked to take
+        decisions as in the decider poller running the service.
+
+        :return: the service, or None if not in repair mode
+        :rtype: Optional[RepairService]
+        """
+        if self._repair_service is None and self.repair_with is not None:
+            task_list = fake_task_list_name(self._repair_workflow_id, self._repair_run_id)
+            self._repair_service = RepairService(self.domain.name, task_list, self.repair_with)
+        return self._repair_service
+
     def _compute_priority(self, priority_set_on_submit, a_task):
         """
         Computes the correct task priority, with the following precedence (first
@@ -1095,6 +1201,14 @@ class Executor(executor.Executor):
                 self.maybe_clear_execution_context()
 
             return self._decisions_and_context
+        except exceptions.ContinueAsNew as err:
+            logger.info('continuing as a new run')
+            self.after_replay()
+            decision = self.make_continue_as_new_decision(err.input)
+            self.after_closed()
+            if decref_workflow:
+                self.decref_workflow()
+            return DecisionsAndContext([decision])
         except (exceptions.TaskException, exceptions.WorkflowException) as err:
             def _extract_reason(err):
                 if hasattr(err.exception, 'reason'):
@@ -1214,6 +1328,27 @@ class Executor(executor.Executor):
         self._decisions_and_context.append_decision(decision)
         raise exceptions.ExecutionBlocked('workflow execution failed')
 
+    def make_continue_as_new_decision(self, input):
+        """
+        The new run keeps the task list, timeouts, child policy and tags of
+        the current one.
+
+        :param input: input of the new run
+        :type input: dict
+        :rtype: swf.models.decision.WorkflowExecutionDecision
+        """
+        started_event = self._history.events[0]
+        decision = swf.models.decision.WorkflowExecutionDecision()
+        decision.continue_as_new(
+            child_policy=getattr(started_event, 'child_policy', None),
+            execution_timeout=getattr(started_event, 'execution_start_to_close_timeout', None),
+            task_timeout=getattr(started_event, 'task_start_to_close_timeout', None),
+            input=input,
+            tag_list=getattr(started_event, 'tag_list', None),
+            task_list=getattr(started_event, 'task_list', {}).get('name'),
+        )
+        return decision
+
     def run(self, decision_response):
         return self.replay(decision_response)
 
@@ -1348,6 +1483,33 @@ class Executor(executor.Executor):
     def record_marker(self, name, details=None):
         return MarkerTask(name, details)
 
+    def checkpoint(self, name, func, *args, **kwargs):
+        """
+        Return the result of a phase of the workflow, recorded in a snapshot
+        marker once the phase is done: the next replays return it without
+        calling *func*, hence without submitting the phase's tasks again.
+
+        The marker also keeps the counters numbering the tasks, so that the
+        IDs of the tasks submitted after the phase don't change.
+
+        :param name: name of the checkpoint, unique in the workflow
+        :type name: str
+        :param func: phase, returning a JSON-serializable result
+        :type func: Callable
+        :raise: exceptions.ExecutionBlocked if the phase isn't done
+        """
+        details = self.get_recorded_results(SNAPSHOT_MARKER).get(name)
+        if details is not None:
+            for task_name, count in details['tasks'].items():
+                self._tasks[task_name] = max(self._tasks.get(task_name, 0), count)
+            return format.decode(details['result'])
+
+        content = json_dumps(func(*args, **kwargs))
+        if self.record_result(SNAPSHOT_MARKER, name, content, tasks=dict(self._tasks)) is None:
+            logger.warning('result of checkpoint {} too large to be recorded'.format(name))
+        # the same value as the next replays, e.g. lists instead of tuples
+        return format.decode(content)
+
     def list_markers(self, all=False):
         if all:
             return [
@@ -13,9 +13,11 @@ import swf.querysets
 from simpleflow.dispatch import dynamic_dispatcher
 from simpleflow.utils import json_dumps
 from .stats import pretty
+from .stats.aggregate import profile_executions
 
 __all__ = [
     'show_workflow_profile',
+    'show_workflows_profile',
     'show_workflow_status',
     'list_workflow_executions',
     'swf_identity',
@@ -75,10 +77,14 @@ def show_workflow_status(domain_name, workflow_id, run_id=None, nb_tasks=None):
     return pretty.status(workflow_execution, nb_tasks)
 
 
-def list_workflow_executions(domain_name, *args, **kwargs):
+def list_workflow_executions(domain_name, status, start_oldest_date, max_workers=1):
     domain = swf.models.Domain(domain_name)
     query = swf.querysets.WorkflowExecutionQuerySet(domain)
-    executions = query.all(*args, **kwargs)
+    if status == swf.models.WorkflowExecution.STATUS_OPEN:
+        kwargs = {'oldest_date': start_oldest_date}
+    else:
+        kwargs = {'start_oldest_date': start_oldest_date}
+    executions = query.iter_filter(status, max_workers=max_workers, **kwargs)
 
     return pretty.list_executions(executions)
 
@@ -88,11 +94,24 @@ def filter_workflow_executions(domain_name, status, tag,
                                workflow_type_version, *args, **kwargs):
     domain = swf.models.Domain(domain_name)
     query = swf.querysets.WorkflowExecutionQuerySet(domain)
+    executions = query.iter_filter(status, tag,
+                                   workflow_id, workflow_type_name,
+                                   workflow_type_version, *args, **kwargs)
+
+    return pretty.list_details(executions)
+
+
+def show_workflows_profile(domain_name, status, tag,
+                           workflow_id, workflow_type_name,
+                           workflow_type_version, max_workers=8, *args, **kwargs):
+    domain = swf.models.Domain(domain_name)
+    query = swf.querysets.WorkflowExecutionQuerySet(domain)
     executions = query.filter(status, tag,
                               workflow_id, workflow_type_name,
                               workflow_type_version, *args, **kwargs)
 
-    return pretty.list_details(executions)
+    timings, nb_executions = profile_executions(executions, max_workers=max_workers)
+    return pretty.aggregated_profile(timings.aggregate(), nb_executions)
 
 
 def find_activity(history, scheduled_id=None, activity_id=None, input=None):
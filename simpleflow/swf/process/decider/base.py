@@ -8,7 +8,7 @@ import swf.actors
 import swf.exceptions
 import swf.models.decision
 
-from simpleflow import logger
+from simpleflow import logger, utils
 from simpleflow.process import Supervisor, with_state
 from simpleflow.swf.process import Poller
 from simpleflow.swf.utils import DecisionsAndContext
@@ -27,11 +27,12 @@ class Decider(Supervisor):
     :ivar _poller: decider poller.
     :type _poller: DeciderPoller
     """
-    def __init__(self, poller, nb_children=None):
+    def __init__(self, poller, nb_children=None, autoscaler=None):
         self._poller = poller
         super(Decider, self).__init__(
             payload=self._poller.start,
             nb_children=nb_children,
+            autoscaler=autoscaler,
         )
 
 
@@ -127,6 +128,38 @@ class DeciderPoller(Poller, swf.actors.Decider):
                     '"{}" unless you specify it explicitly'.format(
                         self.task_list))
 
+    def start(self):
+        self.start_repair_services()
+        try:
+            super(DeciderPoller, self).start()
+        finally:
+            self.stop_repair_services()
+
+    def run_once(self):
+        self.start_repair_services()
+        try:
+            super(DeciderPoller, self).run_once()
+        finally:
+            self.stop_repair_services()
+
+    def start_repair_services(self):
+        """
+        Start the services completing the tasks faked by executors in repair
+        mode. They belong to this long-lived process: the process taking a
+        decision exits as soon as it's sent, before the faked tasks are
+        polled.
+        """
+        for ex in self._workflow_executors.values():
+            repair_service = ex.get_repair_service()
+            if repair_service is not None:
+                repair_service.start()
+
+    def stop_repair_services(self):
+        for ex in self._workflow_executors.values():
+            repair_service = ex.get_repair_service()
+            if repair_service is not None:
+                repair_service.stop()
+
     @property
     def name(self):
         """
@@ -240,6 +273,27 @@ class DeciderWorker(object):
         return decisions
 
 
+def get_decision_deadline(history):
+    """
+    Time when the decision task being processed times out.
+
+    :param history: history from PollForDecisionTask
+    :type history: swf.models.History
+    :returns: UNIX timestamp, or None if the task has no timeout
+    :rtype: Optional[float]
+    """
+    started = history.last
+    if started.type != 'DecisionTask' or started.state != 'started':
+        return None
+    for event in history.reversed:
+        if event.type == 'DecisionTask' and event.state == 'scheduled':
+            timeout = getattr(event, 'start_to_close_timeout', 'NONE')
+            if timeout == 'NONE':
+                return None
+            return started.raw['eventTimestamp'] + int(timeout)
+    return None
+
+
 def process_decision(poller, decision_response):
     # type: (DeciderPoller, Response) -> None
     workflow_id = decision_response.execution.workflow_id
@@ -250,7 +304,9 @@ def process_decision(poller, decision_response):
     decisions = poller.decide(decision_response)
     try:
         logger.info("completing decision for {}".format(workflow_str))
-        poller.complete_with_retry(decision_response.token, decisions)
+        # Retrying after the decision task timed out would be pointless
+        with utils.retry.deadline(get_decision_deadline(decision_response.history)):
+            poller.complete_with_retry(decision_response.token, decisions)
     except Exception as err:
         logger.error("cannot complete decision for {}: {}".format(workflow_str, err))
 
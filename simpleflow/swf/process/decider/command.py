@@ -7,6 +7,7 @@ from . import helpers
 def start(workflows, domain, task_list, log_level=None, nb_processes=None,
           repair_with=None, force_activities=None, is_standalone=False,
           repair_workflow_id=None, repair_run_id=None,
+          max_processes=None,
           ):
     """
     Start a decider.
@@ -30,6 +31,9 @@ def start(workflows, domain, task_list, log_level=None, nb_processes=None,
     :type repair_workflow_id: Optional[str]
     :param repair_run_id: run ID to repair
     :type repair_run_id: Optional[str]
+    :param max_processes: enable autoscaling between nb_processes (or 1) and max_processes,
+        depending on the number of pending decision tasks
+    :type max_processes: Optional[int]
     """
     if log_level:
         logger.warning(
@@ -42,6 +46,7 @@ def start(workflows, domain, task_list, log_level=None, nb_processes=None,
         is_standalone=is_standalone,
         repair_workflow_id=repair_workflow_id,
         repair_run_id=repair_run_id,
+        max_children=max_processes,
     )
     decider.is_alive = True
     decider.start()
@@ -1,6 +1,8 @@
+import swf.actors
 import swf.models
 
 from simpleflow import logger
+from simpleflow.process import Autoscaler
 from simpleflow.swf.executor import Executor
 from . import (
     Decider,
@@ -101,6 +103,7 @@ def make_decider(workflows, domain, task_list, nb_children=None,
                  repair_with=None, force_activities=None,
                  is_standalone=False,
                  repair_workflow_id=None, repair_run_id=None,
+                 max_children=None,
                  ):
     """
     Instantiate a Decider.
@@ -122,6 +125,8 @@ def make_decider(workflows, domain, task_list, nb_children=None,
     :type repair_workflow_id: Optional[str]
     :param repair_run_id: run ID to repair
     :type repair_run_id: Optional[str]
+    :param max_children: enable autoscaling between nb_children (or 1) and max_children
+    :type max_children: Optional[int]
     :return:
     :rtype: Decider
     """
@@ -132,4 +137,13 @@ def make_decider(workflows, domain, task_list, nb_children=None,
                                  repair_workflow_id=repair_workflow_id,
                                  repair_run_id=repair_run_id,
                                  )
-    return Decider(poller, nb_children=nb_children)
+    autoscaler = None
+    if max_children:
+        # NB: dedicated connection, not shared with the forked pollers
+        counter = swf.actors.Decider(poller.domain, task_list)
+        autoscaler = Autoscaler(
+            counter.count_pending,
+            min_children=nb_children or 1,
+            max_children=max_children,
+        )
+    return Decider(poller, nb_children=nb_children, autoscaler=autoscaler)
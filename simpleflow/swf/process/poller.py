@@ -4,7 +4,7 @@ import signal
 
 import swf.actors
 import swf.exceptions
-from simpleflow import logger, utils
+from simpleflow import logger, settings, utils
 from simpleflow.process import NamedMixin, with_state
 from simpleflow.swf.helpers import swf_identity
 
@@ -19,6 +19,10 @@ class Poller(swf.actors.Actor, NamedMixin):
     def __init__(self, domain, task_list=None):
         self.is_alive = False
         self._named_mixin_properties = ["task_list"]
+        # Only polls are budgeted: complete and fail are called from the
+        # process forked for each task, where a process-local budget would
+        # only see the few calls of that task and never run out.
+        self._poll_retry_budget = utils.retry.RetryBudget(ratio=settings.SIMPLEFLOW_RETRY_BUDGET_RATIO)
 
         super(Poller, self).__init__(domain, task_list)
 
@@ -101,6 +105,16 @@ class Poller(swf.actors.Actor, NamedMixin):
         logger.info('stopping %s', self.name)
         self.is_alive = False  # No longer take requests.
 
+    def _with_retry(self, name, budget=None, **kwargs):
+        return utils.retry.with_delay(
+            nb_times=self.nb_retries,
+            delay=utils.retry.decorrelated_jitter(cap=settings.SIMPLEFLOW_RETRY_MAX_DELAY),
+            log_with=logger.exception,
+            budget=budget,
+            name='{}.{}'.format(self.__class__.__name__, name),
+            **kwargs
+        )
+
     def complete_with_retry(self, token, response):
         """
         Complete with retry.
@@ -112,10 +126,8 @@ class Poller(swf.actors.Actor, NamedMixin):
         :rtype:
         """
         try:
-            complete = utils.retry.with_delay(
-                nb_times=self.nb_retries,
-                delay=utils.retry.exponential,
-                log_with=logger.exception,
+            complete = self._with_retry(
+                'complete',
                 except_on=swf.exceptions.DoesNotExistError,
             )(self.complete)  # Exponential backoff on errors.
             complete(token, response)
@@ -160,10 +172,9 @@ class Poller(swf.actors.Actor, NamedMixin):
         identity = self.identity
 
         logger.debug("polling task on %s", task_list)
-        poll = utils.retry.with_delay(
-            nb_times=self.nb_retries,
-            delay=utils.retry.exponential,
-            log_with=logger.exception,
+        poll = self._with_retry(
+            'poll',
+            budget=self._poll_retry_budget,
             on_exceptions=swf.exceptions.ResponseError,
         )(self.poll)
         response = poll(task_list, identity=identity)
@@ -175,10 +186,8 @@ class Poller(swf.actors.Actor, NamedMixin):
         raise NotImplementedError
 
     def fail_with_retry(self, *args, **kwargs):
-        fail = utils.retry.with_delay(
-            nb_times=self.nb_retries,
-            delay=utils.retry.exponential,
-            log_with=logger.exception,
+        fail = self._with_retry(
+            'fail',
             on_exceptions=swf.exceptions.ResponseError,
         )(self.fail)
         response = fail(*args, **kwargs)
@@ -1,8 +1,10 @@
-from base64 import b64decode
+from base64 import b64decode, b64encode
+import collections
 import json
 import multiprocessing
 import os
 import sys
+import time
 import traceback
 import uuid
 
@@ -14,25 +16,27 @@ import swf.actors
 import swf.exceptions
 from swf.models import ActivityTask as BaseActivityTask
 from swf.responses import Response
-from simpleflow import settings
+from simpleflow import metrology, result_cache, settings
 from simpleflow.dispatch import dynamic_dispatcher
 from simpleflow.download import download_binaries
 from simpleflow.job import KubernetesJob
+from simpleflow.job.k8s import get_job_meta
 from simpleflow.process import Supervisor, with_state
 from simpleflow.swf.constants import VALID_PROCESS_MODES
 from simpleflow.swf.process import Poller
 
 from simpleflow.swf.task import ActivityTask
 from simpleflow.swf.utils import sanitize_activity_context
-from simpleflow.utils import format_exc, json_dumps, to_k8s_identifier
+from simpleflow.utils import format_exc, json_dumps, retry, to_k8s_identifier
 
 
 class Worker(Supervisor):
-    def __init__(self, poller, nb_children=None):
+    def __init__(self, poller, nb_children=None, autoscaler=None):
         self._poller = poller
         super(Worker, self).__init__(
             payload=self._poller.start,
             nb_children=nb_children,
+            autoscaler=autoscaler,
         )
 
 
@@ -63,6 +67,13 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         assert self.process_mode in VALID_PROCESS_MODES, 'invalid process_mode "{}"'.format(self.process_mode)
 
         self.poll_data = poll_data
+        # Kubernetes mode: polled tasks waiting for their job, by job template
+        # and data, with the name of the job and the time of the first task
+        self.job_name = None
+        self.k8s_batch_size = max(1, settings.SIMPLEFLOW_K8S_BATCH_SIZE)
+        self._k8s_batches = collections.OrderedDict()
+        # NB: created once here so it's inherited by the process of each task
+        self.activity_worker = ActivityWorker()
         super(ActivityPoller, self).__init__(domain, task_list)
 
     @property
@@ -78,8 +89,15 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
             # the poll data has been passed as input
             return self.fake_poll()
         else:
-            # we need to poll SWF's PollForActivityTask
-            return swf.actors.ActivityWorker.poll(self, task_list, identity)
+            # we need to poll SWF's PollForActivityTask; the tasks of a batch
+            # are started, so don't keep them waiting for a whole long poll
+            self.spawn_kubernetes_jobs(max_wait=settings.SIMPLEFLOW_K8S_BATCH_MAX_WAIT)
+            try:
+                return swf.actors.ActivityWorker.poll(self, task_list, identity)
+            except swf.exceptions.PollTimeout:
+                # no task came: don't keep the polled ones waiting
+                self.spawn_kubernetes_jobs()
+                raise
 
     def fake_poll(self):
         polled_activity_data = json.loads(b64decode(self.poll_data))
@@ -104,21 +122,103 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         token = response.task_token
         task = response.activity_task
         if self.process_mode == "kubernetes":
-            try:
-                spawn_kubernetes_job(self, response.raw_response)
-            except Exception as err:
-                logger.exception("spawn_kubernetes_job error")
-                reason = 'cannot spawn kubernetes job for task {}: {} {}'.format(
-                    task.activity_id,
-                    err.__class__.__name__,
-                    err,
-                )
-                self.fail_with_retry(token, task, reason)
+            self.add_kubernetes_task(response)
         else:
             spawn(self, token, task, self._heartbeat)
 
+    def add_kubernetes_task(self, response):
+        """
+        Add a polled task to the batch of its job template and data. The
+        jobs are spawned when their batch is full, when no other task is
+        pending, or before the next poll once SIMPLEFLOW_K8S_BATCH_MAX_WAIT
+        seconds have passed.
+
+        Tasks are polled with the name of the job of the batch being filled
+        as identity: a task of another template or data, which gets its own
+        job, is started in SWF with an identity naming the other job.
+
+        :type response: swf.responses.Response
+        """
+        try:
+            meta = get_job_meta(response.raw_response)
+            key = (meta["k8s_job_template"], json_dumps(meta.get("k8s_job_data", {})))
+        except Exception as err:
+            self._fail_kubernetes_task(response, err)
+            return
+
+        batch = self._k8s_batches.get(key)
+        if batch is None:
+            # The tasks of a batch are polled with the name of its job as
+            # identity, unless this name is taken by the batch of another
+            # template.
+            job_name = self.job_name
+            if not job_name or job_name in (name for name, _, _ in self._k8s_batches.values()):
+                job_name = self._make_job_name()
+            batch = self._k8s_batches[key] = (job_name, [], time.time())
+        job_name, responses, _ = batch
+        if job_name != self.job_name:
+            logger.info('task {} polled as part of job {} is processed by job {}'.format(
+                response.activity_task.activity_id, self.job_name, job_name))
+        responses.append(response)
+
+        if len(responses) >= self.k8s_batch_size:
+            del self._k8s_batches[key]
+            self._spawn_kubernetes_batch(job_name, responses)
+        if self._k8s_batches and (not self.is_alive or not self._count_pending()):
+            self.spawn_kubernetes_jobs()
+
+    def spawn_kubernetes_jobs(self, max_wait=None):
+        """
+        Spawn the jobs of the polled tasks.
+
+        :param max_wait: only spawn the batches older than this number of seconds
+        :type max_wait: Optional[float]
+        """
+        now = time.time()
+        for key, (job_name, responses, created_at) in list(self._k8s_batches.items()):
+            if max_wait is None or now - created_at >= max_wait:
+                del self._k8s_batches[key]
+                self._spawn_kubernetes_batch(job_name, responses)
+
+    def _count_pending(self):
+        try:
+            return self.count_pending()
+        except Exception as err:
+            logger.warning('cannot count pending activity tasks: {}'.format(err))
+            return 0
+
+    def _spawn_kubernetes_batch(self, job_name, responses):
+        if job_name == self.job_name:
+            self.job_name = None
+        try:
+            # a single task keeps the payload of a job without batch
+            spawn_kubernetes_job(
+                self,
+                [response.raw_response for response in responses] if len(responses) > 1
+                else responses[0].raw_response,
+                job_name,
+            )
+        except Exception as err:
+            logger.exception("spawn_kubernetes_job error")
+            for response in responses:
+                self._fail_kubernetes_task(response, err)
+
+    def _fail_kubernetes_task(self, response, err):
+        task = response.activity_task
+        reason = 'cannot spawn kubernetes job for task {}: {} {}'.format(
+            task.activity_id,
+            err.__class__.__name__,
+            err,
+        )
+        self.fail_with_retry(response.task_token, task, reason)
+
     @with_state('completing')
     def complete(self, token, result=None):
+        # Serialize the result while the metrology of the task is uploaded:
+        # it must be there before the decider knows the task is completed.
+        if not isinstance(result, format.EncodedJSON):
+            result = format.EncodedJSON(json_dumps(result))
+        metrology.wait_for_uploads(settings.METROLOGY_UPLOAD_TIMEOUT)
         swf.actors.ActivityWorker.complete(self, token, result)
 
     # noinspection PyMethodOverriding
@@ -137,6 +237,9 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         :return:
         :rtype:
         """
+        # Same as complete(): the metrology must be uploaded before the
+        # decider knows the task failed.
+        metrology.wait_for_uploads(settings.METROLOGY_UPLOAD_TIMEOUT)
         try:
             return swf.actors.ActivityWorker.fail(
                 self,
@@ -153,7 +256,8 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
     @property
     def identity(self):
         if self.process_mode == "kubernetes":
-            self.job_name = "{}--{}".format(to_k8s_identifier(self.task_list), str(uuid.uuid4()))
+            if self.job_name is None:
+                self.job_name = self._make_job_name()
             return json_dumps({
                 "cluster": os.environ["K8S_CLUSTER"],
                 "namespace": os.environ["K8S_NAMESPACE"],
@@ -162,6 +266,9 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         else:
             return super(ActivityPoller, self).identity
 
+    def _make_job_name(self):
+        return "{}--{}".format(to_k8s_identifier(self.task_list), str(uuid.uuid4()))
+
 
 class ActivityWorker(object):
     def __init__(self, dispatcher=None):
@@ -189,6 +296,8 @@ class ActivityWorker(object):
         :type task: swf.models.ActivityTask
         """
         logger.debug('ActivityWorker.process() pid={}'.format(os.getpid()))
+        started_at = time.time()
+        activity = None
         try:
             activity = self.dispatch(task)
             input = format.decode(task.input)
@@ -198,7 +307,8 @@ class ActivityWorker(object):
             context['domain_name'] = poller.domain.name
             if input.get('meta', {}).get('binaries'):
                 download_binaries(input['meta']['binaries'])
-            result = ActivityTask(activity, *args, context=context, **kwargs).execute()
+            # NB: when possible, get the result as a JSON string, it's only passed to SWF
+            result = ActivityTask(activity, *args, context=context, **kwargs).execute(encoded=True)
         except Exception:
             exc_type, exc_value, exc_traceback = sys.exc_info()
             logger.exception("process error: {}".format(str(exc_value)))
@@ -216,24 +326,49 @@ class ActivityWorker(object):
                     },
                     default=repr
                 )
-            return poller.fail_with_retry(
-                token,
-                task,
-                reason=reason,
-                details=details
-            )
+            with retry.deadline(get_task_deadline(activity, started_at)):
+                return poller.fail_with_retry(
+                    token,
+                    task,
+                    reason=reason,
+                    details=details
+                )
 
-        try:
-            logger.info('completing activity')
-            poller.complete_with_retry(token, result)
-        except Exception as err:
-            logger.exception("complete error")
-            reason = 'cannot complete task {}: {} {}'.format(
-                task.activity_id,
-                err.__class__.__name__,
-                err,
-            )
-            poller.fail_with_retry(token, task, reason)
+        # Retrying after the task timed out would be pointless
+        with retry.deadline(get_task_deadline(activity, started_at)):
+            try:
+                logger.info('completing activity')
+                poller.complete_with_retry(token, result)
+            except Exception as err:
+                logger.exception("complete error")
+                reason = 'cannot complete task {}: {} {}'.format(
+                    task.activity_id,
+                    err.__class__.__name__,
+                    err,
+                )
+                poller.fail_with_retry(token, task, reason)
+                return
+
+        if activity.cacheable:
+            result_cache.store_result(activity, args, kwargs, result)
+
+
+def get_task_deadline(activity, started_at):
+    """
+    Time when an activity task times out, assuming it uses its activity's
+    start-to-close timeout.
+
+    :param activity: activity of the task, if known
+    :type activity: Optional[simpleflow.activity.Activity]
+    :param started_at: UNIX timestamp of the task start
+    :type started_at: float
+    :returns: UNIX timestamp, or None if unknown or without timeout
+    :rtype: Optional[float]
+    """
+    timeout = getattr(activity, 'task_start_to_close_timeout', None)
+    if timeout in (None, 'NONE'):
+        return None
+    return started_at + int(timeout)
 
 
 def process_task(poller, token, task):
@@ -248,16 +383,38 @@ def process_task(poller, token, task):
     """
     logger.debug('process_task() pid={}'.format(os.getpid()))
     format.JUMBO_FIELDS_MEMORY_CACHE.clear()
-    worker = ActivityWorker()
-    worker.process(poller, token, task)
+    poller.activity_worker.process(poller, token, task)
 
 
-def spawn_kubernetes_job(poller, swf_response):
-    logger.info('scheduling new kubernetes job name={}'.format(poller.job_name))
-    job = KubernetesJob(poller.job_name, poller.domain.name, swf_response)
+def spawn_kubernetes_job(poller, swf_response, job_name=None):
+    """
+    :param swf_response: raw SWF poll response, or list of responses for a
+                         job processing a batch of tasks
+    :type swf_response: dict | list[dict]
+    :param job_name: defaults to the name of the poller's next job
+    :type job_name: Optional[str]
+    """
+    job_name = job_name or poller.job_name
+    logger.info('scheduling new kubernetes job name={}'.format(job_name))
+    job = KubernetesJob(job_name, poller.domain.name, swf_response)
     job.schedule()
 
 
+def split_poll_data(poll_data):
+    """
+    Split the poll data of a job processing a batch of tasks, a list of poll
+    responses, into the poll data of each task.
+
+    :param poll_data: base64-encoded JSON poll response or list of responses
+    :type poll_data: str
+    :rtype: list[str]
+    """
+    data = json.loads(b64decode(poll_data))
+    if not isinstance(data, list):
+        return [poll_data]
+    return [b64encode(json_dumps(item).encode('utf-8')).decode('ascii') for item in data]
+
+
 def reap_process_tree(pid, wait_timeout=settings.ACTIVITY_SIGTERM_WAIT_SEC):
     """
     TERMinates (and KILLs) if necessary a process and its descendants.
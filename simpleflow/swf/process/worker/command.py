@@ -1,10 +1,16 @@
 from __future__ import absolute_import
 
+import multiprocessing
+
+import swf.actors
 import swf.models
+from simpleflow.dispatch import dynamic_dispatcher
+from simpleflow.process import Autoscaler
 
 from .base import (
     Worker,
     ActivityPoller,
+    split_poll_data,
 )
 
 
@@ -29,7 +35,7 @@ def make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data):
 
 
 def start(domain, task_list, nb_processes=None, heartbeat=60, one_task=False,
-          process_mode=None, poll_data=None):
+          process_mode=None, poll_data=None, max_processes=None, preload_modules=None):
     """
     Start a worker for the given domain and task_list.
     :param domain:
@@ -46,7 +52,22 @@ def start(domain, task_list, nb_processes=None, heartbeat=60, one_task=False,
     :type process_mode: Optional[str]
     :param poll_data: Base64 encoded poll data from SWF, in case you don't want to poll directly.
     :type poll_data: Optional[str]
+    :param max_processes: Enable autoscaling between nb_processes (or 1) and max_processes,
+        depending on the number of pending activity tasks.
+    :type max_processes: Optional[int]
+    :param preload_modules: Activity modules to import before forking children.
+    :type preload_modules: Optional[list[str]]
     """
+    if preload_modules:
+        dynamic_dispatcher.preload(preload_modules)
+
+    if poll_data:
+        batch = split_poll_data(poll_data)
+        if len(batch) > 1:
+            # a Kubernetes job processing a batch of tasks: process them side
+            # by side, so that each one heartbeats and meets its timeouts
+            return run_batch(domain, task_list, heartbeat, batch)
+
     poller = make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data)
 
     if poll_data:
@@ -56,6 +77,40 @@ def start(domain, task_list, nb_processes=None, heartbeat=60, one_task=False,
     if one_task:
         poller.run_once()
     else:
-        worker = Worker(poller, nb_processes)
+        autoscaler = None
+        if max_processes:
+            # NB: the counter has its own connection, it's used by the supervisor
+            # process and shouldn't share sockets with the forked pollers
+            counter = swf.actors.ActivityWorker(poller.domain, task_list)
+            autoscaler = Autoscaler(
+                counter.count_pending,
+                min_children=nb_processes or 1,
+                max_children=max_processes,
+            )
+        worker = Worker(poller, nb_processes, autoscaler=autoscaler)
         worker.is_alive = True
         worker.start()
+
+
+def run_batch(domain, task_list, heartbeat, batch):
+    """
+    Process tasks given as poll data, each one in its own process.
+
+    :param batch: base64 encoded poll data of each task
+    :type batch: list[str]
+    """
+    processes = [
+        multiprocessing.Process(
+            target=_run_poll_data,
+            args=(domain, task_list, heartbeat, poll_data),
+        )
+        for poll_data in batch
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def _run_poll_data(domain, task_list, heartbeat, poll_data):
+    make_worker_poller(domain, task_list, heartbeat, None, poll_data).run_once()
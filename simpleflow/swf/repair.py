@@ -0,0 +1,169 @@
+from __future__ import absolute_import
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+
+from simpleflow import logger
+from simpleflow.swf.helpers import swf_identity
+from swf.core import ConnectedSWFObject
+
+
+def fake_task_list_name(*parts):
+    """
+    Name of the task list where tasks are faked when repairing a workflow.
+
+    :param parts: strings identifying the repair, e.g. workflow and run IDs
+    :rtype: str
+    """
+    key = '|'.join(str(part) for part in parts)
+    return 'FAKE-' + hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+class RepairService(object):
+    """
+    Complete the tasks a workflow in repair mode schedules on its fake task
+    list, with the results recorded in the history of the execution being
+    repaired.
+
+    A single service (a daemon process, with one polling thread per task
+    kind and one connection per thread) is started by the decider poller
+    process, which outlives the processes taking the decisions, and
+    polled tasks are matched to recorded results by activity ID or child
+    workflow ID. So faking costs a schedule decision per task, not a process.
+
+    :ivar domain: domain name
+    :type domain: str
+    :ivar task_list: fake task list
+    :type task_list: str
+    """
+
+    def __init__(self, domain, task_list, history):
+        """
+        :param domain: domain name
+        :type domain: str
+        :param task_list: fake task list
+        :type task_list: str
+        :param history: parsed history of the execution being repaired
+        :type history: simpleflow.history.History
+        """
+        self.domain = domain
+        self.task_list = task_list
+        self.activity_results = {
+            activity_id: event['result']
+            for activity_id, event in history.activities.items()
+            if event['state'] == 'completed'
+        }
+        self.child_workflow_results = {
+            workflow_id: event['result']
+            for workflow_id, event in history.child_workflows.items()
+            if event['state'] == 'completed'
+        }
+        self._process = None
+        self._pid = None
+
+    def start(self):
+        """
+        Start the service if not already running in this process.
+        """
+        if self._pid == os.getpid() and self._process.is_alive():
+            return
+        logger.info('starting repair service on task list {} ({} activities, {} child workflows)'.format(
+            self.task_list, len(self.activity_results), len(self.child_workflow_results)))
+        self._process = multiprocessing.Process(target=self.run)
+        self._process.daemon = True
+        self._process.start()
+        self._pid = os.getpid()
+
+    def stop(self):
+        if self._pid == os.getpid() and self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None
+        self._pid = None
+
+    def run(self):
+        threads = []
+        if self.activity_results:
+            threads.append(threading.Thread(target=self._loop, args=(self.complete_activity_task,)))
+        if self.child_workflow_results:
+            threads.append(threading.Thread(target=self._loop, args=(self.complete_child_workflow_task,)))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _loop(self, complete_one):
+        connection = ConnectedSWFObject().connection
+        while True:
+            try:
+                complete_one(connection)
+            except Exception as err:
+                logger.exception('repair service: {}'.format(err))
+                time.sleep(1)
+
+    def complete_activity_task(self, connection):
+        """
+        Poll an activity task on the fake task list and complete it with the
+        recorded result.
+
+        :type connection: boto.swf.layer1.Layer1
+        :return: ID of the completed activity, if any
+        :rtype: Optional[str]
+        """
+        response = connection.poll_for_activity_task(
+            self.domain,
+            self.task_list,
+            identity=swf_identity(),
+        )
+        token = response.get('taskToken')
+        if not token:
+            return None
+        activity_id = response['activityId']
+        if activity_id not in self.activity_results:
+            connection.respond_activity_task_failed(
+                token,
+                reason='no recorded result for activity {}'.format(activity_id),
+            )
+            return None
+        connection.respond_activity_task_completed(token, self.activity_results[activity_id])
+        return activity_id
+
+    def complete_child_workflow_task(self, connection):
+        """
+        Poll a decision task on the fake task list and complete the child
+        workflow with the recorded result.
+
+        :type connection: boto.swf.layer1.Layer1
+        :return: ID of the completed child workflow, if any
+        :rtype: Optional[str]
+        """
+        response = connection.poll_for_decision_task(
+            self.domain,
+            self.task_list,
+            identity=swf_identity(),
+        )
+        token = response.get('taskToken')
+        if not token:
+            return None
+        workflow_id = response['workflowExecution']['workflowId']
+        if workflow_id not in self.child_workflow_results:
+            decision = {
+                'decisionType': 'FailWorkflowExecution',
+                'failWorkflowExecutionDecisionAttributes': {
+                    'reason': 'no recorded result for workflow {}'.format(workflow_id),
+                },
+            }
+            workflow_id = None
+        else:
+            decision = {
+                'decisionType': 'CompleteWorkflowExecution',
+                'completeWorkflowExecutionDecisionAttributes': {
+                    'result': self.child_workflow_results[workflow_id],
+                },
+            }
+        connection.respond_decision_task_completed(token, decisions=[decision])
+        return workflow_id
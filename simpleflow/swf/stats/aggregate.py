@@ -0,0 +1,46 @@
+from __future__ import absolute_import
+
+from multiprocessing.pool import ThreadPool
+
+from simpleflow import logger
+from simpleflow.history import History
+from simpleflow.swf.archive import get_history
+
+from .base import TaskTimings
+
+
+def _execution_timings(workflow_execution):
+    try:
+        history = History(get_history(workflow_execution))
+        history.parse()
+    except Exception as err:
+        logger.warning('cannot get history of workflow_id={} run_id={}: {}'.format(
+            workflow_execution.workflow_id, workflow_execution.run_id, err))
+        return None
+    return TaskTimings.from_history(history)
+
+
+def profile_executions(workflow_executions, max_workers=8):
+    """
+    Fetch and parse the histories of workflow executions concurrently, then
+    gather the timings of their tasks. Executions whose history cannot be
+    fetched are skipped.
+
+    :type workflow_executions: list[swf.models.WorkflowExecution]
+    :param max_workers: number of histories fetched at the same time
+    :type max_workers: int
+    :return: timings, number of executions profiled
+    :rtype: (TaskTimings, int)
+    """
+    timings = TaskTimings()
+    nb_executions = 0
+    pool = ThreadPool(max(1, min(max_workers, len(workflow_executions))))
+    try:
+        for execution_timings in pool.imap_unordered(_execution_timings, workflow_executions):
+            if execution_timings is None:
+                continue
+            timings.extend(execution_timings)
+            nb_executions += 1
+    finally:
+        pool.terminate()
+    return timings, nb_executions
@@ -1,7 +1,32 @@
+from __future__ import division
+
+import collections
+import math
+from datetime import datetime, timedelta
 from itertools import chain
 
+import pytz
 from future.utils import iteritems
 
+try:
+    import numpy
+except ImportError:  # optional: fall back to plain Python lists
+    numpy = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.UTC)
+
+FAILED_STATES = (
+    'failed',
+    'timed_out',
+    'schedule_failed',
+    'start_failed',
+    'canceled',
+    'cancelled',
+    'terminated',
+)
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
 
 def get_start_to_close_timing(event):
     last_state = event['state']
@@ -17,9 +42,285 @@ def get_start_to_close_timing(event):
     return last_state, scheduled, start, end, duration
 
 
+def to_microseconds(timestamp):
+    """
+    Convert a datetime to microseconds since the epoch. As a float, it's
+    exact (up to year 2255), so durations computed from it are identical to
+    ``timedelta.total_seconds()``.
+
+    :type timestamp: Optional[datetime]
+    :rtype: Optional[float]
+    """
+    if timestamp is None:
+        return None
+    epoch = EPOCH if timestamp.tzinfo else EPOCH.replace(tzinfo=None)
+    delta = timestamp - epoch
+    return float((delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds)
+
+
+def from_microseconds(value):
+    """
+    :type value: Optional[float]
+    :rtype: Optional[datetime]
+    """
+    value = none_if_nan(value)
+    if value is None:
+        return None
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def none_if_nan(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+
+def percentile(sorted_values, q):
+    """
+    Percentile of sorted values, interpolated linearly between the closest
+    ranks (like numpy's default method).
+
+    :type sorted_values: list[float]
+    :param q: percentile, between 0 and 100
+    :type q: float
+    :rtype: Optional[float]
+    """
+    if not len(sorted_values):
+        return None
+    rank = (len(sorted_values) - 1) * q / 100.
+    low = int(math.floor(rank))
+    high = int(math.ceil(rank))
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def compute_percentiles(values, qs):
+    """
+    Percentiles of a column, ignoring missing values.
+
+    :type values: numpy.ndarray | list[Optional[float]]
+    :type qs: Sequence[float]
+    :rtype: collections.OrderedDict[float, Optional[float]]
+    """
+    if numpy is not None:
+        values = values[~numpy.isnan(values)]
+        results = numpy.percentile(values, qs) if len(values) else [None] * len(qs)
+    else:
+        values = sorted(value for value in values if value is not None)
+        results = [percentile(values, q) for q in qs]
+    return collections.OrderedDict(
+        (q, float(result) if result is not None else None) for q, result in zip(qs, results)
+    )
+
+
+def _elapsed(starts, ends):
+    # seconds between two timestamp columns
+    if numpy is not None:
+        return (ends - starts) / 1e6
+    return [
+        (end - start) / 1e6 if start is not None and end is not None else None
+        for start, end in zip(starts, ends)
+    ]
+
+
+class TaskTimings(object):
+    """
+    Timings of the activities and child workflows of one or several workflow
+    executions, stored by column: the values of a task are at the same index
+    in every column.
+
+    Columns are built as lists; ``column()`` returns them as NumPy arrays
+    when NumPy is available (timestamps as floats, with NaN for missing
+    values), so computations on them are vectorized. Timestamps are in
+    microseconds since the epoch.
+    """
+    COLUMNS = (
+        'id',
+        'type',
+        'name',
+        'state',
+        'scheduled',
+        'started',
+        'closed',
+        'nb_failures',
+    )
+    NUMERIC_COLUMNS = ('scheduled', 'started', 'closed', 'nb_failures')
+
+    def __init__(self):
+        for column in self.COLUMNS:
+            setattr(self, column, [])
+        self._arrays = {}
+
+    def __len__(self):
+        return len(self.id)
+
+    @classmethod
+    def from_history(cls, history):
+        """
+        :param history: parsed history
+        :type history: simpleflow.history.History
+        :rtype: TaskTimings
+        """
+        timings = cls()
+        tasks = chain(
+            iteritems(history.activities),
+            iteritems(history.child_workflows),
+        )
+        for task_id, task in tasks:
+            state = task['state']
+            started = task.get('started_timestamp')
+            timings.id.append(task_id)
+            timings.type.append(task['type'])
+            timings.name.append(task.get('name') or task.get('activity_type', {}).get('name'))
+            timings.state.append(state)
+            timings.scheduled.append(to_microseconds(
+                task.get('scheduled_timestamp') or task.get('initiated_event_timestamp')))
+            timings.started.append(to_microseconds(started))
+            timings.closed.append(
+                to_microseconds(task['{}_timestamp'.format(state)]) if started is not None else None)
+            timings.nb_failures.append(task['retry'] + 1 if 'retry' in task else 0)
+        return timings
+
+    def extend(self, other):
+        """
+        :type other: TaskTimings
+        """
+        for column in self.COLUMNS:
+            getattr(self, column).extend(getattr(other, column))
+        self._arrays.clear()
+
+    def column(self, name):
+        """
+        :param name: column name
+        :type name: str
+        :return: the column, as an array if NumPy is available
+        :rtype: numpy.ndarray | list
+        """
+        if numpy is None:
+            return getattr(self, name)
+        if name not in self._arrays:
+            if name in self.NUMERIC_COLUMNS:
+                dtype = float
+            elif name in ('type', 'state'):
+                dtype = str
+            else:
+                dtype = object
+            self._arrays[name] = numpy.array(getattr(self, name), dtype=dtype)
+        return self._arrays[name]
+
+    def queue_times(self):
+        """
+        :return: seconds between scheduling and start, by task
+        :rtype: numpy.ndarray | list[Optional[float]]
+        """
+        return _elapsed(self.column('scheduled'), self.column('started'))
+
+    def run_times(self):
+        """
+        :return: seconds between start and close, by task
+        :rtype: numpy.ndarray | list[Optional[float]]
+        """
+        return _elapsed(self.column('started'), self.column('closed'))
+
+    def failed(self):
+        """
+        :return: whether the last state of each task is a failure
+        :rtype: numpy.ndarray | list[bool]
+        """
+        if numpy is not None:
+            return numpy.isin(self.column('state'), FAILED_STATES)
+        return [state in FAILED_STATES for state in self.state]
+
+    def retried(self):
+        """
+        :return: whether each task failed then was retried
+        :rtype: numpy.ndarray | list[bool]
+        """
+        failed = self.failed()
+        if numpy is not None:
+            return self.column('nb_failures') > failed
+        return [nb_failures > is_failed for nb_failures, is_failed in zip(self.nb_failures, failed)]
+
+    def groups(self):
+        """
+        :return: indexes of the tasks by (type, name), sorted by name
+        :rtype: list[((str, str), numpy.ndarray | list[int])]
+        """
+        keys = list(zip(self.type, [name or '' for name in self.name]))
+        if numpy is not None:
+            unique, inverse, counts = numpy.unique(
+                numpy.array(['\0'.join(key) for key in keys], dtype=str),
+                return_inverse=True,
+                return_counts=True,
+            )
+            indexes = numpy.split(numpy.argsort(inverse, kind='mergesort'), numpy.cumsum(counts)[:-1])
+            groups = [
+                (tuple(key.split('\0', 1)), group_indexes)
+                for key, group_indexes in zip(unique.tolist(), indexes)
+            ]
+        else:
+            indexes = collections.defaultdict(list)
+            for i, key in enumerate(keys):
+                indexes[key].append(i)
+            groups = list(indexes.items())
+        return sorted(groups, key=lambda group: (group[0][1], group[0][0]))
+
+    def aggregate(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Aggregate the timings by task type and name.
+
+        :param percentiles: percentiles of the queue and run times to compute
+        :type percentiles: Sequence[float]
+        :return: one dict per (type, name), sorted by name; `queue_time` and
+                 `run_time` map percentiles to values
+        :rtype: list[dict[str, Any]]
+        """
+        queue_times = self.queue_times()
+        run_times = self.run_times()
+        failed = self.failed()
+        retried = self.retried()
+
+        rows = []
+        for (task_type, name), indexes in self.groups():
+            if numpy is not None:
+                count = len(indexes)
+                group_failed = int(failed[indexes].sum())
+                group_retried = int(retried[indexes].sum())
+                group_queue_times = queue_times[indexes]
+                group_run_times = run_times[indexes]
+            else:
+                count = len(indexes)
+                group_failed = sum(failed[i] for i in indexes)
+                group_retried = sum(retried[i] for i in indexes)
+                group_queue_times = [queue_times[i] for i in indexes]
+                group_run_times = [run_times[i] for i in indexes]
+            rows.append({
+                'type': task_type,
+                'name': name,
+                'count': count,
+                'failure_rate': group_failed / count,
+                'retry_rate': group_retried / count,
+                'queue_time': compute_percentiles(group_queue_times, percentiles),
+                'run_time': compute_percentiles(group_run_times, percentiles),
+            })
+        return rows
+
+
 class WorkflowStats(object):
     def __init__(self, history):
         self._history = history
+        self._timings = None
+
+    @property
+    def timings(self):
+        """
+        Columnar timings of the activities and child workflows.
+
+        :rtype: TaskTimings
+        """
+        if self._timings is None:
+            self._history.parse()
+            self._timings = TaskTimings.from_history(self._history)
+        return self._timings
 
     def total_time(self):
         """
@@ -34,6 +335,49 @@ class WorkflowStats(object):
         end = history.events[-1].timestamp
         return (end - start).total_seconds()
 
+    def durations(self):
+        """
+        Returns the time in seconds spent in the execution of each task.
+
+        :rtype: numpy.ndarray | list[Optional[float]]
+        """
+        return self.timings.run_times()
+
+    def percentages(self):
+        """
+        Returns the percentage of the total time spent in the execution of
+        each task.
+
+        :rtype: numpy.ndarray | list[Optional[float]]
+        """
+        durations = self.durations()
+        total_time = self.total_time()
+        if numpy is not None:
+            return (durations / total_time) * 100.
+        return [(duration / total_time) * 100. if duration is not None else None for duration in durations]
+
+    def top(self, nb_tasks=None):
+        """
+        Returns the indexes of the tasks with a non-zero duration, longest
+        first.
+
+        :param nb_tasks: maximum number of indexes to return
+        :type nb_tasks: Optional[int]
+        :rtype: list[int]
+        """
+        durations = self.durations()
+        if numpy is not None:
+            candidates = numpy.flatnonzero(numpy.nan_to_num(durations) != 0)
+            order = candidates[numpy.argsort(-durations[candidates], kind='mergesort')]
+            indexes = order.tolist()
+        else:
+            indexes = sorted(
+                (i for i, duration in enumerate(durations) if duration),
+                key=lambda i: durations[i],
+                reverse=True,
+            )
+        return indexes[:nb_tasks] if nb_tasks else indexes
+
     def get_timings(self):
         """
         Returns the time in seconds spent in the execution of a task, i.e.
@@ -48,16 +392,16 @@ class WorkflowStats(object):
              ('activity-module.otherfunc-1', 'completed', scheduled, start, end, 13.37)]
 
         """
-        history = self._history
-        history.parse()
-
-        events = chain(
-            iteritems(history._activities),
-            iteritems(history._child_workflows),
-        )
+        timings = self.timings
+        durations = self.durations()
         return [
-            (name,) + get_start_to_close_timing(attributes) for
-            name, attributes in events
+            (timings.id[i],
+             timings.state[i],
+             from_microseconds(timings.scheduled[i]),
+             from_microseconds(timings.started[i]),
+             from_microseconds(timings.closed[i]),
+             none_if_nan(durations[i]))
+            for i in range(len(timings))
         ]
 
     def get_timings_with_percentage(self):
@@ -75,10 +419,8 @@ class WorkflowStats(object):
              ('activity-module.otherfunc-1', 'completed', scheduled, start, end, 13.37, 3.8)]
 
         """
-        timing = -1
-        total_time = self.total_time()
-
+        percentages = self.percentages()
         return [
-            (vals + ((vals[timing] / total_time) * 100.,) if vals[timing] else None)
-            for vals in self.get_timings()
+            (vals + (float(percentages[i]),) if vals[-1] else None)
+            for i, vals in enumerate(self.get_timings())
         ]
@@ -1,4 +1,3 @@
-import operator
 from datetime import datetime
 from functools import partial, wraps
 from itertools import chain
@@ -7,10 +6,13 @@ from future.utils import iteritems
 
 from simpleflow import compat
 from simpleflow.history import History
+from simpleflow.swf.archive import get_history
+from simpleflow.swf.utils import get_history_tail
 from simpleflow.utils import json_dumps
 from tabulate import tabulate
 
 from . import WorkflowStats
+from .base import from_microseconds, none_if_nan
 
 TEMPLATE = '''
 Workflow Execution {workflow_id}
@@ -48,15 +50,38 @@ def tabular(values, headers, tablefmt, floatfmt):
 
 def csv(values, headers, delimiter=','):
     import csv
-    from io import BytesIO
+    if compat.PY2:
+        from io import BytesIO as StringIO
+    else:
+        from io import StringIO
 
-    data = BytesIO()
+    data = StringIO()
 
     csv.writer(data, delimiter=delimiter).writerows(values)
 
     return data.getvalue()
 
 
+def iter_csv(values, headers, delimiter=','):
+    """
+    Like `csv`, but yields each line as soon as its row is available.
+    """
+    import csv
+    if compat.PY2:
+        from io import BytesIO as StringIO
+    else:
+        from io import StringIO
+
+    data = StringIO()
+    writer = csv.writer(data, delimiter=delimiter)
+
+    for row in values:
+        writer.writerow(row)
+        yield data.getvalue()
+        data.seek(0)
+        data.truncate()
+
+
 def human(values, headers):
     return tabulate(
         [(str(k), str(v)) for k, v in zip(headers, values[0])],
@@ -81,6 +106,10 @@ FORMATS = {
     'human': human,
     'json': jsonify,
 }
+STREAMED_FORMATS = {
+    'csv': iter_csv,
+    'tsv': partial(iter_csv, delimiter='\t'),
+}
 
 
 def get_timestamps(task):
@@ -92,7 +121,7 @@ def get_timestamps(task):
 
 
 def info(workflow_execution):
-    history = History(workflow_execution.history())
+    history = History(get_history(workflow_execution))
     history.parse()
 
     if history.tasks:
@@ -137,7 +166,7 @@ def info(workflow_execution):
 
 
 def profile(workflow_execution, nb_tasks=None):
-    stats = WorkflowStats(History(workflow_execution.history()))
+    stats = WorkflowStats(History(get_history(workflow_execution)))
 
     header = (
         'Task',
@@ -150,32 +179,63 @@ def profile(workflow_execution, nb_tasks=None):
         'Percentage of total time',
     )
 
-    values = (
-        (task,
-         last_state,
-         scheduled.strftime(TIME_FORMAT) if scheduled else None,
-         (start - scheduled).total_seconds() if scheduled else None,
-         start.strftime(TIME_FORMAT) if start else None,
-         (end - start).total_seconds() if start else None,
-         end.strftime(TIME_FORMAT) if end else None,
-         percent) for task, last_state, scheduled, start, end, timing, percent in
-        (row for row in stats.get_timings_with_percentage() if row is not None)
-    )
-    rows = sorted(
-        values,
-        key=operator.itemgetter(5),
-        reverse=True,
-    )
+    timings = stats.timings
+    queue_times = timings.queue_times()
+    run_times = timings.run_times()
+    percentages = stats.percentages()
 
-    if nb_tasks:
-        rows = rows[:nb_tasks]
+    def format_time(value):
+        timestamp = from_microseconds(value)
+        return timestamp.strftime(TIME_FORMAT) if timestamp else None
+
+    rows = [
+        (timings.id[i],
+         timings.state[i],
+         format_time(timings.scheduled[i]),
+         none_if_nan(queue_times[i]),
+         format_time(timings.started[i]),
+         none_if_nan(run_times[i]),
+         format_time(timings.closed[i]),
+         none_if_nan(percentages[i]))
+        for i in stats.top(nb_tasks)
+    ]
 
     return header, rows
 
 
+def aggregated_profile(rows, nb_executions):
+    """
+    :param rows: aggregated timings, see `TaskTimings.aggregate()`
+    :type rows: list[dict[str, Any]]
+    :param nb_executions: number of profiled executions
+    :type nb_executions: int
+    """
+    percentiles = list(rows[0]['queue_time']) if rows else []
+    header = (
+        ('Type', 'Task', 'Count', 'Per execution', 'Failure %', 'Retry %') +
+        tuple('Queue p{}'.format(q) for q in percentiles) +
+        tuple('Run p{}'.format(q) for q in percentiles)
+    )
+    values = [
+        (row['type'],
+         row['name'],
+         row['count'],
+         row['count'] / float(nb_executions),
+         row['failure_rate'] * 100.,
+         row['retry_rate'] * 100.) +
+        tuple(row['queue_time'].values()) +
+        tuple(row['run_time'].values())
+        for row in rows
+    ]
+    return header, values
+
+
 def status(workflow_execution, nb_tasks=None):
-    history = History(workflow_execution.history())
-    history.parse()
+    if nb_tasks:
+        history = get_history_tail(workflow_execution, nb_tasks)
+    else:
+        history = History(get_history(workflow_execution))
+        history.parse()
 
     header = 'Tasks', 'Last State', 'Last State Time', 'Scheduled Time'
     rows = [
@@ -207,6 +267,25 @@ def formatted(with_info=False, with_header=False, fmt=DEFAULT_FORMAT):
     return formatter
 
 
+def streamed(fmt):
+    """
+    Like `formatted`, for the formats in `STREAMED_FORMATS`: the wrapped
+    function returns an iterator over the output chunks instead of a string.
+    """
+    fmt = STREAMED_FORMATS[fmt]
+
+    def formatter(func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            _, rows = func(*args, **kwargs)
+            return fmt(rows, headers=[])
+
+        wrapped.__wrapped__ = wrapped
+        return wrapped
+
+    return formatter
+
+
 def list_executions(workflow_executions):
     header = 'Workflow ID', 'Workflow Type', 'Status'
     rows = ((
@@ -243,7 +322,7 @@ def list_details(workflow_executions):
 
 
 def get_task(workflow_execution, task_id, details=False):
-    history = History(workflow_execution.history())
+    history = History(get_history(workflow_execution))
     history.parse()
     task = history.activities[task_id]
     header = ['type', 'id', 'name', 'version', 'state', 'timestamp', 'input', 'result', 'reason']
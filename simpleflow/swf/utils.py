@@ -4,6 +4,7 @@ import swf.exceptions
 import swf.models
 import swf.querysets
 from simpleflow.history import History
+from simpleflow.swf.archive import get_archived_history, get_history
 
 
 if False:
@@ -41,10 +42,91 @@ def get_workflow_execution(domain_name, workflow_id, run_id=None):
 # "simpleflow" and "swf" namespaces
 def get_workflow_history(domain_name, workflow_id, run_id=None):
     workflow_execution = get_workflow_execution(domain_name, workflow_id, run_id=run_id)
-    history = History(workflow_execution.history())
+    history = History(get_history(workflow_execution))
     return history
 
 
+def get_history_tail(workflow_execution, nb_tasks, page_size=100):
+    """
+    Return the parsed history of the last tasks of a workflow execution.
+
+    Pages are fetched in reverse order, only until they hold `nb_tasks`
+    tasks, so looking at the current state of a long execution costs a few
+    API calls instead of its whole history. An archived history is used as
+    is.
+
+    :type workflow_execution: swf.models.WorkflowExecution
+    :param nb_tasks: minimum number of tasks to get (unless the execution has fewer)
+    :type nb_tasks: int
+    :type page_size: int
+    :rtype: History
+    """
+    archived = get_archived_history(workflow_execution)
+    if archived is not None:
+        history = History(archived)
+        history.parse()
+        return history
+
+    query = swf.querysets.HistoryQuerySet(workflow_execution.domain)
+    events = []
+    task_keys = set()
+    history = None
+    nb_parsed_tasks = nb_parsed_events = None
+    for page in query.iter_pages(
+            workflow_execution.run_id,
+            workflow_execution.workflow_id,
+            page_size=page_size,
+            reverse=True):
+        events.extend(page)
+        task_keys.update(key for key in map(_get_task_key, page) if key is not None)
+        # Parsing is linear in the number of events: only parse once the
+        # pages may hold enough tasks, instead of after each page.
+        if len(task_keys) < nb_tasks or len(task_keys) == nb_parsed_tasks:
+            continue
+        history = _parse_tail(events)
+        nb_parsed_tasks, nb_parsed_events = len(task_keys), len(events)
+        if len(history.tasks) >= nb_tasks:
+            return history
+    if nb_parsed_events != len(events):
+        history = _parse_tail(events)
+    return history
+
+
+def _parse_tail(events):
+    history = History(swf.models.History.from_event_list(events[::-1]))
+    history.parse_tail()
+    return history
+
+
+# Events adding a task to a parsed history, with the attribute identifying
+# the task when it may be added by several events
+_TASK_EVENTS = {
+    'ActivityTaskScheduled': 'activityId',
+    'ScheduleActivityTaskFailed': 'activityId',
+    'ActivityTaskCancelRequested': 'activityId',
+    'StartChildWorkflowExecutionInitiated': 'workflowId',
+    'StartChildWorkflowExecutionFailed': 'workflowId',
+    'WorkflowExecutionSignaled': None,
+}
+
+
+def _get_task_key(event):
+    """
+    Key of the task a raw event adds to a parsed history, if any.
+
+    :type event: dict
+    :rtype: Optional[tuple]
+    """
+    event_type = event['eventType']
+    if event_type not in _TASK_EVENTS:
+        return None
+    id_name = _TASK_EVENTS[event_type]
+    if id_name is None:
+        return event_type, event['eventId']
+    attributes = event['{}{}EventAttributes'.format(event_type[0].lower(), event_type[1:])]
+    return id_name, attributes[id_name]
+
+
 def sanitize_activity_context(context):
     return {
         "name": context["activityType"]["name"],
@@ -82,12 +82,22 @@ class ActivityTask(Task):
             self.kwargs,
             self.id)
 
-    def execute(self):
+    def execute(self, encoded=False):
+        """
+        Execute the activity.
+
+        :param encoded: if the activity supports it (see `simpleflow.execute.python`),
+            return its result as a `simpleflow.format.EncodedJSON`.
+        :type encoded: bool
+        """
         method = self.activity.callable
 
         if getattr(method, 'add_context_in_kwargs', False):
             self.kwargs["context"] = self.context
 
+        if encoded and hasattr(method, 'encoded'):
+            return method.encoded(*self.args, **self.kwargs)
+
         if hasattr(method, 'execute'):
             task = method(*self.args, **self.kwargs)
             task.context = self.context
@@ -97,8 +107,10 @@ class ActivityTask(Task):
             return result
         else:
             # NB: the following line attaches some *state* to the callable, so it
-            # can be used directly for advanced usage. This works well because we
-            # don't do multithreading, but if we ever do, DANGER!
+            # can be used directly for advanced usage. It is shared by the
+            # threads of a process: local executions run concurrent activities
+            # in processes by default, and activities run in threads should
+            # get their context in their kwargs (add_context_in_kwargs).
             method.context = self.context
             return method(*self.args, **self.kwargs)
 
@@ -1,4 +1,7 @@
+import contextlib
 import re
+import signal
+import time
 from zlib import adler32
 
 from . import retry  # NOQA
@@ -67,3 +70,42 @@ def to_k8s_identifier(string):
     string = re.sub(r"[^a-z-]", "-", string)
     string = re.sub(r"--+", "-", string)
     return string
+
+
+class TimeLimitExceeded(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    """
+    Limit the duration of a block to *seconds*.
+
+    In the main thread, the block is interrupted by a SIGALRM timer (unless
+    another timer is already set). Elsewhere, it can't be interrupted:
+    TimeLimitExceeded is raised once it's done, if it took too long.
+
+    :type seconds: float
+    :raise: TimeLimitExceeded
+    """
+    def interrupt(signum, frame):
+        raise TimeLimitExceeded('time limit of {}s exceeded'.format(seconds))
+
+    armed = False
+    if hasattr(signal, 'setitimer') and not signal.getitimer(signal.ITIMER_REAL)[0]:
+        try:
+            previous_handler = signal.signal(signal.SIGALRM, interrupt)
+        except ValueError:  # not in the main thread
+            pass
+        else:
+            signal.setitimer(signal.ITIMER_REAL, seconds)
+            armed = True
+    start = time.time()
+    try:
+        yield
+    finally:
+        if armed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    if time.time() - start > seconds:
+        raise TimeLimitExceeded('time limit of {}s exceeded'.format(seconds))
@@ -1,9 +1,20 @@
 import time
 import collections
 import functools
+import random
+import threading
+from contextlib import contextmanager
+from itertools import count
 
 from simpleflow import logger
 
+# Counters by call site name: attempts, retries, sleep (seconds), giveups,
+# budget_exhausted, deadline_exceeded.
+stats = collections.defaultdict(collections.Counter)
+_stats_lock = threading.Lock()
+
+_deadlines = threading.local()
+
 
 def _to_tuple(exceptions):
     if not isinstance(exceptions, collections.Sequence):
@@ -25,25 +36,156 @@ def exponential(value):
     """
     Set retry time exponentially; per the "+ 1," begin at a minimum of one second.
     """
-    import random
-
     return random.random() * (2 ** value) + 1
 
 
+def capped_exponential(base=1, cap=60):
+    """
+    Exponential backoff with "full jitter": wait a random time between 0 and
+    ``base * 2 ** nb_retries``, never more than *cap* seconds.
+
+    :param base: upper bound of the first delay, in seconds.
+    :type  base: float
+    :param cap: maximum delay, in seconds.
+    :type  cap: float
+    :rtype: callable(nb_retries: int) -> float
+    """
+    def call(nb_retries):
+        return random.uniform(0, min(cap, base * 2 ** nb_retries))
+
+    return call
+
+
+class DecorrelatedJitter(object):
+    """
+    "Decorrelated jitter" backoff: each delay is a random time between *base*
+    and three times the previous delay, never more than *cap* seconds.
+
+    Delays depend on the previous ones, so `with_delay` uses `delays()`
+    rather than calling the policy with the number of retries.
+    """
+    def __init__(self, base=1, cap=60):
+        self.base = base
+        self.cap = cap
+
+    def delays(self):
+        delay = self.base
+        while True:
+            delay = min(self.cap, random.uniform(self.base, delay * 3))
+            yield delay
+
+
+def decorrelated_jitter(base=1, cap=60):
+    return DecorrelatedJitter(base, cap)
+
+
+class RetryBudget(object):
+    """
+    Limits the retries of a call site to a ratio of its calls: over the last
+    *period* seconds, at most ``max(min_retries, ratio * calls)`` retries.
+
+    When a service degrades, call sites stop retrying instead of piling up
+    sleeps and adding load.
+
+    :ivar ratio: retries allowed per call.
+    :type ratio: float
+    :ivar min_retries: retries always allowed in a period.
+    :type min_retries: int
+    :ivar period: sliding window, in seconds.
+    :type period: float
+    """
+    def __init__(self, ratio=0.2, min_retries=10, period=60):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.period = period
+        self._calls = collections.deque()
+        self._retries = collections.deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        for timestamps in (self._calls, self._retries):
+            while timestamps and timestamps[0] <= now - self.period:
+                timestamps.popleft()
+
+    def record_call(self):
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            self._calls.append(now)
+
+    def can_retry(self):
+        """
+        Takes a retry from the budget if possible.
+
+        :rtype: bool
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if len(self._retries) >= max(self.min_retries, self.ratio * len(self._calls)):
+                return False
+            self._retries.append(now)
+            return True
+
+
+@contextmanager
+def deadline(timestamp):
+    """
+    Retries of the current thread within this context won't sleep past
+    *timestamp*: they give up instead.
+
+    Nested deadlines can only shorten the current one.
+
+    :param timestamp: UNIX timestamp, or None for no deadline.
+    :type  timestamp: Optional[float]
+    """
+    previous = getattr(_deadlines, 'timestamp', None)
+    if timestamp is not None and previous is not None:
+        timestamp = min(timestamp, previous)
+    _deadlines.timestamp = timestamp if timestamp is not None else previous
+    try:
+        yield
+    finally:
+        _deadlines.timestamp = previous
+
+
+def current_deadline():
+    """
+    :rtype: Optional[float]
+    """
+    return getattr(_deadlines, 'timestamp', None)
+
+
+def _count(name, counter, value=1):
+    with _stats_lock:
+        stats[name][counter] += value
+
+
+def _delays(delay):
+    if hasattr(delay, 'delays'):
+        return delay.delays()
+    return (delay(nb_retries) for nb_retries in count())
+
+
 def with_delay(
         nb_times=1,
         delay=constant(1),
         on_exceptions=Exception,
         except_on=None,
-        log_with=None):
+        log_with=None,
+        budget=None,
+        name=None):
     """
     Retry the *decorated* function *nb_times* with a *delay*.
 
+    Retries never sleep past the `deadline` of the current thread. Attempts,
+    retries, sleeps and giveups are counted in `stats` under *name*.
+
     :param nb_times: number of times to retry.
     :type  nb_times: int
 
     :param delay: to wait before the next retry (also called back-off).
-    :type  delay: callable(value: int) -> int
+    :type  delay: callable(value: int) -> int | DecorrelatedJitter
 
     :param on_exceptions: retry only when these exceptions raise.
     :type  on_exceptions: Exception | Sequence([Exception])
@@ -52,6 +194,12 @@ def with_delay(
     :type  except_on: Sequence([Exception])
 
     :param log_with: logger instance to use.
+
+    :param budget: retry budget, shared by the calls of a call site.
+    :type  budget: Optional[RetryBudget]
+
+    :param name: call site name in `stats`; defaults to the function's.
+    :type  name: Optional[str]
     """
     if log_with is None:
         log_with = logger.info
@@ -59,25 +207,43 @@ def with_delay(
         except_on = ()  # Can't "except None" in py3
 
     def decorate(func):
+        call_site = name or '{}.{}'.format(
+            getattr(func, '__module__', None),
+            getattr(func, '__name__', func.__class__.__name__),
+        )
+
         @functools.wraps(func)
         def decorated(*args, **kwargs):
             nb_retries = 0
+            delays = _delays(delay)
+            if budget is not None:
+                budget.record_call()
             while True:
+                _count(call_site, 'attempts')
                 try:
                     return func(*args, **kwargs)
                 except except_on:
                     raise
                 except on_exceptions as error:
-                    wait_delay = delay(nb_retries)
+                    wait_delay = next(delays)
+                    last_attempt = nb_times - nb_retries <= 1
+                    stop = _stop_reason(wait_delay, None if last_attempt else budget)
+                    if stop:
+                        _count(call_site, 'giveups')
+                        _count(call_site, stop)
+                        log_with('error "%r": giving up (%s)', error, stop.replace('_', ' '))
+                        raise
                     log_with(
                         'error "%r": retrying in %.2f seconds',
                         error,
                         wait_delay,
                     )
-                    time.sleep(wait_delay)
+                    _sleep(call_site, wait_delay)
                     nb_retries += 1
                     if nb_times - nb_retries <= 0:
+                        _count(call_site, 'giveups')
                         raise
+                    _count(call_site, 'retries')
 
         return decorated
 
@@ -85,3 +251,17 @@ def with_delay(
     except_on = _to_tuple(except_on)
 
     return decorate
+
+
+def _stop_reason(wait_delay, budget):
+    timestamp = current_deadline()
+    if timestamp is not None and time.time() + wait_delay >= timestamp:
+        return 'deadline_exceeded'
+    if budget is not None and not budget.can_retry():
+        return 'budget_exhausted'
+    return None
+
+
+def _sleep(call_site, wait_delay):
+    _count(call_site, 'sleep', wait_delay)
+    time.sleep(wait_delay)
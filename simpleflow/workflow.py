@@ -115,6 +115,30 @@ class Workflow(Submittable):
         """
         self._executor.fail(reason, details)
 
+    def continue_as_new(self, *args, **kwargs):
+        """
+        Close this execution and start a new run of the workflow, called with
+        *args* and *kwargs*: they should carry the state the new run needs,
+        e.g. results of the steps already done. User-called.
+
+        The new run starts with an empty history, bounding the replay cost
+        of long-running workflows.
+        """
+        self._executor.continue_as_new(*args, **kwargs)
+
+    def checkpoint(self, name, func, *args, **kwargs):
+        """
+        Call *func* with *args* and *kwargs*: a phase of the workflow
+        submitting tasks and returning their JSON-serializable results.
+        Once it has returned, SWF executions record its result in a snapshot
+        marker; later replays return it without calling *func* again.
+
+        :param name: name of the checkpoint, unique in the workflow
+        :type name: str
+        :type func: Callable
+        """
+        return self._executor.checkpoint(name, func, *args, **kwargs)
+
     def before_replay(self, history):
         """
         Method called before playing the execution.
@@ -1,5 +1,6 @@
 # -*- coding:utf-8 -*-
 
+from swf import ratelimit
 from swf.core import ConnectedSWFObject
 from swf.models import Domain
 
@@ -19,12 +20,19 @@ class Actor(ConnectedSWFObject):
 
     :ivar  task_list: task list the Actor should watch for tasks on
     :type  task_list: str
+
+    :ivar  rate_limiter: limits the actor's calls to SWF (defaults to the
+                         process-wide one, configured by `SWF_RATE_LIMITS`)
+    :type  rate_limiter: swf.ratelimit.RateLimiter
+
+    :raises ValueError: if the rate limits configuration is invalid
     """
     def __init__(self, domain, task_list):
         super(Actor, self).__init__()
 
         self._set_domain(domain)
         self.task_list = task_list
+        self.rate_limiter = ratelimit.get_rate_limiter()
 
     def _set_domain(self, domain):
         if not isinstance(domain, Domain):
@@ -48,6 +56,15 @@ class Actor(ConnectedSWFObject):
         """
         raise NotImplementedError
 
+    def throttle(self, api):
+        """Waits until the rate limits allow a call to the *api* SWF API
+        on the actor's domain.
+
+        :param  api: SWF API name, e.g. ``PollForActivityTask``
+        :type   api: str
+        """
+        self.rate_limiter.acquire(api, self.domain.name)
+
     def get_error_message(self, e):
         """
 
@@ -42,6 +42,7 @@ class Decider(Actor):
         if execution_context is not None and not isinstance(execution_context, compat.string_types):
             execution_context = json_dumps(execution_context)
         try:
+            self.throttle('RespondDecisionTaskCompleted')
             self.connection.respond_decision_task_completed(
                 task_token,
                 decisions,
@@ -58,6 +59,34 @@ class Decider(Actor):
         finally:
             logging_context.reset()
 
+    def count_pending(self, task_list=None):
+        """Returns the approximate number of decision tasks waiting in
+        ``task_list`` (defaults to the actor's task list)
+
+        :param  task_list: task list to count pending tasks on
+        :type   task_list: str
+
+        :rtype: int
+        """
+        task_list = task_list or self.task_list
+        try:
+            self.throttle('CountPendingDecisionTasks')
+            response = self.connection.count_pending_decision_tasks(
+                self.domain.name,
+                task_list,
+            )
+        except boto.exception.SWFResponseError as e:
+            message = self.get_error_message(e)
+            if e.error_code == 'UnknownResourceFault':
+                raise DoesNotExistError(
+                    "Unable to count pending decision tasks",
+                    message,
+                )
+
+            raise ResponseError(message)
+
+        return response['count']
+
     def poll(self, task_list=None,
              identity=None,
              **kwargs):
@@ -80,6 +109,7 @@ class Decider(Actor):
         logging_context.reset()
         task_list = task_list or self.task_list
 
+        self.throttle('PollForDecisionTask')
         task = self.connection.poll_for_decision_task(
             self.domain.name,
             task_list=task_list,
@@ -98,6 +128,7 @@ class Decider(Actor):
         next_page = task.get('nextPageToken')
         while next_page:
             try:
+                self.throttle('PollForDecisionTask')
                 task = self.connection.poll_for_decision_task(
                     self.domain.name,
                     task_list=task_list,
@@ -46,6 +46,7 @@ class ActivityWorker(Actor):
         :type   details: string
         """
         try:
+            self.throttle('RespondActivityTaskCanceled')
             return self.connection.respond_activity_task_canceled(
                 task_token,
                 details=format.details(details),
@@ -71,6 +72,7 @@ class ActivityWorker(Actor):
         :type   result: string
         """
         try:
+            self.throttle('RespondActivityTaskCompleted')
             return self.connection.respond_activity_task_completed(
                 task_token,
                 format.result(result),
@@ -98,6 +100,7 @@ class ActivityWorker(Actor):
         :type   reason: string
         """
         try:
+            self.throttle('RespondActivityTaskFailed')
             return self.connection.respond_activity_task_failed(
                 task_token,
                 details=format.details(details),
@@ -123,6 +126,7 @@ class ActivityWorker(Actor):
         :type   details: string
         """
         try:
+            self.throttle('RecordActivityTaskHeartbeat')
             return self.connection.record_activity_task_heartbeat(
                 task_token,
                 format.heartbeat_details(details),
@@ -143,6 +147,34 @@ class ActivityWorker(Actor):
 
             raise ResponseError(message)
 
+    def count_pending(self, task_list=None):
+        """Returns the approximate number of activity tasks waiting in
+        ``task_list`` (defaults to the actor's task list)
+
+        :param  task_list: task list to count pending tasks on
+        :type   task_list: string
+
+        :rtype: int
+        """
+        task_list = task_list or self.task_list
+        try:
+            self.throttle('CountPendingActivityTasks')
+            response = self.connection.count_pending_activity_tasks(
+                self.domain.name,
+                task_list,
+            )
+        except boto.exception.SWFResponseError as e:
+            message = self.get_error_message(e)
+            if e.error_code == 'UnknownResourceFault':
+                raise DoesNotExistError(
+                    "Unable to count pending activity tasks",
+                    message,
+                )
+
+            raise ResponseError(message)
+
+        return response['count']
+
     def poll(self, task_list=None, identity=None):
         """Polls for an activity task to process from current
         actor's instance defined ``task_list``
@@ -170,6 +202,7 @@ class ActivityWorker(Actor):
         identity = identity or self._identity
 
         try:
+            self.throttle('PollForActivityTask')
             task = self.connection.poll_for_activity_task(
                 self.domain.name,
                 task_list,
@@ -4,7 +4,9 @@
 # Copyright (c) 2013, Greg Leclercq
 #
 # See the file LICENSE for copying permission.
+import collections
 import os
+import threading
 
 from boto.exception import NoAuthHandlerFound
 import boto.swf
@@ -20,6 +22,107 @@ from . import settings
 
 SETTINGS = settings.get()
 RETRIES = int(os.environ.get('SWF_CONNECTION_RETRIES', '5'))
+POOLING = not os.environ.get('SWF_DISABLE_CONNECTION_POOLING')
+
+
+class ConnectionPool(object):
+    """Process-local pool of SWF connections.
+
+    Connecting resolves credentials and each connection keeps its own
+    HTTP(S) connections alive, so objects talking to the same region with
+    the same credentials share a connection. boto connections aren't
+    thread-safe: each thread gets its own ones.
+
+    After a fork, the connections inherited from the parent process are
+    dropped (their sockets, and SSL states, are shared with the parent):
+    the child builds its own ones.
+
+    Counters on connections are kept in `stats`:
+
+    - ``created``: connections built
+    - ``reused``: connections served from the pool
+    - ``discarded``: connections dropped after a fork
+
+    Reuses happen on each SWF call: they are counted by thread, without
+    taking the pool's lock, and summed when `stats` is read.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = collections.Counter()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._nb_connections = 0
+        self._thread_stats = []
+
+    def _connections(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    discarded = self._nb_connections
+                    self._reset()
+                    self._stats = collections.Counter(discarded=discarded)
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+            self._local.stats = collections.Counter()
+            with self._lock:
+                self._thread_stats.append(self._local.stats)
+        return connections
+
+    @property
+    def stats(self):
+        """
+        :rtype: collections.Counter
+        """
+        with self._lock:
+            stats = self._stats.copy()
+            for thread_stats in self._thread_stats:
+                stats.update(thread_stats)
+        return stats
+
+    def get(self, region, **credentials):
+        """Returns a connection to SWF in *region* for the current thread,
+        creating it if needed.
+
+        :param region: name of the AWS region
+        :type region: str
+        :param credentials: ``aws_access_key_id`` and ``aws_secret_access_key``,
+                            if not provided by boto's credentials chain
+        :type credentials: str
+        :returns: the connection, or None if the region is invalid
+        :rtype: Optional[boto.swf.layer1.Layer1]
+        """
+        connections = self._connections()
+        key = (region, tuple(sorted(credentials.items())))
+        connection = connections.get(key)
+        if connection is not None:
+            self._local.stats['reused'] += 1
+            return connection
+
+        connection = boto.swf.connect_to_region(region, **credentials)
+        if connection is not None:
+            connections[key] = connection
+            with self._lock:
+                self._nb_connections += 1
+                self._stats['created'] += 1
+            logger.debug("initiated connection to region={} pid={} thread={}".format(
+                region, self._pid, threading.current_thread().name))
+        return connection
+
+    def clear(self):
+        """Drops every connection of the process (not only the current
+        thread's ones)."""
+        with self._lock:
+            for thread_stats in self._thread_stats:
+                self._stats.update(thread_stats)
+            self._reset()
+
+
+connection_pool = ConnectionPool()
 
 
 class ConnectedSWFObject(object):
@@ -29,13 +132,17 @@ class ConnectedSWFObject(object):
 
     :ivar region: name of the AWS region
     :type region: str
-    :ivar connection: connection to the SWF endpoint
+    :ivar connection: connection to the SWF endpoint, from `connection_pool`
+                      unless passed explicitly or pooling is disabled (with
+                      the `SWF_DISABLE_CONNECTION_POOLING` environment
+                      variable)
     :type connection: boto.swf.layer1.Layer1
 
     """
     __slots__ = [
         'region',
-        'connection'
+        '_credentials',
+        '_connection',
     ]
 
     @retry.with_delay(nb_times=RETRIES,
@@ -49,10 +156,31 @@ class ConnectedSWFObject(object):
         # dictionary to boto SWF client, which will use its default credentials
         # chain provider.
         cred_keys = ['aws_access_key_id', 'aws_secret_access_key']
-        creds_ = {k: SETTINGS[k] for k in cred_keys if SETTINGS.get(k, None)}
-        self.connection = (kwargs.pop('connection', None) or
-                           boto.swf.connect_to_region(self.region, **creds_))
-        if self.connection is None:
-            raise ValueError('invalid region: {}'.format(self.region))
+        self._credentials = {k: SETTINGS[k] for k in cred_keys if SETTINGS.get(k, None)}
+        self._connection = kwargs.pop('connection', None)
+        if self._connection is None:
+            if POOLING:
+                connection = connection_pool.get(self.region, **self._credentials)
+            else:
+                connection = self._connection = boto.swf.connect_to_region(self.region, **self._credentials)
+                logger.debug("initiated connection to region={}".format(self.region))
+            if connection is None:
+                raise ValueError('invalid region: {}'.format(self.region))
+
+    @property
+    def connection(self):
+        """Connection to the SWF endpoint.
+
+        Pooled connections are looked up on each access, so that an object
+        created in a thread or a parent process uses a connection of the
+        current thread and process.
+
+        :rtype: boto.swf.layer1.Layer1
+        """
+        if self._connection is not None:
+            return self._connection
+        return connection_pool.get(self.region, **self._credentials)
 
-        logger.debug("initiated connection to region={}".format(self.region))
+    @connection.setter
+    def connection(self, connection):
+        self._connection = connection
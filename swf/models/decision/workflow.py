@@ -94,7 +94,7 @@ class WorkflowExecutionDecision(Decision):
             'taskStartToCloseTimeout': task_timeout,
             'input': input,
             'tagList': tag_list,
-            'taskList': task_list,
+            'taskList': {'name': task_list} if task_list else None,
             'workflowTypeVersion': workflow_type_version,
         })
 
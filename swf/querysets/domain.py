@@ -60,7 +60,7 @@ class DomainQuerySet(BaseQuerySet):
             domain_info['name'],
             status=domain_info['status'],
             retention_period=domain_config['workflowExecutionRetentionPeriodInDays'],
-            connection=self.connection
+            connection=self._connection
         )
 
     def get_or_create(self, name,
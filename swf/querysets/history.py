@@ -35,16 +35,38 @@ class HistoryQuerySet(BaseQuerySet):
         if max_results < page_size:
             page_size = max_results
 
-        response = self.connection.get_workflow_execution_history(
-            self.domain.name,
-            run_id,
-            workflow_id,
-            maximum_page_size=page_size,
-            reverse_order=reverse)
-        events = response['events']
-
-        next_page = response.get('nextPageToken')
-        while next_page is not None and len(events) < max_results:
+        events = []
+        for page in self.iter_pages(run_id, workflow_id, page_size=page_size, reverse=reverse):
+            events.extend(page)
+            if len(events) >= max_results:
+                break
+
+        return History.from_event_list(events)
+
+    def iter_pages(self, run_id, workflow_id, page_size=100, reverse=False):
+        """Lazily retrieves the pages of a WorkflowExecution history
+
+        Pages are only requested as the iteration goes, so callers can stop
+        as soon as they've got the events they need (typically the last ones,
+        with ``reverse=True``).
+
+        :param  run_id: unique identifier of the workflow execution
+        :type   run_id: string
+
+        :param  workflow_id: The user defined identifier associated with the workflow execution
+        :type   workflow_id: string
+
+        :param  page_size: Swf api response page size
+        :type   page_size: int
+
+        :param  reverse: Should the history events be retrieved in reverse order.
+        :type   reverse: bool
+
+        :returns: raw events, one list per page
+        :rtype: collections.Iterator[list[dict]]
+        """
+        next_page = None
+        while True:
             response = self.connection.get_workflow_execution_history(
                 self.domain.name,
                 run_id,
@@ -53,7 +75,7 @@ class HistoryQuerySet(BaseQuerySet):
                 next_page_token=next_page,
                 reverse_order=reverse
             )
-            events.extend(response['events'])
+            yield response['events']
             next_page = response.get('nextPageToken')
-
-        return History.from_event_list(events)
+            if next_page is None:
+                return
@@ -5,6 +5,9 @@
 #
 # See the file LICENSE for copying permission.
 
+import time
+from multiprocessing.pool import ThreadPool
+
 from boto.swf.exceptions import SWFResponseError
 
 from swf.constants import REGISTERED, MAX_WORKFLOW_AGE
@@ -391,6 +394,18 @@ class WorkflowExecutionQuerySet(BaseWorkflowQuerySet):
     _infos = 'executionInfo'
     _infos_plural = 'executionInfos'
 
+    # When listing concurrently, the time window is split in this many
+    # sub-ranges per worker, so that workers stay busy if executions
+    # aren't evenly spread over time.
+    RANGES_PER_WORKER = 4
+
+    def __init__(self, domain, *args, **kwargs):
+        super(WorkflowExecutionQuerySet, self).__init__(domain, *args, **kwargs)
+        # Workflow types by (name, version): listed executions only hold a
+        # reference to them, described ones come from `get_workflow_type`.
+        self._workflow_types = {}
+        self._described_workflow_types = {}
+
     def _is_valid_status_param(self, status, param):
         statuses = {
             WorkflowExecution.STATUS_OPEN: {
@@ -422,6 +437,8 @@ class WorkflowExecutionQuerySet(BaseWorkflowQuerySet):
         # `oldest_date` mandatory arg.
         if status == WorkflowExecution.STATUS_OPEN:
             kwargs['oldest_date'] = kwargs.pop('start_oldest_date')
+            if 'start_latest_date' in kwargs:
+                kwargs['latest_date'] = kwargs.pop('start_latest_date')
 
         try:
             method = 'list_{}_workflow_executions'.format(statuses[status])
@@ -431,19 +448,21 @@ class WorkflowExecutionQuerySet(BaseWorkflowQuerySet):
 
     def get_workflow_type(self, execution_info):
         workflow_type = execution_info['workflowType']
-        workflow_type_qs = WorkflowTypeQuerySet(self.domain)
+        key = (workflow_type['name'], workflow_type['version'])
+        if key not in self._described_workflow_types:
+            workflow_type_qs = WorkflowTypeQuerySet(self.domain)
+            self._described_workflow_types[key] = workflow_type_qs.get(*key)
 
-        return workflow_type_qs.get(
-            workflow_type['name'],
-            workflow_type['version'],
-        )
+        return self._described_workflow_types[key]
 
     def to_WorkflowExecution(self, domain, execution_info, **kwargs):
-        workflow_type = WorkflowType(
-            self.domain,
-            execution_info['workflowType']['name'],
-            execution_info['workflowType']['version']
-        )
+        # WorkflowType instances are immutable, so executions of the same
+        # type can share one.
+        key = (execution_info['workflowType']['name'], execution_info['workflowType']['version'])
+        workflow_type = self._workflow_types.get(key)
+        if workflow_type is None:
+            workflow_type = WorkflowType(self.domain, *key)
+            self._workflow_types[key] = workflow_type
 
         return WorkflowExecution(
             domain,
@@ -552,11 +571,40 @@ class WorkflowExecutionQuerySet(BaseWorkflowQuerySet):
                                   * ``CLOSE_TIMED_OUT``
             :type   close_status: string
 
+        * Concurrency
+
+            :param  max_workers: if greater than 1 and the time window is only
+                                 bounded by its oldest date, split it into
+                                 sub-ranges listed concurrently by this many
+                                 threads. Executions are still returned in
+                                 descending start time order.
+            :type   max_workers: int
+
             :returns: workflow executions objects list
             :rtype: list
         """
+        return list(self.iter_filter(
+            status, tag,
+            workflow_id, workflow_type_name,
+            workflow_type_version,
+            *args, **kwargs
+        ))
+
+    def iter_filter(self,
+                    status=WorkflowExecution.STATUS_OPEN, tag=None,
+                    workflow_id=None, workflow_type_name=None,
+                    workflow_type_version=None,
+                    *args, **kwargs):
+        """Same as `filter`, but yields workflow executions as soon as they
+        are listed, so callers can process the first ones while the next
+        pages are fetched.
+
+        :returns: workflow executions objects iterator
+        :rtype: collections.Iterator[swf.models.WorkflowExecution]
+        """
         # As WorkflowTypeQuery has to be built against a specific domain
         # name, domain filter is disposable, but not mandatory.
+        max_workers = kwargs.pop('max_workers', 1)
         invalid_kwargs = self._validate_status_parameters(status, kwargs)
 
         if invalid_kwargs:
@@ -588,18 +636,68 @@ class WorkflowExecutionQuerySet(BaseWorkflowQuerySet):
         else:
             start_oldest_date = None
 
-        return [self.to_WorkflowExecution(self.domain, wfe) for wfe in
-                self._list_items(
-                    *args,
-                    domain=self.domain.name,
-                    status=status,
-                    workflow_id=workflow_id,
-                    workflow_name=workflow_type_name,
-                    workflow_version=workflow_type_version,
-                    start_oldest_date=start_oldest_date,
-                    tag=tag,
-                    **kwargs
-                )]
+        list_kwargs = dict(
+            domain=self.domain.name,
+            status=status,
+            workflow_id=workflow_id,
+            workflow_name=workflow_type_name,
+            workflow_version=workflow_type_version,
+            tag=tag,
+            **kwargs
+        )
+        # Only split windows with a single time bound: the latest start
+        # date is then now, and start and close filters are mutually
+        # exclusive anyway.
+        time_bounded = any(
+            param in kwargs for param in
+            ('latest_date', 'start_latest_date', 'close_latest_date', 'close_oldest_date')
+        )
+        if max_workers > 1 and start_oldest_date and not time_bounded:
+            items = self._list_items_concurrently(args, list_kwargs, start_oldest_date, max_workers)
+        else:
+            items = self._list_items(*args, start_oldest_date=start_oldest_date, **list_kwargs)
+
+        for wfe in items:
+            yield self.to_WorkflowExecution(self.domain, wfe)
+
+    def _list_items_concurrently(self, args, kwargs, start_oldest_date, max_workers):
+        """Lists the executions started in sub-ranges of
+        [start_oldest_date, now] in a pool of threads, and yields them from
+        the newest sub-range to the oldest one.
+
+        Sub-ranges bounds are inclusive: executions started on a bound are
+        only yielded once.
+        """
+        start_latest_date = int(time.time()) + 1
+        nb_ranges = max_workers * self.RANGES_PER_WORKER
+        bounds = [
+            start_oldest_date + (start_latest_date - start_oldest_date) * i // nb_ranges
+            for i in range(nb_ranges + 1)
+        ]
+        ranges = [(bounds[i], bounds[i + 1]) for i in reversed(range(nb_ranges))]
+
+        def list_range(time_range):
+            # boto connections aren't thread-safe: one queryset per range
+            queryset = self.__class__(self.domain)
+            return list(queryset._list_items(
+                *args,
+                start_oldest_date=time_range[0],
+                start_latest_date=time_range[1],
+                **kwargs
+            ))
+
+        pool = ThreadPool(min(max_workers, nb_ranges))
+        seen = set()
+        try:
+            for items in pool.imap(list_range, ranges):
+                for item in items:
+                    key = (item['execution']['workflowId'], item['execution']['runId'])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    yield item
+        finally:
+            pool.terminate()
 
     def _list(self, *args, **kwargs):
         return self.list_workflow_executions(*args, **kwargs)
@@ -0,0 +1,290 @@
+# -*- coding:utf-8 -*-
+"""
+Client-side rate limiting of SWF API calls.
+
+Limits are token buckets: a bucket holds up to ``capacity`` tokens, refilled
+at ``rate`` tokens per second, and each call takes one. When the bucket is
+empty, the call waits for its token instead of being rejected by SWF with a
+``ThrottlingException``.
+
+They are configured with the ``SWF_RATE_LIMITS`` environment variable, a
+comma-separated list of ``API=RATE[/CAPACITY]``; ``*`` applies to the APIs
+not listed. Each (API, domain) pair has its own bucket:
+
+    SWF_RATE_LIMITS='RecordActivityTaskHeartbeat=10/20,*=50'
+
+By default, buckets are local to a process. If
+``SWF_RATE_LIMITS_DIRECTORY`` is set, they are stored in files of this
+directory, so that the processes of a host (e.g. the children of a worker
+supervisor) share them.
+
+The configuration is read when the first actor is created, so that a
+malformed value fails the worker or decider startup. Throttling counters
+are logged every ``SWF_RATE_LIMITS_LOG_INTERVAL`` seconds (defaults to 300,
+0 disables it).
+"""
+from __future__ import division
+
+import collections
+import errno
+import fcntl
+import os
+import re
+import threading
+import time
+
+from simpleflow import logger
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket.
+
+    :ivar rate: tokens added per second
+    :type rate: float
+    :ivar capacity: maximum number of tokens, i.e. burst size
+    :type capacity: float
+    """
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('invalid rate: {}'.format(rate))
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._lock = threading.Lock()
+        self._state = (self.capacity, time.time())
+
+    def _load(self):
+        return self._state
+
+    def _save(self, tokens, updated_at):
+        self._state = (tokens, updated_at)
+
+    def _locked(self):
+        return self._lock
+
+    def take(self):
+        """Takes a token, possibly ahead of its availability.
+
+        The bucket goes into debt rather than making callers compete for
+        the next token: concurrent callers are served in turn.
+
+        :returns: seconds to wait before the token is available
+        :rtype: float
+        """
+        with self._locked():
+            tokens, updated_at = self._load()
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0., now - updated_at) * self.rate) - 1
+            self._save(tokens, now)
+        return max(0., -tokens / self.rate)
+
+
+class _FileLock(object):
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self._fd
+
+    def __exit__(self, *exc_info):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket stored in a file, shared by the processes of a host.
+
+    :ivar path: file storing the bucket state
+    :type path: str
+    """
+    def __init__(self, path, rate, capacity=None):
+        super(SharedTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self._file_lock = _FileLock(path)
+
+    def _locked(self):
+        return self._file_lock
+
+    def _load(self):
+        fd = self._file_lock._fd
+        os.lseek(fd, 0, os.SEEK_SET)
+        content = os.read(fd, 64).decode('ascii').split()
+        try:
+            tokens, updated_at = float(content[0]), float(content[1])
+        except (IndexError, ValueError):
+            return self.capacity, time.time()
+        return tokens, updated_at
+
+    def _save(self, tokens, updated_at):
+        fd = self._file_lock._fd
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, '{!r} {!r}'.format(tokens, updated_at).encode('ascii'))
+
+    def take(self):
+        # One lock file per bucket and process: also serialize the threads
+        # of the process, flock() being held per open file description.
+        with self._lock:
+            return super(SharedTokenBucket, self).take()
+
+
+def parse_limits(value):
+    """Parses ``API=RATE[/CAPACITY]`` comma-separated limits.
+
+    >>> sorted(parse_limits('PollForActivityTask=2/10, *=5').items())
+    [('*', (5.0, None)), ('PollForActivityTask', (2.0, 10.0))]
+
+    :type value: str
+    :rtype: dict[str, (float, Optional[float])]
+    """
+    limits = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        match = re.match(r'^([\w*]+)\s*=\s*([\d.]+)(?:\s*/\s*([\d.]+))?$', item)
+        if not match:
+            raise ValueError('invalid rate limit: {!r}'.format(item))
+        api, rate, capacity = match.groups()
+        try:
+            rate, capacity = float(rate), float(capacity) if capacity else None
+        except ValueError:
+            raise ValueError('invalid rate limit: {!r}'.format(item))
+        if rate <= 0 or (capacity is not None and capacity <= 0):
+            raise ValueError('invalid rate limit: {!r} (rate and burst must be positive)'.format(item))
+        limits[api] = (rate, capacity)
+    return limits
+
+
+class RateLimiter(object):
+    """Token buckets by (API, domain).
+
+    Counters are kept by API in `stats`, and logged every `log_interval`
+    seconds:
+
+    - ``calls``: calls that went through the limiter
+    - ``throttled``: calls that had to wait
+    - ``wait``: seconds waited
+
+    :ivar limits: (rate, capacity) by API name, ``*`` being the default
+    :type limits: dict[str, (float, Optional[float])]
+    :ivar directory: if set, buckets are shared through files in it
+    :type directory: Optional[str]
+    :ivar log_interval: seconds between two logs of `stats` (0 to disable)
+    :type log_interval: float
+    """
+    def __init__(self, limits=None, directory=None, log_interval=300):
+        self.limits = limits or {}
+        self.directory = directory
+        self.log_interval = log_interval
+        self.stats = collections.defaultdict(collections.Counter)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._logged_at = time.time()
+
+    @classmethod
+    def from_env(cls):
+        """
+        :raises ValueError: if the configuration is invalid
+        """
+        value = os.environ.get('SWF_RATE_LIMITS')
+        try:
+            limits = parse_limits(value)
+        except ValueError as err:
+            raise ValueError('SWF_RATE_LIMITS={!r}: {}'.format(value, err))
+        log_interval = os.environ.get('SWF_RATE_LIMITS_LOG_INTERVAL') or 300
+        try:
+            log_interval = float(log_interval)
+        except ValueError:
+            raise ValueError('SWF_RATE_LIMITS_LOG_INTERVAL={!r}: not a number'.format(log_interval))
+        return cls(limits, os.environ.get('SWF_RATE_LIMITS_DIRECTORY') or None, log_interval)
+
+    def _make_bucket(self, api, domain, rate, capacity):
+        if not self.directory:
+            return TokenBucket(rate, capacity)
+        try:
+            os.makedirs(self.directory)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        filename = re.sub(r'[^\w.-]', '_', '{}-{}.bucket'.format(api, domain))
+        return SharedTokenBucket(os.path.join(self.directory, filename), rate, capacity)
+
+    def bucket(self, api, domain):
+        """
+        :returns: the bucket of *api* on *domain*, None if not limited
+        :rtype: Optional[TokenBucket]
+        """
+        key = (api, domain)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self.limits.get(api) or self.limits.get('*')
+            if limit is None:
+                return None
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = self._make_bucket(api, domain, *limit)
+        return bucket
+
+    def acquire(self, api, domain):
+        """Waits until a call to *api* on *domain* is allowed.
+
+        :param api: SWF API name, e.g. ``PollForActivityTask``
+        :type api: str
+        :type domain: str
+        :returns: seconds waited
+        :rtype: float
+        """
+        bucket = self.bucket(api, domain)
+        if bucket is None:
+            return 0.
+        wait = bucket.take()
+        with self._lock:
+            stats = self.stats[api]
+            stats['calls'] += 1
+            if wait:
+                stats['throttled'] += 1
+                stats['wait'] += wait
+            now = time.time()
+            log_stats = self.log_interval and now - self._logged_at >= self.log_interval
+            if log_stats:
+                self._logged_at = now
+        if log_stats:
+            self.log_stats()
+        if wait:
+            logger.debug('throttling {} on domain={} for {:.3f}s'.format(api, domain, wait))
+            time.sleep(wait)
+        return wait
+
+    def log_stats(self):
+        with self._lock:
+            stats = sorted((api, dict(counters)) for api, counters in self.stats.items())
+        for api, counters in stats:
+            logger.info('rate limits: {} calls={} throttled={} wait={:.3f}s'.format(
+                api,
+                counters.get('calls', 0),
+                counters.get('throttled', 0),
+                counters.get('wait', 0.),
+            ))
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Returns the process-wide rate limiter, configured from the
+    environment on first use.
+
+    :raises ValueError: if the configuration is invalid
+    :rtype: RateLimiter
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter.from_env()
+        return _rate_limiter
@@ -1,6 +1,5 @@
 import swf.models
-from mock import patch
+from mock import MagicMock
 
-with patch('boto.swf.connect_to_region'):
-    DOMAIN = swf.models.Domain('TestDomain')
+DOMAIN = swf.models.Domain('TestDomain', connection=MagicMock())
 DEFAULT_VERSION = 'test'
@@ -1,9 +1,13 @@
 from __future__ import absolute_import
 
 import json
+import threading
 import unittest
 
+from six import StringIO
+
 import boto
+from mock import patch
 
 from simpleflow import metrology, settings, storage
 from simpleflow.activity import with_attributes
@@ -22,6 +26,11 @@ class MyMetrologyTask(metrology.MetrologyTask):
         with self.step('Step1') as step:
             step.metadata["num"] = self.num
             step.read.records = self.num
+            records = step.counter("records")
+            sizes = step.histogram("sizes", bounds=(1, 10))
+            for i in range(self.num):
+                records.add()
+                sizes.observe(i * 5)
         self.meta = "foo bar"
 
 
@@ -55,6 +64,9 @@ class MetrologyTestCase(unittest.TestCase):
         self.assertEqual(steps[0]["name"], "Step1")
         self.assertEqual(steps[0]["read"]["records"], 1)
         self.assertEqual(steps[0]["metadata"]["num"], 1)
+        self.assertEqual(steps[0]["counters"], {"records": 1})
+        self.assertEqual(steps[0]["histograms"]["sizes"]["counts"], [1, 0, 0])
+        self.assertGreaterEqual(steps[0]["resources"]["cpu_user"], 0)
 
         res = json.loads(storage.pull_content(
             settings.METROLOGY_BUCKET,
@@ -64,6 +76,78 @@ class MetrologyTestCase(unittest.TestCase):
         self.assertEqual(res[0][1]["metrology"]["steps"][0]["read"]["records"], 1)
         self.assertEqual(res[0][1]["metrology"]["steps"][0]["metadata"]["num"], 1)
 
+    def test_histogram(self):
+        histogram = metrology.Histogram("latency", bounds=(10, 1, 100))
+        for value in (0.5, 1, 5, 10, 50, 1000):
+            histogram.observe(value)
+        stats = histogram.get_stats()
+        self.assertEqual([1, 10, 100], stats["bounds"])
+        self.assertEqual([2, 2, 1, 1], stats["counts"])
+        self.assertEqual(6, stats["count"])
+        self.assertEqual(0.5, stats["min"])
+        self.assertEqual(1000, stats["max"])
+
+    def test_step_resources(self):
+        task = MyMetrologyTask.callable(1)
+        with task.step("alloc") as step:
+            data = b"x" * (1024 * 1024)
+        stats = step.get_stats()["resources"]
+        self.assertEqual(
+            ["cpu_user", "cpu_system", "read_bytes", "write_bytes", "read_chars", "write_chars", "rss", "max_rss"],
+            list(stats),
+        )
+        self.assertGreaterEqual(stats["cpu_user"] + stats["cpu_system"], 0)
+        if stats["rss"] is not None:
+            self.assertGreater(stats["rss"], len(data))
+
+    @mock_s3
+    def test_async_upload(self):
+        self.create_bucket()
+        task = MyMetrologyTask.callable(3)
+        task.context = {"workflow_id": "wf", "run_id": "run", "activity_id": "1"}
+        task.execute()
+        task.post_execute()
+        metrology.wait_for_uploads()
+
+        res = json.loads(storage.pull_content(settings.METROLOGY_BUCKET, "wf/run/activity.1.json"))
+        self.assertEqual(res["steps"][0]["counters"], {"records": 3})
+
+    def test_wait_for_uploads_is_bounded(self):
+        released = threading.Event()
+        thread = threading.Thread(target=released.wait)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(released.set)
+        with metrology._uploads_lock:
+            metrology._uploads.append(thread)
+
+        metrology.wait_for_uploads(timeout=0.1)
+
+        self.assertTrue(thread.is_alive())
+        self.assertEqual([], metrology._uploads)
+
+    @mock_s3
+    def test_fetch_metrology(self):
+        self.create_bucket()
+        for i in range(5):
+            storage.push_content(settings.METROLOGY_BUCKET, "wf/run/activity.{}.json".format(i), json.dumps({"i": i}))
+        storage.push_content(settings.METROLOGY_BUCKET, "wf/run/metrology.json", "[]")
+
+        key_names = [key.name for key in storage.list_keys(settings.METROLOGY_BUCKET, "wf/run/")]
+        with patch("boto.s3.bucket.Bucket.get_key") as get_key:
+            results = dict(metrology.fetch_metrology(settings.METROLOGY_BUCKET, key_names, max_workers=3))
+        get_key.assert_not_called()
+        self.assertEqual(
+            {"wf/run/activity.{}.json".format(i): {"i": i} for i in range(5)},
+            results,
+        )
+
+    def test_dump_json_list(self):
+        for values in ([], [["0", {"state": "completed"}], ["1", {}]]):
+            f = StringIO()
+            metrology.dump_json_list(values, f)
+            self.assertEqual(values, json.loads(f.getvalue()))
+
 
 if __name__ == '__main__':
     unittest.main()
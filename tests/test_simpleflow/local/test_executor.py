@@ -1,17 +1,60 @@
+import threading
+import time
 import unittest
 
-from simpleflow import Workflow
+import mock
+
+from simpleflow import Workflow, exceptions, futures
 from simpleflow.activity import with_attributes
 from simpleflow.canvas import Chain, Group
 from simpleflow.constants import MINUTE, HOUR
 from simpleflow.local import Executor
 from simpleflow.task import WorkflowTask
+from tests.data.activities import double, increment, raise_on_failure
+
 
 @with_attributes()
 def to_int(arg):
     return int(arg)
 
 
+@with_attributes(raises_on_failure=True)
+def make_lock():
+    return threading.Lock()
+
+
+class Tracker(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.calls = []
+
+
+tracker = Tracker()
+
+
+@with_attributes()
+def tracked(name, duration=0.1):
+    with tracker.lock:
+        tracker.running += 1
+        tracker.max_running = max(tracker.max_running, tracker.running)
+        tracker.calls.append(name)
+    time.sleep(duration)
+    with tracker.lock:
+        tracker.running -= 1
+    return name
+
+
+def context_activity_id(duration, context=None):
+    time.sleep(duration)
+    return context["activity_id"]
+
+
+context_activity_id.add_context_in_kwargs = True
+context_activity_id = with_attributes()(context_activity_id)
+
+
 class MyWorkflow(Workflow):
     name = "test_workflow"
     version = "test_version"
@@ -88,3 +131,141 @@ class TestRunContext(unittest.TestCase):
 
         self.assertEqual(child3["workflow_id"], "test_workflow_id")
         self.assertEqual(child1_1["workflow_id"], "local_childworkflow")
+
+
+class TestConcurrentExecutor(unittest.TestCase):
+    def setUp(self):
+        global tracker
+        tracker = Tracker()
+
+    def run_workflow(self, run, max_workers=4, pool='thread', input=None):
+        class ConcurrentWorkflow(MyWorkflow):
+            pass
+
+        ConcurrentWorkflow.run = run
+        executor = Executor(ConcurrentWorkflow, max_workers=max_workers, pool=pool)
+        return executor, executor.run(input)
+
+    def test_activities_run_concurrently(self):
+        def run(self):
+            fs = [self.submit(tracked, i, duration=0.2) for i in range(4)]
+            futures.wait(*fs)
+            return [f.result for f in fs]
+
+        executor, result = self.run_workflow(run)
+        self.assertEqual([0, 1, 2, 3], result)
+        self.assertEqual(4, tracker.max_running)
+        self.assertEqual(4, len(executor._history.activities))
+
+    def test_group_max_parallel(self):
+        def run(self):
+            return Group(*[(tracked, i) for i in range(6)], max_parallel=2).submit(self.executor).result
+
+        _, result = self.run_workflow(run)
+        self.assertEqual(list(range(6)), result)
+        self.assertEqual(2, tracker.max_running)
+
+    def test_chain_order(self):
+        def run(self):
+            return Chain(
+                Group((tracked, 'a'), (tracked, 'b')),
+                (tracked, 'c'),
+                (tracked, 'd'),
+            ).submit(self.executor).result
+
+        _, result = self.run_workflow(run)
+        self.assertEqual([['a', 'b'], 'c', 'd'], result)
+        self.assertEqual({'a', 'b'}, set(tracker.calls[:2]))
+        self.assertEqual(['c', 'd'], tracker.calls[2:])
+
+    def test_dependent_activities(self):
+        def run(self, x):
+            y = self.submit(increment, x)
+            z = self.submit(double, y)
+            return z.result
+
+        _, result = self.run_workflow(run, input={'args': [1]})
+        self.assertEqual(4, result)
+
+    def test_raises_on_failure(self):
+        def run(self):
+            return self.submit(raise_on_failure).result
+
+        with self.assertRaises(exceptions.TaskFailed):
+            self.run_workflow(run)
+
+    def test_child_workflow(self):
+        class ChildWorkflow(MyWorkflow):
+            name = 'child'
+
+            def run(self, x):
+                fs = [self.submit(tracked, x + i) for i in range(2)]
+                return sum(f.result for f in fs)
+
+        def run(self):
+            fs = [self.submit(ChildWorkflow, x) for x in (10, 20)]
+            return [f.result for f in fs]
+
+        _, result = self.run_workflow(run)
+        self.assertEqual([21, 41], result)
+        self.assertEqual(4, tracker.max_running)
+
+    def test_process_pool(self):
+        def run(self):
+            fs = [self.submit(increment, i) for i in range(4)]
+            return [f.result for f in fs]
+
+        _, result = self.run_workflow(run, max_workers=2, pool='process')
+        self.assertEqual([1, 2, 3, 4], result)
+
+    def test_unpicklable_result_fails(self):
+        def run(self):
+            return self.submit(make_lock).result
+
+        with self.assertRaises(exceptions.TaskFailed):
+            self.run_workflow(run, max_workers=2, pool='process')
+
+    def test_unpicklable_result_fails_without_error_callback(self):
+        def run(self):
+            return self.submit(make_lock).result
+
+        # as on Python 2
+        with mock.patch('six.PY3', False), self.assertRaises(exceptions.TaskFailed):
+            self.run_workflow(run, max_workers=2, pool='process')
+
+    def test_invalid_pool(self):
+        with self.assertRaises(ValueError):
+            Executor(MyWorkflow, pool='fiber')
+
+    def test_process_pool_by_default(self):
+        self.assertEqual('process', Executor(MyWorkflow, max_workers=2).pool)
+
+    def test_context_in_kwargs_in_threads(self):
+        def run(self):
+            fs = [self.submit(context_activity_id, 0.1 * (4 - i)) for i in range(4)]
+            return [f.result for f in fs]
+
+        executor, result = self.run_workflow(run)
+        self.assertEqual(4, len(set(result)))
+        self.assertEqual(
+            sorted(result),
+            sorted(a['id'] for a in executor._history.activities.values()),
+        )
+
+
+class ContinuedWorkflow(MyWorkflow):
+    def run(self, total, remaining):
+        self.submit(self.record_marker('step', total))
+        if not remaining:
+            return total
+        a = self.submit(increment, total)
+        self.continue_as_new(a.result, remaining - 1)
+
+
+class TestContinueAsNew(unittest.TestCase):
+    def test_continue_as_new(self):
+        executor = Executor(ContinuedWorkflow)
+        result = executor.run({'args': [0, 3]})
+        self.assertEqual(3, result)
+        # markers of the previous runs aren't kept
+        self.assertEqual([3], [m.details for m in executor.list_markers(all=True)])
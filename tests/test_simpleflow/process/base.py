@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+
+import mock
+
+from simpleflow.process import Supervisor
+
+
+class FakeProcessesMixin(object):
+    """
+    Runs a supervisor without forking: children are mocks with increasing
+    pids starting at 100, and the clock is `self.now`.
+    """
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("simpleflow.process.supervisor._now", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pids = iter(range(100, 200))
+
+        def fake_process(target, args):
+            process = mock.Mock()
+            process.pid = next(self.pids)
+            process.exitcode = None
+            return process
+
+        patcher = mock.patch("multiprocessing.Process", side_effect=fake_process)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_supervisor(self, **kwargs):
+        def noop():
+            pass
+
+        supervisor = Supervisor(noop, **kwargs)
+        # pretend signals wake the supervisor up, so no fallback polling
+        supervisor._wakeup_fds = (-1, -1)
+        return supervisor
@@ -0,0 +1,108 @@
+import unittest
+
+from simpleflow.process import Autoscaler
+from tests.test_simpleflow.process.base import FakeProcessesMixin
+
+
+class FakeBacklog(object):
+    """
+    Fake counter backend: a task list where `arrivals[t]` tasks are added at
+    tick t, and each child processes one task per tick.
+    """
+
+    def __init__(self, arrivals):
+        self.arrivals = arrivals
+        self.pending = 0
+
+    def tick(self, t, nb_children):
+        self.pending += self.arrivals.get(t, 0)
+        self.pending = max(0, self.pending - nb_children)
+
+    def count(self):
+        return self.pending
+
+
+class TestAutoscaler(unittest.TestCase):
+    def test_bounds(self):
+        with self.assertRaises(ValueError):
+            Autoscaler(lambda: 0, min_children=3, max_children=2)
+        autoscaler = Autoscaler(lambda: 0, min_children=2)
+        self.assertEqual(autoscaler.max_children, 2)
+        self.assertEqual(autoscaler.clamp(10), 2)
+
+    def test_grows_with_backlog(self):
+        autoscaler = Autoscaler(lambda: 7, min_children=1, max_children=10, backlog_per_child=2)
+        self.assertEqual(autoscaler.compute(1, now=0), 5)
+        self.assertEqual(autoscaler.compute(5, now=1), 9)
+        self.assertEqual(autoscaler.compute(9, now=2), 10)
+
+    def test_shrinks_after_delay(self):
+        autoscaler = Autoscaler(lambda: 0, min_children=1, max_children=10, scale_down_delay=60)
+        self.assertEqual(autoscaler.compute(4, now=0), 4)
+        self.assertEqual(autoscaler.compute(4, now=59), 4)
+        self.assertEqual(autoscaler.compute(4, now=60), 3)
+        self.assertEqual(autoscaler.compute(3, now=100), 3)
+        self.assertEqual(autoscaler.compute(3, now=120), 2)
+
+    def test_counter_errors_keep_current(self):
+        def broken():
+            raise RuntimeError("boom")
+        autoscaler = Autoscaler(broken, min_children=1, max_children=10)
+        self.assertEqual(autoscaler.compute(4, now=0), 4)
+
+    def test_simulation(self):
+        # a burst of 100 tasks at t=10, then nothing
+        backlog = FakeBacklog({10: 100})
+        autoscaler = Autoscaler(backlog.count, min_children=1, max_children=8,
+                                backlog_per_child=4, scale_down_delay=5)
+        nb_children = 1
+        history = []
+        for t in range(60):
+            backlog.tick(t, nb_children)
+            nb_children = autoscaler.compute(nb_children, now=t)
+            history.append(nb_children)
+
+        self.assertEqual(history[:10], [1] * 10)
+        self.assertEqual(max(history), 8)
+        self.assertEqual(history[-1], 1)
+        self.assertEqual(backlog.pending, 0)
+
+
+class TestSupervisorAutoscaling(FakeProcessesMixin, unittest.TestCase):
+    def setUp(self):
+        super(TestSupervisorAutoscaling, self).setUp()
+        self.backlog = 0
+        self.autoscaler = Autoscaler(lambda: self.backlog, min_children=1, max_children=4,
+                                     interval=10, scale_down_delay=0)
+        self.supervisor = self.make_supervisor(autoscaler=self.autoscaler)
+
+    def loop(self):
+        self.supervisor._autoscale()
+        self.supervisor._reap_worker_processes()
+        self.supervisor._start_worker_processes()
+
+    def test_grow_and_drain(self):
+        self.loop()
+        self.assertEqual(len(self.supervisor._processes), 1)
+        self.assertEqual(self.supervisor._next_wakeup_timeout(), 10)
+
+        self.backlog = 10
+        self.now += 10
+        self.loop()
+        self.assertEqual(len(self.supervisor._processes), 4)
+
+        # shrinking drains the extra children with a SIGTERM...
+        self.backlog = 0
+        self.now += 10
+        self.loop()
+        draining = self.supervisor._slots[3]
+        self.assertTrue(draining.draining)
+        draining.process.terminate.assert_called_once_with()
+        self.assertEqual(len(self.supervisor._processes), 4)
+
+        # ... which are not restarted nor counted as crashes once they exit
+        draining.process.exitcode = 0
+        self.loop()
+        self.assertEqual(len(self.supervisor._processes), 3)
+        self.assertEqual(draining.consecutive_failures, 0)
+        self.assertEqual(self.supervisor.total_restarts, 0)
@@ -3,6 +3,7 @@ import os
 import signal
 import sys
 import time
+import unittest
 
 from flaky import flaky
 from psutil import Process
@@ -11,6 +12,7 @@ from setproctitle import setproctitle
 from sure import expect
 
 from simpleflow.process import Supervisor, reset_signal_handlers
+from tests.test_simpleflow.process.base import FakeProcessesMixin
 from tests.utils import IntegrationTestCase
 
 TIME_STORE = {}
@@ -161,3 +163,60 @@ class TestSupervisor(IntegrationTestCase):
         os.kill(p.pid, signal.SIGTERM)
         p.join()
         expect(p.exitcode).to.equal(-15)
+
+
+class TestSupervisorSlots(FakeProcessesMixin, unittest.TestCase):
+    def setUp(self):
+        super(TestSupervisorSlots, self).setUp()
+        self.supervisor = self.make_supervisor(nb_children=2)
+
+    def crash(self, slot_index):
+        slot = self.supervisor._slots[slot_index]
+        slot.process.exitcode = 1
+        self.supervisor._reap_worker_processes()
+
+    def test_start_fills_all_slots(self):
+        self.supervisor._start_worker_processes()
+        self.assertEqual(sorted(self.supervisor._processes), [100, 101])
+        self.assertEqual(self.supervisor.total_restarts, 0)
+        self.assertIsNone(self.supervisor._next_wakeup_timeout())
+
+    def test_dead_child_is_replaced_immediately(self):
+        self.supervisor._start_worker_processes()
+        self.now += 60
+        self.crash(0)
+        self.assertEqual(sorted(self.supervisor._processes), [101])
+
+        self.supervisor._start_worker_processes()
+        self.assertEqual(sorted(self.supervisor._processes), [101, 102])
+        stats = self.supervisor.stats()
+        self.assertEqual(stats["restarts"], 1)
+        self.assertEqual(stats["slots"][0]["restarts"], 1)
+        self.assertEqual(stats["slots"][0]["pid"], 102)
+        self.assertEqual(stats["slots"][1]["uptime"], 60)
+
+    def test_crash_loop_backoff(self):
+        self.supervisor._start_worker_processes()
+        # first crash: immediate restart
+        self.now += 1
+        self.crash(0)
+        self.assertEqual(self.supervisor._next_wakeup_timeout(), 0)
+        self.supervisor._start_worker_processes()
+
+        delays = []
+        for _ in range(8):
+            self.now += 1
+            self.crash(0)
+            delays.append(self.supervisor._next_wakeup_timeout())
+            self.supervisor._start_worker_processes()
+            # slot stays empty during backoff
+            self.assertIsNone(self.supervisor._slots[0].process)
+            self.now += delays[-1]
+            self.supervisor._start_worker_processes()
+            self.assertIsNotNone(self.supervisor._slots[0].process)
+        self.assertEqual(delays, [1, 2, 4, 8, 16, 32, 60, 60])
+
+        # a process living long enough resets the backoff
+        self.now += 3600
+        self.crash(0)
+        self.assertEqual(self.supervisor._next_wakeup_timeout(), 0)
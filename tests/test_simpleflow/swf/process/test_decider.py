@@ -0,0 +1,28 @@
+from __future__ import absolute_import
+
+import unittest
+
+from simpleflow.swf.process.decider.base import get_decision_deadline
+from swf.models.history import builder
+from tests.data import BaseTestWorkflow
+
+
+class ATestWorkflow(BaseTestWorkflow):
+    decision_tasks_timeout = '300'
+
+    def run(self):
+        pass
+
+
+class TestDecisionDeadline(unittest.TestCase):
+    def test_deadline(self):
+        history = builder.History(ATestWorkflow, input={})
+        self.assertEqual(
+            float(history.last.raw['eventTimestamp']) + 300,
+            get_decision_deadline(history),
+        )
+
+    def test_no_decision_task_started(self):
+        history = builder.History(ATestWorkflow, input={})
+        history.add_decision_task()
+        self.assertIsNone(get_decision_deadline(history))
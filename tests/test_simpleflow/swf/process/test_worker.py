@@ -1,17 +1,29 @@
 from __future__ import absolute_import
 
+import json
+import shutil
+import tempfile
 import unittest
+from base64 import b64decode, b64encode
 from collections import namedtuple
 
 from mock import patch
 
-from simpleflow.swf.process.worker.base import ActivityPoller, ActivityWorker
+from simpleflow import activity, result_cache, settings
+from simpleflow.swf.process.worker.base import ActivityPoller, ActivityWorker, split_poll_data
+from simpleflow.utils import json_dumps
 from swf.models import ActivityTask, Domain
+from swf.responses import Response
 from tests.moto_compat import mock_swf
 
 FakeActivityType = namedtuple("FakeActivityType", ["name"])
 
 
+@activity.with_attributes(cacheable=True)
+def cached_triple(x):
+    return x * 3
+
+
 @mock_swf
 class TestActivityWorker(unittest.TestCase):
     def test_dispatch_is_catched_correctly(self):
@@ -33,5 +45,142 @@ class TestActivityWorker(unittest.TestCase):
         self.assertIn("No module named ", mock.call_args[1]["reason"])
 
 
+class TestActivityPollerMetrology(unittest.TestCase):
+    @mock_swf
+    def test_fail_waits_for_uploads(self):
+        poller = ActivityPoller(Domain("test-domain"), "task-list")
+        task = ActivityTask(Domain("test-domain"), "task-list", activity_type=FakeActivityType("foo"))
+        with patch("simpleflow.metrology.wait_for_uploads") as wait, \
+                patch("swf.actors.ActivityWorker.fail") as fail:
+            poller.fail("token", task, reason="boom")
+
+        wait.assert_called_once_with(settings.METROLOGY_UPLOAD_TIMEOUT)
+        self.assertEqual(1, fail.call_count)
+
+
+class TestActivityWorkerResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    @mock_swf
+    def test_result_is_stored(self):
+        domain = Domain("test-domain")
+        poller = ActivityPoller(domain, "task-list")
+        activity_type = FakeActivityType("tests.test_simpleflow.swf.process.test_worker.cached_triple")
+        task = ActivityTask(domain, "task-list", activity_type=activity_type, input='{"args": [2]}', context={
+            "activityType": {"name": activity_type.name, "version": "default"},
+            "workflowExecution": {"workflowId": "wf", "runId": "run"},
+            "activityId": "activity-1",
+            "input": '{"args": [2]}',
+        })
+
+        with patch("simpleflow.settings.SIMPLEFLOW_ACTIVITY_CACHE", self.directory), \
+                patch.object(poller, "complete_with_retry") as complete:
+            ActivityWorker().process(poller, "token", task)
+
+        self.assertEqual(("token", 6), complete.call_args[0])
+        cache = result_cache.DiskResultCache(self.directory)
+        self.assertEqual("6", cache.get(result_cache.make_key(cached_triple, [2], {})))
+
+
+def make_response(activity_id, template="job.yaml"):
+    raw_response = {
+        "activityId": activity_id,
+        "taskToken": "token-{}".format(activity_id),
+        "input": json.dumps({"meta": {"k8s_job_template": template}}),
+    }
+    task = ActivityTask(Domain("test-domain"), "task-list", activity_id=activity_id)
+    return Response(task_token=raw_response["taskToken"], activity_task=task, raw_response=raw_response)
+
+
+class TestKubernetesBatches(unittest.TestCase):
+    def setUp(self):
+        with patch("simpleflow.settings.SIMPLEFLOW_K8S_BATCH_SIZE", 3):
+            self.poller = ActivityPoller(Domain("test-domain"), "task-list", process_mode="kubernetes")
+        self.poller.is_alive = True
+        self.jobs = []
+        patcher = patch(
+            "simpleflow.swf.process.worker.base.spawn_kubernetes_job",
+            lambda poller, swf_response, job_name: self.jobs.append((job_name, swf_response)),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_is_spawned_when_full(self):
+        with patch.object(self.poller, "count_pending", return_value=10):
+            self.poller.job_name = "job-1"
+            for i in range(4):
+                self.poller.process(make_response(str(i)))
+
+        self.assertEqual(1, len(self.jobs))
+        job_name, swf_response = self.jobs[0]
+        self.assertEqual("job-1", job_name)
+        self.assertEqual(["0", "1", "2"], [response["activityId"] for response in swf_response])
+        # the next job has another name
+        self.assertIsNone(self.poller.job_name)
+        self.assertEqual(1, len(self.poller._k8s_batches))
+
+    def test_batch_is_spawned_without_pending_tasks(self):
+        with patch.object(self.poller, "count_pending", return_value=0):
+            self.poller.process(make_response("0"))
+
+        self.assertEqual(1, len(self.jobs))
+        # a single task keeps the payload of a job without batch
+        self.assertEqual("0", self.jobs[0][1]["activityId"])
+
+    def test_batches_by_template(self):
+        with patch.object(self.poller, "count_pending", side_effect=[1, 0]):
+            self.poller.process(make_response("0", "a.yaml"))
+            self.poller.process(make_response("1", "b.yaml"))
+
+        self.assertEqual(2, len(self.jobs))
+        self.assertNotEqual(self.jobs[0][0], self.jobs[1][0])
+
+    def test_old_batch_is_spawned_before_next_poll(self):
+        with patch.object(self.poller, "count_pending", return_value=10), \
+                patch("time.time", return_value=1000.0):
+            self.poller.process(make_response("0"))
+        self.assertEqual([], self.jobs)
+
+        with patch("simpleflow.settings.SIMPLEFLOW_K8S_BATCH_MAX_WAIT", 10), \
+                patch("swf.actors.ActivityWorker.poll") as poll:
+            with patch("time.time", return_value=1005.0):
+                self.poller.poll("task-list", "identity")
+            self.assertEqual([], self.jobs)
+            with patch("time.time", return_value=1010.0):
+                self.poller.poll("task-list", "identity")
+
+        self.assertEqual(1, len(self.jobs))
+        self.assertEqual({}, self.poller._k8s_batches)
+        self.assertEqual(2, poll.call_count)
+
+    def test_invalid_input(self):
+        response = make_response("0")
+        response.raw_response["input"] = "{}"
+        with patch.object(self.poller, "fail_with_retry") as fail:
+            self.poller.process(response)
+
+        self.assertEqual([], self.jobs)
+        self.assertEqual(("token-0", response.activity_task), fail.call_args[0][:2])
+        self.assertIn("cannot spawn kubernetes job for task 0", fail.call_args[0][2])
+
+
+class TestSplitPollData(unittest.TestCase):
+    def encode(self, data):
+        return b64encode(json_dumps(data).encode("utf-8")).decode("ascii")
+
+    def test_single_task(self):
+        poll_data = self.encode({"activityId": "1"})
+        self.assertEqual([poll_data], split_poll_data(poll_data))
+
+    def test_batch(self):
+        poll_data = self.encode([{"activityId": "1"}, {"activityId": "2"}])
+        self.assertEqual(
+            [{"activityId": "1"}, {"activityId": "2"}],
+            [json.loads(b64decode(data).decode("utf-8")) for data in split_poll_data(poll_data)],
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+import mock
+
+from simpleflow.history import History
+from simpleflow.swf.stats.aggregate import profile_executions
+from simpleflow.swf.stats.base import TaskTimings, percentile
+from simpleflow.swf.stats.pretty import aggregated_profile
+from swf.models.history import builder
+from tests.data import BaseTestWorkflow, double, increment
+
+
+class ATestWorkflow(BaseTestWorkflow):
+    def run(self):
+        pass
+
+
+def build_history(states):
+    history = builder.History(ATestWorkflow, input={})
+    for i, (activity, state) in enumerate(states):
+        history.add_activity_task(
+            activity,
+            decision_id=history.last_id,
+            last_state=state,
+            activity_id='activity-{}'.format(i),
+        )
+        history.add_decision_task()
+    return history
+
+
+def fake_execution(history):
+    execution = mock.Mock(workflow_id='wf', run_id='run')
+    execution.history.return_value = history
+    return execution
+
+
+class TestPercentile(unittest.TestCase):
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(3, percentile([3], 99))
+        self.assertEqual(2.5, percentile([1, 2, 3, 4], 50))
+        self.assertAlmostEqual(3.97, percentile([1, 2, 3, 4], 99))
+        self.assertEqual(4, percentile([1, 2, 3, 4], 100))
+
+
+class TestTaskTimings(unittest.TestCase):
+    def test_from_history(self):
+        history = History(build_history([(increment, 'completed'), (double, 'failed')]))
+        history.parse()
+        timings = TaskTimings.from_history(history)
+
+        self.assertEqual(2, len(timings))
+        self.assertEqual(['completed', 'failed'], timings.state)
+        self.assertEqual([0, 1], timings.nb_failures)
+        tasks = history.tasks
+        self.assertAlmostEqual(
+            (tasks[0]['completed_timestamp'] - tasks[0]['started_timestamp']).total_seconds(),
+            timings.run_times()[0],
+            places=5,
+        )
+        self.assertAlmostEqual(
+            (tasks[1]['started_timestamp'] - tasks[1]['scheduled_timestamp']).total_seconds(),
+            timings.queue_times()[1],
+            places=5,
+        )
+
+    def test_aggregate(self):
+        timings = TaskTimings()
+        for i, state in enumerate(['completed', 'completed', 'completed', 'failed']):
+            timings.id.append('activity-{}'.format(i))
+            timings.type.append('activity')
+            timings.name.append('increment')
+            timings.state.append(state)
+            timings.scheduled.append(0.)
+            timings.started.append((i + 1) * 1e6)
+            timings.closed.append(10 * (i + 1) * 1e6)
+            # the second one failed once before completing
+            timings.nb_failures.append({1: 1, 3: 1}.get(i, 0))
+
+        [row] = timings.aggregate(percentiles=(50, 100))
+        self.assertEqual('increment', row['name'])
+        self.assertEqual(4, row['count'])
+        self.assertEqual(0.25, row['failure_rate'])
+        self.assertEqual(0.25, row['retry_rate'])
+        self.assertEqual(2.5, row['queue_time'][50])
+        self.assertEqual(4, row['queue_time'][100])
+        self.assertEqual(36, row['run_time'][100])
+
+
+class TestProfileExecutions(unittest.TestCase):
+    def test_profile_executions(self):
+        executions = [
+            fake_execution(build_history([(increment, 'completed'), (double, 'completed')])),
+            fake_execution(build_history([(increment, 'failed')])),
+        ]
+        broken = fake_execution(None)
+        broken.history.side_effect = ValueError('boom')
+
+        with mock.patch('simpleflow.settings.SIMPLEFLOW_ENABLE_HISTORY_ARCHIVE', False):
+            timings, nb_executions = profile_executions(executions + [broken], max_workers=2)
+
+        self.assertEqual(2, nb_executions)
+        self.assertEqual(3, len(timings))
+        rows = timings.aggregate()
+        self.assertEqual(
+            ['tests.data.activities.double', 'tests.data.activities.increment'],
+            [row['name'] for row in rows],
+        )
+        self.assertEqual(0.5, rows[1]['failure_rate'])
+
+        header, values = aggregated_profile(rows, nb_executions)
+        self.assertEqual(len(header), len(values[0]))
+        self.assertIn('Run p99', header)
+        self.assertEqual(1.0, values[1][3])
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+from simpleflow.swf.archive import INDEX_FILENAME, HistoryArchive, _entry_filename, get_history
+from swf.models import History as BasicHistory
+from swf.models import WorkflowExecution
+
+
+def fake_events():
+    with open("tests/data/dumps/workflow_execution_basic.json") as f:
+        return json.loads(f.read())["events"]
+
+
+def fake_execution(status=WorkflowExecution.STATUS_CLOSED, run_id="run-1"):
+    execution = Mock(spec=WorkflowExecution)
+    execution.STATUS_CLOSED = WorkflowExecution.STATUS_CLOSED
+    execution.domain = Mock()
+    execution.domain.name = "TestDomain"
+    execution.workflow_id = "wf-1"
+    execution.run_id = run_id
+    execution.status = status
+    execution.history.side_effect = lambda: BasicHistory.from_event_list(fake_events())
+    return execution
+
+
+class TestHistoryArchive(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = HistoryArchive(self.directory, max_size=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_get(self):
+        events = fake_events()
+        self.assertIsNone(self.archive.get("TestDomain", "wf-1", "run-1"))
+        self.archive.put("TestDomain", "wf-1", "run-1", events)
+        self.assertEqual(events, self.archive.get("TestDomain", "wf-1", "run-1"))
+        self.assertIsNone(self.archive.get("TestDomain", "wf-1", "run-2"))
+
+        [entry] = self.archive.entries()
+        self.assertEqual("run-1", entry["run_id"])
+        self.assertEqual(len(events), entry["nb_events"])
+        # stored compressed
+        self.assertLess(entry["size"], len(json.dumps(events)))
+
+    def backdate(self, run_id, seconds):
+        path = os.path.join(self.directory, _entry_filename("TestDomain", "wf-1", run_id))
+        atime = mtime = os.stat(path).st_mtime - seconds
+        os.utime(path, (atime, mtime))
+
+    def test_evicts_least_recently_used(self):
+        events = fake_events()
+        self.archive.put("TestDomain", "wf-1", "run-1", events)
+        self.archive.put("TestDomain", "wf-1", "run-2", events)
+        self.backdate("run-1", 20)
+        self.backdate("run-2", 10)
+        self.archive.get("TestDomain", "wf-1", "run-1")
+        entry_size = self.archive.entries()[0]["size"]
+
+        self.archive.max_size = 2 * entry_size
+        self.archive.put("TestDomain", "wf-1", "run-3", events)
+
+        self.assertEqual(["run-3", "run-1"], [e["run_id"] for e in self.archive.entries()])
+        self.assertIsNone(self.archive.get("TestDomain", "wf-1", "run-2"))
+
+    def test_get_does_not_rewrite_the_index(self):
+        self.archive.put("TestDomain", "wf-1", "run-1", fake_events())
+        index_path = os.path.join(self.directory, INDEX_FILENAME)
+        index_stat = os.stat(index_path)
+        self.backdate("run-1", 10)
+        [entry] = self.archive.entries()
+        accessed_at = entry["accessed_at"]
+
+        self.assertIsNotNone(self.archive.get("TestDomain", "wf-1", "run-1"))
+
+        # not rewritten (that would replace the file), but the access is recorded
+        self.assertEqual(index_stat.st_ino, os.stat(index_path).st_ino)
+        self.assertEqual(index_stat.st_mtime, os.stat(index_path).st_mtime)
+        [entry] = self.archive.entries()
+        self.assertGreater(entry["accessed_at"], accessed_at)
+
+    def test_prune(self):
+        events = fake_events()
+        self.archive.put("TestDomain", "wf-1", "run-1", events)
+        self.archive.put("TestDomain", "wf-1", "run-2", events)
+        self.assertEqual(2, self.archive.prune(max_size=0))
+        self.assertEqual([], self.archive.entries())
+        self.assertEqual(0, self.archive.size())
+
+    def test_get_history_closed_execution_is_fetched_once(self):
+        execution = fake_execution()
+        history = get_history(execution, archive=self.archive)
+        archived = get_history(execution, archive=self.archive)
+
+        self.assertEqual(1, execution.history.call_count)
+        self.assertEqual(len(history), len(archived))
+        self.assertEqual(history.raw, archived.raw)
+
+    def test_get_history_open_execution_is_not_archived(self):
+        execution = fake_execution(status=WorkflowExecution.STATUS_OPEN)
+        get_history(execution, archive=self.archive)
+        get_history(execution, archive=self.archive)
+
+        self.assertEqual(2, execution.history.call_count)
+        self.assertEqual([], self.archive.entries())
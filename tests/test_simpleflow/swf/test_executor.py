@@ -1,10 +1,14 @@
-import mock
+import json
+import shutil
+import tempfile
 import unittest
 
+import mock
 from sure import expect
 
-from simpleflow import activity, format, futures
-from simpleflow.swf.executor import Executor
+from simpleflow import activity, format, futures, result_cache
+from simpleflow.swf.executor import Executor, INLINE_MARKER, SNAPSHOT_MARKER
+from simpleflow.utils import TimeLimitExceeded
 from swf.models.history import builder
 from swf.responses import Response
 from tests.data import (
@@ -226,3 +230,257 @@ class TestSimpleflowSwfExecutorWithJumboFields(MockSWFTestCase):
             r'^Workflow execution error in activity-tests.test_simpleflow.swf.'
             r'test_executor.print_me_n_times: "ValueError: Number: 012345679\d+"$'
         )
+
+
+def replay(workflow, history, **attributes):
+    """
+    Decisions of *workflow* on *history*, with *attributes* set on the
+    executor.
+    """
+    executor = Executor(DOMAIN, workflow)
+    for name, value in attributes.items():
+        setattr(executor, name, value)
+    return executor.replay(Response(history=history, execution=None)).decisions
+
+
+def replay_from_marker(workflow, history, marker_name, details, **attributes):
+    """
+    Adds a marker with *details* to *history*, checks that the next replay
+    only schedules an activity, and returns its attributes.
+    """
+    history.add_marker(marker_name, details)
+    decisions = replay(workflow, history, **attributes)
+    expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+    return decisions[0]['scheduleActivityTaskDecisionAttributes']
+
+
+@activity.with_attributes(cacheable=True)
+def cached_double(x):
+    return x * 2
+
+
+class ExampleCachedWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        a = self.submit(cached_double, x)
+        b = self.submit(increment, a)
+        futures.wait(b)
+        return b.result
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = result_cache.DiskResultCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cache_hit(self):
+        self.cache.set(result_cache.make_key(cached_double, (2,), {}), '4')
+        history = builder.History(ExampleCachedWorkflow, input={'args': [2]})
+
+        decisions = replay(ExampleCachedWorkflow, history, result_cache=self.cache)
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+        attrs = decisions[0]['recordMarkerDecisionAttributes']
+        expect(attrs['markerName']).to.equal(result_cache.CACHE_MARKER)
+        details = json.loads(attrs['details'])
+        expect(details['result']).to.equal('4')
+        expect(json.loads(decisions[1]['scheduleActivityTaskDecisionAttributes']['input'])['args']).to.equal([4])
+
+        # next replays take the result from the marker
+        attrs = replay_from_marker(
+            ExampleCachedWorkflow, history, result_cache.CACHE_MARKER, details, result_cache=None)
+        expect(json.loads(attrs['input'])['args']).to.equal([4])
+
+    def test_cache_miss(self):
+        self.cache.set(result_cache.make_key(cached_double, (3,), {}), '6')
+        history = builder.History(ExampleCachedWorkflow, input={'args': [2]})
+
+        decisions = replay(ExampleCachedWorkflow, history, result_cache=self.cache)
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+        attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
+        expect(attrs['activityType']['name']).to.equal('tests.test_simpleflow.swf.test_executor.cached_double')
+
+
+inline_calls = []
+
+
+@activity.with_attributes(inline=True)
+def inline_double(x):
+    inline_calls.append(x)
+    if x < 0:
+        raise ValueError('negative')
+    return x * 2
+
+
+@activity.with_attributes(inline=True)
+def inline_repeat(x):
+    return 'a' * x
+
+
+class ExampleInlineWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        a = self.submit(inline_double, x)
+        b = self.submit(increment, a)
+        futures.wait(b)
+        return b.result
+
+
+class TestInlineActivities(unittest.TestCase):
+    def setUp(self):
+        del inline_calls[:]
+
+    def test_executed_inline(self):
+        history = builder.History(ExampleInlineWorkflow, input={'args': [2]})
+
+        decisions = replay(ExampleInlineWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+        attrs = decisions[0]['recordMarkerDecisionAttributes']
+        expect(attrs['markerName']).to.equal(INLINE_MARKER)
+        details = json.loads(attrs['details'])
+        expect(details['result']).to.equal('4')
+        expect(json.loads(decisions[1]['scheduleActivityTaskDecisionAttributes']['input'])['args']).to.equal([4])
+        expect(inline_calls).to.equal([2])
+
+        # next replays take the result from the marker
+        attrs = replay_from_marker(ExampleInlineWorkflow, history, INLINE_MARKER, details)
+        expect(json.loads(attrs['input'])['args']).to.equal([4])
+        expect(inline_calls).to.equal([2])
+
+    def test_scheduled_on_failure(self):
+        history = builder.History(ExampleInlineWorkflow, input={'args': [-1]})
+
+        decisions = replay(ExampleInlineWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+        attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
+        expect(attrs['activityType']['name']).to.equal('tests.test_simpleflow.swf.test_executor.inline_double')
+        expect(json.loads(attrs['input'])['args']).to.equal([-1])
+
+    def test_scheduled_on_timeout(self):
+        history = builder.History(ExampleInlineWorkflow, input={'args': [2]})
+
+        with mock.patch('simpleflow.swf.executor.time_limit') as time_limit:
+            time_limit.return_value.__exit__.side_effect = TimeLimitExceeded()
+            decisions = replay(ExampleInlineWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+        expect(time_limit.call_args[0][0]).to.equal(1.0)
+
+    def test_scheduled_when_budget_spent(self):
+        history = builder.History(ExampleInlineWorkflow, input={'args': [2]})
+
+        with mock.patch('simpleflow.settings.SIMPLEFLOW_INLINE_ACTIVITIES_BUDGET', 0):
+            decisions = replay(ExampleInlineWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+        expect(inline_calls).to.equal([])
+
+    def test_scheduled_when_result_too_large(self):
+        class ExampleLargeResultWorkflow(BaseTestWorkflow):
+            def run(self):
+                a = self.submit(inline_repeat, 100)
+                futures.wait(self.submit(increment, len(a.result)))
+
+        history = builder.History(ExampleLargeResultWorkflow)
+        with mock.patch('simpleflow.settings.SIMPLEFLOW_INLINE_ACTIVITY_MAX_SIZE', 50):
+            decisions = replay(ExampleLargeResultWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+
+        decisions = replay(ExampleLargeResultWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+
+
+class ExampleContinuedWorkflow(BaseTestWorkflow):
+    def run(self, total, remaining):
+        if not remaining:
+            return total
+        a = self.submit(increment, total)
+        futures.wait(a)
+        self.continue_as_new(a.result, remaining - 1)
+
+
+class TestContinueAsNew(unittest.TestCase):
+    def test_continue_as_new(self):
+        history = builder.History(ExampleContinuedWorkflow, input={'args': [0, 2]})
+        decision_id = history.last_id
+        (history
+         .add_activity_task(increment,
+                            decision_id=decision_id,
+                            last_state='completed',
+                            activity_id='activity-tests.data.activities.increment-1',
+                            input={'args': [0]},
+                            result=1)
+         .add_decision_task_scheduled()
+         .add_decision_task_started())
+
+        executor = Executor(DOMAIN, ExampleContinuedWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['ContinueAsNewWorkflowExecution'])
+        attrs = decisions[0]['continueAsNewWorkflowExecutionDecisionAttributes']
+        expect(json.loads(attrs['input'])).to.equal({'args': [1, 1], 'kwargs': {}})
+        expect(attrs['taskList']).to.equal({'name': ExampleContinuedWorkflow.task_list})
+        expect(attrs['childPolicy']).to.equal('TERMINATE')
+        expect(attrs['executionStartToCloseTimeout']).to.equal(ExampleContinuedWorkflow.execution_timeout)
+        expect(attrs['taskStartToCloseTimeout']).to.equal(ExampleContinuedWorkflow.decision_tasks_timeout)
+
+
+class ExampleCheckpointWorkflow(BaseTestWorkflow):
+    def run(self):
+        total = self.checkpoint('phase1', self.phase1, 1)
+        b = self.submit(increment, total)
+        futures.wait(b)
+        return b.result
+
+    def phase1(self, x):
+        a = self.submit(increment, x)
+        futures.wait(a)
+        return a.result
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_checkpoint(self):
+        history = builder.History(ExampleCheckpointWorkflow)
+        decisions = replay(ExampleCheckpointWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+
+        decision_id = history.last_id
+        (history
+         .add_activity_task(increment,
+                            decision_id=decision_id,
+                            last_state='completed',
+                            activity_id='activity-tests.data.activities.increment-1',
+                            input={'args': [1]},
+                            result=2)
+         .add_decision_task_scheduled()
+         .add_decision_task_started())
+        decisions = replay(ExampleCheckpointWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+        attrs = decisions[0]['recordMarkerDecisionAttributes']
+        expect(attrs['markerName']).to.equal(SNAPSHOT_MARKER)
+        details = json.loads(attrs['details'])
+        expect(details).to.equal({
+            'id': 'phase1',
+            'result': '2',
+            'tasks': {'activity-tests.data.activities.increment': 1},
+        })
+
+        # next replays skip the phase, and number the next tasks the same way
+        with mock.patch.object(ExampleCheckpointWorkflow, 'phase1') as phase1:
+            attrs = replay_from_marker(ExampleCheckpointWorkflow, history, SNAPSHOT_MARKER, details)
+        expect(phase1.called).to.be.false
+        expect(attrs['activityId']).to.equal('activity-tests.data.activities.increment-2')
+        expect(json.loads(attrs['input'])['args']).to.equal([2])
+
+    def test_result_is_the_same_on_each_replay(self):
+        results = []
+
+        class ExampleTupleCheckpointWorkflow(BaseTestWorkflow):
+            def run(self):
+                results.append(self.checkpoint('phase1', lambda: (1, {2: 'two'})))
+                futures.wait(self.submit(increment, 1))
+
+        history = builder.History(ExampleTupleCheckpointWorkflow)
+        decisions = replay(ExampleTupleCheckpointWorkflow, history)
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+        details = json.loads(decisions[0]['recordMarkerDecisionAttributes']['details'])
+
+        replay_from_marker(ExampleTupleCheckpointWorkflow, history, SNAPSHOT_MARKER, details)
+        expect(results).to.equal([[1, {'2': 'two'}], [1, {'2': 'two'}]])
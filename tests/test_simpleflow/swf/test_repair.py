@@ -0,0 +1,118 @@
+import multiprocessing
+import time
+import unittest
+
+import mock
+
+import swf.models
+from simpleflow.history import History
+from simpleflow.swf.executor import Executor
+from simpleflow.swf.process.decider.base import DeciderPoller
+from simpleflow.swf.repair import RepairService, fake_task_list_name
+from swf.models.history import builder
+from tests.data import DOMAIN, BaseTestWorkflow, increment
+
+
+class ATestWorkflow(BaseTestWorkflow):
+    def run(self):
+        pass
+
+
+def build_history_to_repair():
+    history = builder.History(ATestWorkflow, input={})
+    decision_id = history.last_id
+    for i, state in enumerate(['completed', 'failed', 'completed']):
+        history.add_activity_task(
+            increment,
+            decision_id=decision_id,
+            last_state=state,
+            activity_id='activity-{}'.format(i),
+            input={'args': i},
+            result=i * 10,
+        )
+    to_repair = History(history)
+    to_repair.parse()
+    return to_repair
+
+
+class TestRepairService(unittest.TestCase):
+    def setUp(self):
+        self.service = RepairService('TestDomain', 'FAKE-1234', build_history_to_repair())
+
+    def test_only_completed_tasks_are_indexed(self):
+        self.assertEqual(sorted(self.service.activity_results), ['activity-0', 'activity-2'])
+        self.assertEqual(self.service.child_workflow_results, {})
+
+    def test_complete_activity_task(self):
+        connection = mock.Mock()
+        connection.poll_for_activity_task.return_value = {'taskToken': 'token', 'activityId': 'activity-2'}
+
+        self.assertEqual(self.service.complete_activity_task(connection), 'activity-2')
+        connection.poll_for_activity_task.assert_called_once_with('TestDomain', 'FAKE-1234', identity=mock.ANY)
+        connection.respond_activity_task_completed.assert_called_once_with('token', '20')
+
+    def test_complete_unknown_activity_task(self):
+        connection = mock.Mock()
+        connection.poll_for_activity_task.return_value = {'taskToken': 'token', 'activityId': 'activity-1'}
+
+        self.assertIsNone(self.service.complete_activity_task(connection))
+        self.assertEqual(connection.respond_activity_task_completed.call_count, 0)
+        self.assertEqual(connection.respond_activity_task_failed.call_count, 1)
+
+    def test_poll_timeout(self):
+        connection = mock.Mock()
+        connection.poll_for_activity_task.return_value = {'startedEventId': 0}
+
+        self.assertIsNone(self.service.complete_activity_task(connection))
+        self.assertEqual(connection.respond_activity_task_completed.call_count, 0)
+
+    def test_fake_task_list_name(self):
+        self.assertTrue(fake_task_list_name('wf', 'run').startswith('FAKE-'))
+        self.assertEqual(fake_task_list_name('wf', 'run'), fake_task_list_name('wf', 'run'))
+        self.assertNotEqual(fake_task_list_name('wf', 'run'), fake_task_list_name('wf', 'run2'))
+
+
+class SleepingRepairService(RepairService):
+    def run(self):
+        time.sleep(60)
+
+
+class TestRepairServiceLifecycle(unittest.TestCase):
+    def test_outlives_decision_processes(self):
+        service = SleepingRepairService('TestDomain', 'FAKE-1234', build_history_to_repair())
+        service.start()
+        try:
+            process = service._process
+            # like the processes taking decisions
+            decision = multiprocessing.Process(target=time.sleep, args=(0.1,))
+            decision.start()
+            decision.join()
+            self.assertTrue(process.is_alive())
+            service.start()
+            self.assertIs(service._process, process)
+        finally:
+            service.stop()
+        self.assertFalse(process.is_alive())
+
+    def test_started_by_decider_poller(self):
+        executor = Executor(
+            DOMAIN, ATestWorkflow,
+            repair_with=build_history_to_repair(),
+            repair_workflow_id='workflow-id',
+            repair_run_id='run-id',
+        )
+        service = executor.get_repair_service()
+        self.assertEqual(service.task_list, fake_task_list_name('workflow-id', 'run-id'))
+
+        poller = DeciderPoller([executor], swf.models.Domain(DOMAIN.name), 'test-task-list', False)
+        with mock.patch.object(RepairService, 'run', SleepingRepairService.run):
+            poller.start_repair_services()
+            try:
+                self.assertTrue(service._process.is_alive())
+            finally:
+                poller.stop_repair_services()
+        self.assertIsNone(service._process)
+
+    def test_not_in_repair_mode(self):
+        executor = Executor(DOMAIN, ATestWorkflow)
+        self.assertIsNone(executor.get_repair_service())
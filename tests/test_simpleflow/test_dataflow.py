@@ -17,6 +17,7 @@ from simpleflow import (
 from simpleflow.history import History
 from simpleflow.swf import constants
 from simpleflow.swf.executor import Executor
+from simpleflow.swf.repair import fake_task_list_name
 from simpleflow.swf.task import NonPythonicActivityTask
 from simpleflow.task import ActivityTask
 from simpleflow.utils import json_dumps
@@ -136,7 +137,8 @@ def test_workflow_with_repair_if_task_successful():
     to_repair = History(previous_history)
     to_repair.parse()
 
-    executor = Executor(DOMAIN, workflow, repair_with=to_repair)
+    executor = Executor(DOMAIN, workflow, repair_with=to_repair,
+                        repair_workflow_id='workflow-id', repair_run_id='run-id')
 
     # The executor should not schedule anything, it should use previous history
     decisions = executor.replay(Response(history=history, execution=None)).decisions
@@ -144,6 +146,9 @@ def test_workflow_with_repair_if_task_successful():
     assert decisions[0]['decisionType'] == 'ScheduleActivityTask'
     attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
     assert attrs['taskList']['name'].startswith("FAKE-")
+    # ... and the task is completed by the repair service of the decider poller
+    assert attrs['taskList']['name'] == fake_task_list_name('workflow-id', 'run-id')
+    assert attrs['taskList']['name'] == executor.get_repair_service().task_list
 
 
 @mock_swf
@@ -1,10 +1,16 @@
+import hashlib
 import os
 import unittest
 from mock import patch
 import shutil
+
+import boto
+from boto.exception import S3ResponseError
 from sure import expect
 
-from simpleflow.download import RemoteBinary, with_binaries
+from simpleflow import download, storage
+from simpleflow.download import ChecksumError, RemoteBinary, download_binaries, with_binaries
+from tests.moto_compat import mock_s3
 
 
 # example binary remote/local location
@@ -64,3 +70,85 @@ class TestWithBinariesDecorator(unittest.TestCase):
         expect(res).to.equal("foo!")
 
         method_mock.assert_called_once_with()
+
+
+class TestDownloadFromS3(unittest.TestCase):
+    content = b"#!/bin/sh\necho 42\n" * 100
+
+    def create(self):
+        bucket = boto.connect_s3().create_bucket("binaries")
+        bucket.new_key("v1/answer").set_contents_from_string(self.content)
+
+    def setUp(self):
+        self.directory = "/tmp/simpleflow-binaries-test"
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.patches = [
+            patch.object(download, "SIMPLEFLOW_BINARIES_DIRECTORY", self.directory),
+            patch.object(download, "CACHE_DIRECTORY", os.path.join(self.directory, ".objects")),
+            patch("simpleflow.settings.SIMPLEFLOW_BINARIES_PART_SIZE", 256),
+            patch.dict(os.environ, {"PATH": "/usr/bin"}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @mock_s3
+    def test_ranged_download_and_shared_cache(self):
+        self.create()
+        download_binaries({
+            "answer": "s3://binaries/v1/answer",
+            "same-answer": "s3://binaries/v1/answer#sha256={}".format(hashlib.sha256(self.content).hexdigest()),
+        })
+
+        answer = RemoteBinary("answer", "s3://binaries/v1/answer")
+        with open(answer.local_location, "rb") as f:
+            self.assertEqual(self.content, f.read())
+        self.assertTrue(os.access(answer.local_location, os.X_OK))
+        self.assertTrue(os.environ["PATH"].endswith(":/usr/bin"))
+        self.assertIn(answer.local_directory, os.environ["PATH"])
+        # one object by etag, one by sha256
+        self.assertEqual(2, len(os.listdir(download.CACHE_DIRECTORY)))
+
+    @mock_s3
+    def test_cache_hit(self):
+        self.create()
+        RemoteBinary("answer", "s3://binaries/v1/answer").download()
+        with patch("simpleflow.download.download_object") as download_object:
+            RemoteBinary("other-name", "s3://binaries/v1/answer").download()
+        download_object.assert_not_called()
+
+    @mock_s3
+    def test_checksum_mismatch(self):
+        self.create()
+        binary = RemoteBinary("answer", "s3://binaries/v1/answer#sha256={}".format("0" * 64))
+        with self.assertRaises(ChecksumError):
+            binary.download()
+        self.assertFalse(os.path.exists(binary.local_location))
+        self.assertEqual([], os.listdir(download.CACHE_DIRECTORY))
+
+    @mock_s3
+    def test_ranges_must_match_the_etag(self):
+        self.create()
+        etag = boto.connect_s3().get_bucket("binaries").get_key("v1/answer").etag
+        get_contents_to_file = boto.s3.key.Key.get_contents_to_file
+        with patch("boto.s3.key.Key.get_contents_to_file", autospec=True,
+                   side_effect=get_contents_to_file) as get_contents:
+            RemoteBinary("answer", "s3://binaries/v1/answer").download()
+        self.assertGreater(get_contents.call_count, 1)
+        for call in get_contents.call_args_list:
+            self.assertEqual(etag, call[1]["headers"]["If-Match"])
+
+    @mock_s3
+    def test_object_changed_during_download(self):
+        self.create()
+        binary = RemoteBinary("answer", "s3://binaries/v1/answer")
+        with patch("boto.s3.key.Key.get_contents_to_file",
+                   side_effect=S3ResponseError(412, "Precondition Failed")):
+            with self.assertRaises(storage.ObjectChangedError):
+                binary.download()
+        self.assertFalse(os.path.exists(binary.local_location))
+        self.assertEqual([], os.listdir(download.CACHE_DIRECTORY))
@@ -0,0 +1,40 @@
+import unittest
+
+import mock
+
+from simpleflow.activity import Activity
+from simpleflow.dispatch import dynamic_dispatcher
+from simpleflow.dispatch.exceptions import DispatchError
+from tests.data import activities
+
+
+class TestDynamicDispatcher(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(dynamic_dispatcher._activities, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_dispatch_activity_is_memoized(self):
+        dispatcher = dynamic_dispatcher.Dispatcher()
+        activity = dispatcher.dispatch_activity("tests.data.activities.increment")
+        self.assertIs(activity, activities.increment)
+
+        with mock.patch("importlib.import_module") as import_module:
+            self.assertIs(dispatcher.dispatch_activity("tests.data.activities.increment"), activity)
+        self.assertEqual(import_module.call_count, 0)
+
+    def test_dispatch_plain_function(self):
+        activity = dynamic_dispatcher.Dispatcher.dispatch_activity("os.path.join")
+        self.assertIsInstance(activity, Activity)
+        self.assertIs(dynamic_dispatcher.Dispatcher.dispatch_activity("os.path.join"), activity)
+
+    def test_dispatch_unknown(self):
+        with self.assertRaises(DispatchError):
+            dynamic_dispatcher.Dispatcher.dispatch_activity("tests.data.activities.unknown")
+
+    def test_preload(self):
+        stats = dynamic_dispatcher.preload(["tests.data.activities"])
+        self.assertEqual(stats["modules"], 1)
+        self.assertEqual(stats["activities"], len(dynamic_dispatcher._activities))
+        for name in ("increment", "double", "Tetra", "raise_on_failure"):
+            self.assertIs(dynamic_dispatcher._activities["tests.data.activities." + name], getattr(activities, name))
@@ -6,8 +6,10 @@ import sys
 import tempfile
 import os.path
 import platform
+import signal
 import threading
 
+import mock
 import psutil
 import pytest
 import time
@@ -335,3 +337,101 @@ def test_large_command_line_utf8():
     """
     x = u"ä" * 1024 * 1024
     assert length(x.encode('utf-8')) == len(x)
+
+
+@execute.python(persistent=True, max_calls=3)
+def persistent_pid(x):
+    return [os.getpid(), x]
+
+
+@execute.python(persistent=True)
+def persistent_fail():
+    raise ValueError("persistent failure")
+
+
+@execute.python(persistent=True, timeout=1)
+def persistent_sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+@execute.python(persistent=True, timeout=1)
+def persistent_ignore_sigterm(pid_file):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    with open(pid_file, "w") as f:
+        f.write(str(os.getpid()))
+    time.sleep(30)
+
+
+def test_persistent_interpreter_is_reused_and_recycled():
+    results = [persistent_pid(i) for i in range(4)]
+    assert [x for _, x in results] == [0, 1, 2, 3]
+    pids = [pid for pid, _ in results]
+    assert pids[0] == pids[1] == pids[2] != os.getpid()
+    assert pids[3] != pids[0]
+
+
+def test_persistent_interpreter_large_arguments():
+    x = u"ä" * 1024 * 1024
+    assert persistent_pid(x)[1] == x
+
+
+def test_persistent_interpreter_error_recycles():
+    pid = persistent_pid(0)[0]
+    with pytest.raises(ExecutionError) as exc_info:
+        persistent_fail()
+    assert json.loads(str(exc_info.value))['message'] == 'persistent failure'
+    assert persistent_pid(0)[0] != pid
+
+
+def test_persistent_interpreter_timeout():
+    assert persistent_sleep(0) == 0
+    with pytest.raises(ExecutionTimeoutError):
+        persistent_sleep(5)
+    assert persistent_sleep(0) == 0
+
+
+def test_persistent_interpreter_ignoring_sigterm_is_killed(tmpdir):
+    pid_file = str(tmpdir.join("pid"))
+    start = time.time()
+    with mock.patch("simpleflow.settings.ACTIVITY_SIGTERM_WAIT_SEC", 0.5):
+        with pytest.raises(ExecutionTimeoutError):
+            persistent_ignore_sigterm(pid_file)
+    assert time.time() - start < 10
+    with open(pid_file) as f:
+        pid = int(f.read())
+    with pytest.raises(psutil.NoSuchProcess):
+        psutil.Process(pid)
+
+
+def test_persistent_interpreter_kill_children():
+    pid = execute.python(persistent=True, kill_children=True)(create_sleeper_subprocess)()
+    with pytest.raises(psutil.NoSuchProcess):
+        psutil.Process(pid)
+
+
+@execute.python()
+def make_payload(size):
+    return {"data": "x" * size}
+
+
+def test_encoded_result_is_not_decoded():
+    from simpleflow import format
+    result = make_payload.encoded(10)
+    assert isinstance(result, format.EncodedJSON)
+    assert json.loads(result.content) == {"data": "x" * 10}
+    assert format.result(result) == result.content
+
+
+def test_large_result():
+    result = make_payload(10 * 1024 * 1024)
+    assert len(result["data"]) == 10 * 1024 * 1024
+
+
+@pytest.mark.skipif(not hasattr(os, "memfd_create"), reason="memfd_create() not available")
+def test_anonymous_file_is_in_memory():
+    with execute.anonymous_file("test") as f:
+        assert os.readlink("/proc/self/fd/{}".format(f.fileno())).startswith("/memfd:simpleflow-test")
+        f.write(b"foo")
+        f.seek(0)
+        assert f.read() == b"foo"
@@ -0,0 +1,124 @@
+import unittest
+
+import mock
+
+import swf.models
+from simpleflow.history import History
+from simpleflow.swf.utils import get_history_tail
+from swf.models.history import builder
+from tests.data import BaseTestWorkflow, increment
+
+
+class ATestWorkflow(BaseTestWorkflow):
+    def run(self):
+        pass
+
+
+def build_history(nb_activities):
+    history = builder.History(ATestWorkflow, input={})
+    for i in range(nb_activities):
+        history.add_activity_task(
+            increment,
+            decision_id=history.last_id,
+            last_state='completed' if i % 2 else 'failed',
+            activity_id='activity-{}'.format(i),
+            result=i,
+        )
+        history.add_decision_task()
+    return history
+
+
+def tail(history, nb_events, reverse=True):
+    events = history.events[-nb_events:]
+    if reverse:
+        events = events[::-1]
+    return swf.models.History.from_event_list([event.raw for event in events])
+
+
+class TestHistoryParse(unittest.TestCase):
+    def test_continued_execution_run_id(self):
+        history = builder.History(ATestWorkflow, input={})
+        history.events[0].continued_execution_run_id = 'previous-run'
+        parsed = History(history)
+        parsed.parse()
+        self.assertEqual('previous-run', parsed.continued_execution_run_id)
+
+        parsed = History(builder.History(ATestWorkflow, input={}))
+        parsed.parse()
+        self.assertIsNone(parsed.continued_execution_run_id)
+
+
+class TestHistoryParseTail(unittest.TestCase):
+    def setUp(self):
+        self.history = build_history(10)
+        self.full = History(self.history)
+        self.full.parse()
+
+    def test_complete_history(self):
+        history = History(tail(self.history, len(self.history.events)))
+        history.parse_tail()
+        self.assertEqual(self.full.tasks, history.tasks)
+
+    def test_truncated_history(self):
+        # each activity spans 3 events (+ 3 for the next decision task): the
+        # window starts in the middle of the one before the last one
+        history = History(tail(self.history, 2 * 6 - 2))
+        history.parse_tail()
+
+        self.assertEqual(['activity-9'], [task['id'] for task in history.tasks])
+        self.assertEqual(self.full.tasks[-1], history.tasks[0])
+
+    def test_ascending_order(self):
+        history = History(tail(self.history, 3 * 6, reverse=False))
+        history.parse_tail()
+        self.assertEqual(self.full.tasks[-3:], history.tasks)
+
+
+class TestGetHistoryTail(unittest.TestCase):
+    def setUp(self):
+        self.history = build_history(10)
+        self.execution = mock.Mock(
+            domain=mock.Mock(),
+            workflow_id='wf',
+            run_id='run',
+            status=swf.models.WorkflowExecution.STATUS_OPEN,
+            STATUS_CLOSED=swf.models.WorkflowExecution.STATUS_CLOSED,
+        )
+        self.execution.domain.name = 'TestDomain'
+
+    def fake_history_pages(self, page_size):
+        events = [event.raw for event in self.history.events][::-1]
+        pages = [events[i:i + page_size] for i in range(0, len(events), page_size)]
+
+        def get_workflow_execution_history(domain, run_id, workflow_id, next_page_token=None, **kwargs):
+            index = int(next_page_token or 0)
+            response = {'events': pages[index]}
+            if index + 1 < len(pages):
+                response['nextPageToken'] = str(index + 1)
+            return response
+
+        return get_workflow_execution_history
+
+    @mock.patch('swf.querysets.base.BaseQuerySet.connection', new_callable=mock.PropertyMock)
+    def test_fetches_only_needed_pages(self, connection):
+        fetch = mock.Mock(side_effect=self.fake_history_pages(10))
+        connection.return_value.get_workflow_execution_history = fetch
+
+        history = get_history_tail(self.execution, 2, page_size=10)
+
+        self.assertEqual(['activity-7', 'activity-8', 'activity-9'], [task['id'] for task in history.tasks])
+        self.assertEqual(2, fetch.call_count)
+        self.assertTrue(fetch.call_args[1]['reverse_order'])
+
+    @mock.patch('swf.querysets.base.BaseQuerySet.connection', new_callable=mock.PropertyMock)
+    def test_short_history(self, connection):
+        fetch = mock.Mock(side_effect=self.fake_history_pages(10))
+        connection.return_value.get_workflow_execution_history = fetch
+
+        with mock.patch.object(History, 'parse_tail', autospec=True, side_effect=History.parse_tail) as parse_tail:
+            history = get_history_tail(self.execution, 20, page_size=10)
+
+        self.assertEqual(10, len(history.tasks))
+        self.assertEqual(7, fetch.call_count)
+        # parsed once, not after each page
+        self.assertEqual(1, parse_tail.call_count)
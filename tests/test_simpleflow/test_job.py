@@ -0,0 +1,118 @@
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from base64 import b64decode
+
+from mock import patch
+
+from simpleflow.job import k8s
+from simpleflow.job.k8s import KubernetesJob, get_batch_api, get_template
+
+TEMPLATE = """
+apiVersion: batch/v1
+kind: Job
+metadata:
+  name: "{{ JOB_NAME }}"
+spec:
+  parallelism: 1
+  template:
+    spec:
+      containers:
+        - name: worker
+          image: "{{ IMAGE }}"
+          args: ["simpleflow", "worker.start", "--poll-data", "{{ PAYLOAD }}"]
+          env:
+            - name: NB_TASKS
+              value: "{{ NB_TASKS }}"
+"""
+
+
+class FakeBatchApi(object):
+    def __init__(self):
+        self.jobs = []
+
+    def create_namespaced_job(self, body, namespace):
+        self.jobs.append((namespace, body))
+
+
+def make_response(activity_id, image="simpleflow:latest"):
+    return {
+        "activityId": activity_id,
+        "taskToken": "token-{}".format(activity_id),
+        "input": json.dumps({
+            "args": [],
+            "meta": {
+                "k8s_job_template": os.path.join(TestKubernetesJob.directory, "job.yaml"),
+                "k8s_job_data": {"IMAGE": image},
+            },
+        }),
+    }
+
+
+class TestKubernetesJob(unittest.TestCase):
+    directory = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        with open(os.path.join(cls.directory, "job.yaml"), "w") as f:
+            f.write(TEMPLATE)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def get_container(self, definition):
+        return definition["spec"]["template"]["spec"]["containers"][0]
+
+    def test_compute_job_definition(self):
+        response = make_response("1")
+        definition = KubernetesJob("job-1", "domain", response).compute_job_definition()
+
+        self.assertEqual("job-1", definition["metadata"]["name"])
+        container = self.get_container(definition)
+        self.assertEqual("simpleflow:latest", container["image"])
+        self.assertEqual(response, json.loads(b64decode(container["args"][-1]).decode("utf-8")))
+        self.assertEqual("1", container["env"][0]["value"])
+
+    def test_compute_batch_job_definition(self):
+        responses = [make_response("1"), make_response("2")]
+        definition = KubernetesJob("job-1", "domain", responses).compute_job_definition()
+
+        container = self.get_container(definition)
+        self.assertEqual(responses, json.loads(b64decode(container["args"][-1]).decode("utf-8")))
+        self.assertEqual("2", container["env"][0]["value"])
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            KubernetesJob("job-1", "domain", {"input": "{}"}).compute_job_definition()
+
+    def test_template_is_cached(self):
+        path = os.path.join(self.directory, "job.yaml")
+        self.assertIs(get_template(path), get_template(path))
+
+    def test_schedule(self):
+        api = FakeBatchApi()
+        with patch.dict(os.environ, {"K8S_NAMESPACE": "jobs"}):
+            KubernetesJob("job-1", "domain", make_response("1"), api=api).schedule()
+        self.assertEqual(1, len(api.jobs))
+        namespace, body = api.jobs[0]
+        self.assertEqual("jobs", namespace)
+        self.assertEqual("job-1", body["metadata"]["name"])
+
+    def test_batch_api_is_reused(self):
+        with patch.object(k8s, "_api", None), \
+                patch.object(k8s, "load_config") as load_config, \
+                patch("kubernetes.client.BatchV1Api", FakeBatchApi):
+            api = get_batch_api()
+            self.assertIs(api, get_batch_api())
+        self.assertIsInstance(api, FakeBatchApi)
+        self.assertEqual(1, load_config.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
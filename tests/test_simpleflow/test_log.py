@@ -1,7 +1,14 @@
+import json
+import logging
+import os
+import signal
+import threading
+import time
 import unittest
 from sure import expect
 
-from simpleflow.log import SimpleflowFormatter
+from simpleflow import logging_context
+from simpleflow.log import BackgroundHandler, JsonFormatter, SimpleflowFormatter
 
 
 class FakeRecord(object):
@@ -22,3 +29,105 @@ class TestLog(unittest.TestCase):
         record = FakeRecord("Foo %s", [])
 
         expect(formatter.format(record)).to.match(r'Foo %s$')
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.records.append(record)
+        self.threads.add(threading.current_thread().name)
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def tearDown(self):
+        logging_context.reset()
+
+    def test_format(self):
+        logging_context.set("workflow_id", "wf")
+        record = logging.makeLogRecord({
+            "name": "simpleflow.test",
+            "levelno": logging.INFO,
+            "levelname": "INFO",
+            "msg": "hello %s",
+            "args": ("world",),
+            "created": 1.5,
+        })
+        line = JsonFormatter().format(record)
+        expect(line).to_not.contain("\n")
+        expect(line).to_not.contain(", ")
+        data = json.loads(line)
+        expect(data["message"]).to.equal("hello world")
+        expect(data["level"]).to.equal("INFO")
+        expect(data["time"]).to.equal(1.5)
+        expect(data["workflow_id"]).to.equal("wf")
+
+
+class TestBackgroundHandler(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger("simpleflow.test_background")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.target = ListHandler()
+        self.handler = BackgroundHandler([self.target])
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        logging_context.reset()
+
+    def test_records_are_handled_in_a_thread(self):
+        logging_context.set("activity_id", "1")
+        self.logger.info("message %d", 1)
+        logging_context.set("activity_id", "2")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("failed")
+        self.handler.stop()
+
+        expect([r.getMessage() for r in self.target.records]).to.equal(["message 1", "failed"])
+        expect(self.target.threads).to.equal({"simpleflow-logging"})
+        # context as of the logging call
+        expect(self.target.records[0].context).to.equal({"activity_id": "1"})
+        expect(self.target.records[1].exc_text).to.contain("ValueError: boom")
+
+    def test_restarted_after_fork(self):
+        self.logger.info("parent")
+        pid = os.fork()
+        if pid == 0:
+            self.logger.info("child")
+            self.handler.stop()
+            # records queued before the fork are emitted by the parent
+            os._exit(0 if self.target.records[-1].getMessage() == "child" else 1)
+        _, status = os.waitpid(pid, 0)
+        self.handler.stop()
+        expect(status).to.equal(0)
+        expect([r.getMessage() for r in self.target.records]).to.equal(["parent"])
+
+    def test_handler_locks_reset_after_fork(self):
+        self.logger.info("parent")
+        self.target.acquire()  # as if held by the thread, mid-emit
+        try:
+            pid = os.fork()
+            if pid == 0:
+                self.logger.info("child")
+                self.handler.stop()
+                os._exit(0)
+            deadline = time.time() + 10
+            while True:
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done or time.time() > deadline:
+                    break
+                time.sleep(0.01)
+            if not done:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+        finally:
+            self.target.release()
+        self.handler.stop()
+        expect(done).to.equal(pid)
+        expect(status).to.equal(0)
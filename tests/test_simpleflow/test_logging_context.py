@@ -41,3 +41,14 @@ class TestProcessContext(unittest.TestCase):
         ctx.reset()
         expect(ctx.get("workflow_id")).to.equal("")
         expect(ctx.get("task_list")).to.equal("")
+
+    def test_environ(self):
+        ctx.set("workflow_id", "foo-bar")
+        env = ctx.environ()
+        expect(env["_SWF_CONTEXT_WORKFLOW_ID"]).to.equal("foo-bar")
+        expect(env["_SWF_CONTEXT_TASK_LIST"]).to.equal("")
+        expect(env).to.have.key("PATH")
+
+        ctx.reset()
+        ctx._load(env)
+        expect(ctx.snapshot()).to.equal({"workflow_id": "foo-bar"})
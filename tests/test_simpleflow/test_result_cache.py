@@ -0,0 +1,90 @@
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+
+import boto
+from mock import patch
+
+from simpleflow import activity, format
+from simpleflow.result_cache import (
+    DiskResultCache,
+    S3ResultCache,
+    get_result_cache,
+    get_ttl,
+    make_key,
+    store_result,
+)
+from tests.moto_compat import mock_s3
+
+
+@activity.with_attributes(version='1', cacheable=True, cache_ttl=60)
+def double(x):
+    return x * 2
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = DiskResultCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_make_key(self):
+        key = make_key(double, (2,), {})
+        self.assertTrue(key.startswith('tests.test_simpleflow.test_result_cache.double/'))
+        self.assertEqual(key, make_key(double, [2], {}))
+        self.assertNotEqual(key, make_key(double, (3,), {}))
+        with patch.object(double, 'version', '2'):
+            self.assertNotEqual(key, make_key(double, (2,), {}))
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get('a/b'))
+        self.cache.set('a/b', '{"x": 1}')
+        self.assertEqual('{"x": 1}', self.cache.get('a/b'))
+        self.assertEqual('{"x": 1}', self.cache.get('a/b', ttl=60))
+
+    def test_expired(self):
+        with patch('time.time', return_value=1000.):
+            self.cache.set('a/b', '4')
+        with patch('time.time', return_value=1100.):
+            self.assertIsNone(self.cache.get('a/b', ttl=60))
+            self.assertEqual('4', self.cache.get('a/b'))
+
+    def test_store_result(self):
+        store_result(double, (2,), {}, 4, cache=self.cache)
+        store_result(double, (3,), {}, format.EncodedJSON('6'), cache=self.cache)
+        self.assertEqual('4', self.cache.get(make_key(double, (2,), {})))
+        self.assertEqual('6', self.cache.get(make_key(double, (3,), {})))
+
+    def test_get_ttl(self):
+        self.assertEqual(60, get_ttl(double))
+        with patch.object(double, 'cache_ttl', None), \
+                patch('simpleflow.settings.SIMPLEFLOW_ACTIVITY_CACHE_TTL', 120):
+            self.assertEqual(120, get_ttl(double))
+
+    def test_get_result_cache(self):
+        with patch('simpleflow.settings.SIMPLEFLOW_ACTIVITY_CACHE', None):
+            self.assertIsNone(get_result_cache())
+        cache = get_result_cache('s3://bucket/some/prefix')
+        self.assertIsInstance(cache, S3ResultCache)
+        self.assertEqual(('bucket', 'some/prefix'), (cache.bucket, cache.prefix))
+        cache = get_result_cache('file:///tmp/results')
+        self.assertIsInstance(cache, DiskResultCache)
+        self.assertEqual('/tmp/results', cache.directory)
+
+    @mock_s3
+    def test_s3(self):
+        boto.connect_s3().create_bucket('results')
+        cache = S3ResultCache('results', 'cache/')
+        self.assertIsNone(cache.get('a/b'))
+        cache.set('a/b', '[1, 2]')
+        self.assertEqual('[1, 2]', cache.get('a/b', ttl=60))
+        keys = [key.key for key in boto.connect_s3().get_bucket('results').list()]
+        self.assertEqual(['cache/a/b'], keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 from sure import expect
 
 from simpleflow import settings
+from simpleflow.settings import base, default
 
 
 class TestSettings(unittest.TestCase):
@@ -17,3 +18,10 @@ class TestSettings(unittest.TestCase):
 
         expect(settings.FOO).to.equal("foo")
         expect(settings.BAR).to.equal("bar")
+
+    def test_boolean_setting_from_environment(self):
+        env = {"SIMPLEFLOW_ENABLE_HISTORY_ARCHIVE": "true", "METROLOGY_ASYNC_UPLOAD": "0"}
+        loaded = base.load_settings(base, env, None, default)
+
+        expect(loaded["SIMPLEFLOW_ENABLE_HISTORY_ARCHIVE"]).to.be.true
+        expect(loaded["METROLOGY_ASYNC_UPLOAD"]).to.be.false
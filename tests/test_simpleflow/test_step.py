@@ -1,14 +1,17 @@
 import json
+import os
 import unittest
 
 import boto
+import mock
 
-from simpleflow import futures, storage, task, workflow
+from simpleflow import format, futures, storage, task, workflow
 from simpleflow.activity import with_attributes
 from simpleflow.canvas import Chain
 from simpleflow.constants import HOUR, MINUTE
 from simpleflow.local import Executor
 from simpleflow.step.constants import UNKNOWN_CONTEXT
+from simpleflow.step.manifest import MANIFEST_MARKER, StepManifest
 from simpleflow.step.submittable import Step
 from simpleflow.step.tasks import GetStepsDoneTask, MarkStepDoneTask
 from simpleflow.step.utils import (get_step_force_reasons, should_force_step, step_will_run)
@@ -68,6 +71,20 @@ class MyWorkflow(workflow.Workflow, WorkflowStepMixin):
         return BUCKET
 
 
+class MyManifestWorkflow(MyWorkflow):
+    use_step_manifest = True
+
+    def run(self, num, force_steps=None):
+        self.add_forced_steps(force_steps or [], "workflow_init")
+        futures.wait(
+            self.submit(Step('my_step', task.ActivityTask(MyTask, num))),
+            self.submit(Step('my_step_2', task.ActivityTask(MyTask, num + 1))),
+        )
+
+    def get_step_path_prefix(self):
+        return 'workflow_id/steps/'
+
+
 class StepTestCase(unittest.TestCase, TestWorkflowMixin):
     WORKFLOW = MyWorkflow
 
@@ -267,3 +284,140 @@ class StepTestCase(unittest.TestCase, TestWorkflowMixin):
 
         self.assertFalse(activities.activities[0].activity.raises_on_failure)
         self.assertFalse(activities.activities[1].activity.raises_on_failure)
+
+
+class StepManifestTestCase(unittest.TestCase, TestWorkflowMixin):
+    WORKFLOW = MyManifestWorkflow
+
+    def create_bucket(self):
+        boto.connect_s3().create_bucket(BUCKET)
+
+    def get_manifest(self):
+        return StepManifest.load(BUCKET, 'workflow_id/steps.json')
+
+    def test_save_execution_steps(self):
+        with mock_s3():
+            self.create_bucket()
+            context = {'run_id': 'run/1', 'workflow_id': 'wf', 'version': '1'}
+            StepManifest.save_execution_steps(BUCKET, 'workflow_id/steps.json', context, ['a'])
+            StepManifest.save_execution_steps(BUCKET, 'workflow_id/steps.json', context, ['b'])
+            other = {'run_id': 'run2', 'workflow_id': 'wf', 'version': '1'}
+            StepManifest.save_execution_steps(BUCKET, 'workflow_id/steps.json', other, ['c'])
+
+            self.assertEqual(
+                ['workflow_id/steps.executions/run2.json', 'workflow_id/steps.executions/run_1.json'],
+                sorted(key.key for key in storage.list_keys(BUCKET, 'workflow_id/steps.executions/')),
+            )
+            manifest = self.get_manifest()
+        self.assertEqual(['a', 'b', 'c'], sorted(manifest.steps))
+        self.assertEqual(context, manifest.steps['b'])
+
+    def test_marker_details(self):
+        manifest = StepManifest({'b': {'run_id': 'run'}, 'a': {}})
+        details = manifest.to_marker_details()
+        self.assertEqual({'steps': ['a', 'b']}, details)
+        replayed = StepManifest.from_marker_details(details)
+        self.assertEqual(['a', 'b'], sorted(replayed.steps))
+
+    def test_marker_details_too_large(self):
+        manifest = StepManifest({'step-{}'.format(i): {} for i in range(10000)})
+        with mock.patch.dict(os.environ, {'SIMPLEFLOW_JUMBO_FIELDS_BUCKET': ''}):
+            with self.assertRaises(format.JumboTooLargeError):
+                manifest.to_marker_details()
+
+    @mock_s3
+    @mock_swf
+    def test_manifest_too_large_for_marker(self):
+        self.create_bucket()
+        self.build_history({"args": [2]})
+        manifest = StepManifest({'step-{}'.format(i): {} for i in range(10000)})
+        with mock.patch.dict(os.environ, {'SIMPLEFLOW_JUMBO_FIELDS_BUCKET': ''}), \
+                mock.patch.object(MyManifestWorkflow, 'load_step_manifest', return_value=manifest):
+            decisions = self.replay()
+        # the decision fails instead of reading the manifest again next time
+        self.assertEqual(['FailWorkflowExecution'], [d['decisionType'] for d in decisions])
+        reason = decisions[0]['failWorkflowExecutionDecisionAttributes']['reason']
+        self.assertIn('JumboTooLargeError', reason)
+
+    @mock_s3
+    def test_load_legacy_steps(self):
+        self.create_bucket()
+        self.assertEqual({}, StepManifest.load(BUCKET, 'workflow_id/steps.json').steps)
+
+        storage.push_content(BUCKET, 'workflow_id/steps/my_step', 'data')
+        manifest = StepManifest.load(BUCKET, 'workflow_id/steps.json', 'workflow_id/steps/')
+        self.assertEqual(['my_step'], list(manifest.steps))
+
+    @mock_s3
+    def test_local_execution(self):
+        self.create_bucket()
+        executor = Executor(MyManifestWorkflow)
+        executor.run({'args': [1]})
+
+        # No activities but the steps ones
+        self.assertEqual(2, len(executor._history.activities))
+        self.assertEqual(['my_step', 'my_step_2'], sorted(self.get_manifest().steps))
+
+        executor = Executor(MyManifestWorkflow)
+        executor.run({'args': [1], 'kwargs': {'force_steps': ['my_step_2']}})
+        self.assertEqual(1, len(executor._history.activities))
+        statuses = [
+            (marker.details['step'], marker.details['status'])
+            for marker in executor.list_markers(all=True) if marker.name == 'log.step'
+        ]
+        self.assertEqual(
+            [('my_step', 'skipped'), ('my_step_2', 'scheduled'), ('my_step_2', 'completed')],
+            statuses,
+        )
+        self.assertEqual(['my_step', 'my_step_2'], sorted(self.get_manifest().steps))
+
+    @mock_s3
+    @mock_swf
+    def test_manifest_is_read_once(self):
+        self.create_bucket()
+        storage.push_content(BUCKET, 'workflow_id/steps.json', json.dumps({
+            'version': 1,
+            'steps': {'my_step': {}},
+        }))
+
+        self.build_history({"args": [2]})
+        decisions = self.replay()
+        self.assertEqual('RecordMarker', decisions[0]['decisionType'])
+        attributes = decisions[0]['recordMarkerDecisionAttributes']
+        self.assertEqual(MANIFEST_MARKER, attributes['markerName'])
+        self.assertEqual({'steps': ['my_step']}, json.loads(attributes['details']))
+        # my_step is skipped, my_step_2 is scheduled without any GetStepsDoneTask
+        markers = [
+            (
+                d['recordMarkerDecisionAttributes']['markerName'],
+                json.loads(d['recordMarkerDecisionAttributes']['details']),
+            )
+            for d in decisions if d['decisionType'] == 'RecordMarker'
+        ]
+        self.assertEqual(['skipped', 'scheduled'], [details['status'] for _, details in markers[1:]])
+        self.assertNotIn('ScheduleActivityTask', [d['decisionType'] for d in decisions])
+
+        # Later decisions replay the marker, even if the manifest changed
+        storage.push_content(BUCKET, 'workflow_id/steps.json', json.dumps({'version': 2, 'steps': {}}))
+        self.history.add_decision_task()
+        for name, details in markers:
+            self.history.add_marker(name, details)
+        self.executor._workflow._step_manifest = None
+        decisions = self.replay()
+        self.assertEqual(1, len(decisions))
+        self.check_task_scheduled_decision(decisions[0], MyTask)
+
+        # Completing the step records the marker, and saves the steps of this
+        # execution next to the ones of the others
+        self.add_activity_task_from_decision(decisions[0], MyTask, result=6)
+        StepManifest.save_execution_steps(
+            BUCKET, 'workflow_id/steps.json', {'run_id': 'other'}, ['other_step'])
+        decisions = self.replay()
+        self.assertEqual('RecordMarker', decisions[0]['decisionType'])
+        self.assertEqual(
+            {'status': 'completed', 'step': 'my_step_2', 'forced': False, 'reasons': []},
+            json.loads(decisions[0]['recordMarkerDecisionAttributes']['details']),
+        )
+        manifest = self.get_manifest()
+        self.assertEqual(['my_step_2', 'other_step'], sorted(manifest.steps))
+        self.assertEqual('other', manifest.steps['other_step']['run_id'])
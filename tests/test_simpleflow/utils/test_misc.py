@@ -1,7 +1,10 @@
+import signal
+import threading
+import time
 import unittest
 from sure import expect
 
-from simpleflow.utils import format_exc, to_k8s_identifier
+from simpleflow.utils import TimeLimitExceeded, format_exc, time_limit, to_k8s_identifier
 
 
 class MyTestCase(unittest.TestCase):
@@ -23,5 +26,36 @@ class MyTestCase(unittest.TestCase):
             expect(to_k8s_identifier(case[0])).to.equal(case[1])
 
 
+class TestTimeLimit(unittest.TestCase):
+    def test_in_time(self):
+        handler = signal.getsignal(signal.SIGALRM)
+        with time_limit(1):
+            pass
+        expect(signal.getsignal(signal.SIGALRM)).to.equal(handler)
+        expect(signal.getitimer(signal.ITIMER_REAL)[0]).to.equal(0)
+
+    def test_interrupted(self):
+        start = time.time()
+        with self.assertRaises(TimeLimitExceeded):
+            with time_limit(0.1):
+                time.sleep(5)
+        expect(time.time() - start).to.be.lower_than(1)
+
+    def test_not_in_main_thread(self):
+        errors = []
+
+        def target():
+            try:
+                with time_limit(0.05):
+                    time.sleep(0.2)
+            except TimeLimitExceeded as err:
+                errors.append(err)
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+        expect(errors).to.have.length_of(1)
+
+
 if __name__ == '__main__':
     unittest.main()
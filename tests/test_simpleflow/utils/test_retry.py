@@ -4,6 +4,7 @@ from time import time
 
 from flaky import flaky
 
+from simpleflow.utils import retry
 from simpleflow.utils.retry import with_delay, constant, exponential
 
 
@@ -101,3 +102,65 @@ class TestRetry(unittest.TestCase):
                 func()
 
         self.assertEqual(callable.count, max_count)
+
+
+@mock.patch('time.sleep')
+class TestRetryPolicies(unittest.TestCase):
+    def test_capped_exponential(self, sleep):
+        delay = retry.capped_exponential(base=1, cap=10)
+        with mock.patch('random.uniform', lambda low, high: high):
+            self.assertEqual([1, 2, 4, 8, 10, 10], [delay(n) for n in range(6)])
+
+    def test_decorrelated_jitter(self, sleep):
+        delays = retry.decorrelated_jitter(base=1, cap=20).delays()
+        with mock.patch('random.uniform', lambda low, high: high):
+            self.assertEqual([3, 9, 20, 20], [next(delays) for _ in range(4)])
+
+    def test_with_delay_uses_policy_delays(self, sleep):
+        callable = DummyCallableRaises(ValueError('test'))
+        with mock.patch('random.uniform', lambda low, high: high):
+            with self.assertRaises(ValueError):
+                with_delay(nb_times=3, delay=retry.decorrelated_jitter(base=1, cap=5))(callable)()
+        self.assertEqual([3, 5, 5], [call[0][0] for call in sleep.call_args_list])
+
+    def test_stats(self, sleep):
+        callable = DummyCallableRaises(ValueError('test'))
+        with self.assertRaises(ValueError):
+            with_delay(nb_times=3, delay=constant(1), name='test_stats')(callable)()
+        self.assertEqual(
+            {'attempts': 3, 'retries': 2, 'sleep': 3, 'giveups': 1},
+            dict(retry.stats['test_stats']),
+        )
+
+    def test_deadline(self, sleep):
+        callable = DummyCallableRaises(ValueError('test'))
+        func = with_delay(nb_times=5, delay=constant(10), name='test_deadline')(callable)
+        clock = [1000.]
+        sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        with mock.patch('time.time', lambda: clock[0]), retry.deadline(1015):
+            with self.assertRaises(ValueError):
+                func()
+        # the second retry would have slept past the deadline
+        self.assertEqual(2, callable.count)
+        self.assertEqual(1, retry.stats['test_deadline']['deadline_exceeded'])
+        self.assertIsNone(retry.current_deadline())
+
+    def test_nested_deadlines(self, sleep):
+        with retry.deadline(100):
+            with retry.deadline(200):
+                self.assertEqual(100, retry.current_deadline())
+            with retry.deadline(None):
+                self.assertEqual(100, retry.current_deadline())
+            with retry.deadline(50):
+                self.assertEqual(50, retry.current_deadline())
+
+    def test_budget(self, sleep):
+        budget = retry.RetryBudget(ratio=0.5, min_retries=1)
+        callable = DummyCallableRaises(ValueError('test'))
+        func = with_delay(nb_times=3, delay=constant(1), budget=budget, name='test_budget')(callable)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                func()
+        # 2 calls only allow 1 retry: the first call used it
+        self.assertEqual(3, callable.count)
+        self.assertEqual(2, retry.stats['test_budget']['budget_exhausted'])
@@ -331,3 +331,60 @@ class TestWorkflowExecutionQuerySet(unittest.TestCase):
         kwargs = self.weq._list_items.call_args[1]
         self.assertIsNone(kwargs["start_oldest_date"])
         self.assertIsInstance(kwargs["close_latest_date"], int)
+
+    def test_to_workflow_execution_shares_workflow_types(self):
+        infos = mock_list_closed_workflow_executions()['executionInfos'] * 2
+        first, second = [self.weq.to_WorkflowExecution(self.domain, info) for info in infos]
+        self.assertIs(first.workflow_type, second.workflow_type)
+
+    def test_get_workflow_type_is_cached(self):
+        info = mock_list_closed_workflow_executions()['executionInfos'][0]
+        with patch.object(WorkflowTypeQuerySet, 'get', return_value=self.wt) as get:
+            first = self.weq.get_workflow_type(info)
+            second = self.weq.get_workflow_type(info)
+        self.assertEqual(1, get.call_count)
+        self.assertIs(first, second)
+
+    def test_iter_filter_is_lazy(self):
+        infos = mock_list_closed_workflow_executions()['executionInfos']
+        self.weq._list_items = Mock(return_value=iter(infos))
+        executions = self.weq.iter_filter(status=WorkflowExecution.STATUS_CLOSED)
+        self.weq._list_items.assert_not_called()
+        self.assertEqual(len(infos), len(list(executions)))
+
+    def test_filter_concurrently(self):
+        oldest = int(datetime_timestamp(past_day(10)))
+        started = [oldest + i * 3600 for i in range(0, 240, 7)]
+
+        def list_items(queryset, *args, **kwargs):
+            # one execution per start time in the sub-range, newest first;
+            # bounds are inclusive, like SWF's
+            return [
+                {
+                    'execution': {'workflowId': 'wf-{}'.format(start), 'runId': 'run'},
+                    'workflowType': {'name': 'TestType', 'version': '0.1'},
+                    'startTimestamp': start,
+                }
+                for start in reversed(started)
+                if kwargs['start_oldest_date'] <= start <= kwargs['start_latest_date']
+            ]
+
+        with patch.object(WorkflowExecutionQuerySet, '_list_items', autospec=True,
+                          side_effect=list_items) as mock:
+            executions = self.weq.filter(
+                status=WorkflowExecution.STATUS_CLOSED,
+                start_oldest_date=10,
+                max_workers=3,
+            )
+
+        self.assertEqual(3 * WorkflowExecutionQuerySet.RANGES_PER_WORKER, mock.call_count)
+        self.assertEqual(
+            ['wf-{}'.format(start) for start in reversed(started)],
+            [execution.workflow_id for execution in executions],
+        )
+
+    def test_filter_concurrently_needs_open_window(self):
+        self.weq._list_items = Mock(return_value=[])
+        self.weq.filter(status=WorkflowExecution.STATUS_CLOSED,
+                        close_latest_date=5, max_workers=4)
+        self.weq._list_items.assert_called_once()
@@ -0,0 +1,86 @@
+import threading
+import unittest
+
+from mock import Mock, patch
+
+from swf.core import ConnectedSWFObject, ConnectionPool
+
+
+def new_connection(*args, **kwargs):
+    return Mock()
+
+
+@patch('boto.swf.connect_to_region', side_effect=new_connection)
+class TestConnectionPool(unittest.TestCase):
+    def test_reuse(self, connect):
+        pool = ConnectionPool()
+        first = pool.get('us-east-1')
+        self.assertIs(first, pool.get('us-east-1'))
+        self.assertIsNot(first, pool.get('eu-west-1'))
+        self.assertIsNot(first, pool.get('us-east-1', aws_access_key_id='foo'))
+        self.assertEqual(3, connect.call_count)
+        self.assertEqual({'created': 3, 'reused': 1}, dict(pool.stats))
+
+    def test_one_connection_per_thread(self, connect):
+        pool = ConnectionPool()
+        connections = [pool.get('us-east-1')]
+        thread = threading.Thread(target=lambda: connections.append(pool.get('us-east-1')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(connections[0], connections[1])
+        self.assertIs(connections[0], pool.get('us-east-1'))
+
+    def test_reuses_are_counted_by_thread(self, connect):
+        pool = ConnectionPool()
+
+        def use_pool():
+            for _ in range(3):
+                pool.get('us-east-1')
+
+        threads = [threading.Thread(target=use_pool) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        use_pool()
+        self.assertEqual({'created': 3, 'reused': 6}, dict(pool.stats))
+
+        pool.clear()
+        self.assertEqual({'created': 3, 'reused': 6}, dict(pool.stats))
+
+    def test_discard_after_fork(self, connect):
+        pool = ConnectionPool()
+        connection = pool.get('us-east-1')
+        with patch('os.getpid', return_value=pool._pid + 1):
+            self.assertIsNot(connection, pool.get('us-east-1'))
+        self.assertEqual({'created': 1, 'discarded': 1}, dict(pool.stats))
+
+    def test_invalid_region(self, connect):
+        connect.side_effect = None
+        connect.return_value = None
+        pool = ConnectionPool()
+        self.assertIsNone(pool.get('moon-1'))
+        self.assertEqual({}, dict(pool.stats))
+
+
+@patch('boto.swf.connect_to_region', side_effect=new_connection)
+class TestConnectedSWFObject(unittest.TestCase):
+    def test_pooled_connection(self, connect):
+        with patch('swf.core.connection_pool', ConnectionPool()):
+            first = ConnectedSWFObject(region='us-east-1')
+            second = ConnectedSWFObject(region='us-east-1')
+            self.assertIs(first.connection, second.connection)
+        self.assertEqual(1, connect.call_count)
+
+    def test_explicit_connection(self, connect):
+        connection = Mock()
+        obj = ConnectedSWFObject(connection=connection)
+        self.assertIs(connection, obj.connection)
+        connect.assert_not_called()
+
+    def test_invalid_region(self, connect):
+        connect.side_effect = None
+        connect.return_value = None
+        with patch('swf.core.connection_pool', ConnectionPool()):
+            with self.assertRaises(ValueError):
+                ConnectedSWFObject(region='moon-1')
@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+from swf import ratelimit
+from swf.actors import ActivityWorker
+from swf.models import Domain
+from swf.ratelimit import RateLimiter, SharedTokenBucket, TokenBucket, parse_limits
+
+
+class TestParseLimits(unittest.TestCase):
+    def test_parse_limits(self):
+        self.assertEqual({}, parse_limits(None))
+        self.assertEqual(
+            {'PollForActivityTask': (2., 10.), '*': (0.5, None)},
+            parse_limits('PollForActivityTask=2/10, *=0.5'),
+        )
+
+    def test_invalid_limits(self):
+        for value in ('PollForActivityTask:2', '*=0', '*=0.0', '*=1/0', '*=1.2.3'):
+            with self.assertRaises(ValueError):
+                parse_limits(value)
+
+
+@patch('time.time')
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_then_rate(self, time):
+        time.return_value = 1000.
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertEqual([0, 0, 0, 0.5, 1.], [bucket.take() for _ in range(5)])
+
+        # debt is paid back at `rate` tokens per second
+        time.return_value = 1001.5
+        self.assertEqual(0, bucket.take())
+        self.assertEqual(0.5, bucket.take())
+
+    def test_capacity(self, time):
+        time.return_value = 1000.
+        bucket = TokenBucket(rate=1, capacity=2)
+        time.return_value = 2000.
+        self.assertEqual([0, 0, 1.], [bucket.take() for _ in range(3)])
+
+    def test_shared(self, time):
+        time.return_value = 1000.
+        directory = tempfile.mkdtemp()
+        try:
+            path = '{}/bucket'.format(directory)
+            first = SharedTokenBucket(path, rate=1, capacity=2)
+            second = SharedTokenBucket(path, rate=1, capacity=2)
+            self.assertEqual([0, 0, 1.], [first.take(), second.take(), first.take()])
+        finally:
+            shutil.rmtree(directory)
+
+
+@patch('time.sleep')
+class TestRateLimiter(unittest.TestCase):
+    def test_unlimited(self, sleep):
+        limiter = RateLimiter({'PollForActivityTask': (1, 1)})
+        self.assertIsNone(limiter.bucket('RecordActivityTaskHeartbeat', 'domain'))
+        self.assertEqual(0, limiter.acquire('RecordActivityTaskHeartbeat', 'domain'))
+        self.assertEqual({}, limiter.stats)
+
+    def test_buckets_by_api_and_domain(self, sleep):
+        limiter = RateLimiter({'*': (1, 1)})
+        self.assertIs(limiter.bucket('PollForActivityTask', 'a'), limiter.bucket('PollForActivityTask', 'a'))
+        self.assertIsNot(limiter.bucket('PollForActivityTask', 'a'), limiter.bucket('PollForActivityTask', 'b'))
+        self.assertIsNot(limiter.bucket('PollForActivityTask', 'a'), limiter.bucket('PollForDecisionTask', 'a'))
+
+    def test_throttled(self, sleep):
+        limiter = RateLimiter({'PollForActivityTask': (0.001, 1)})
+        limiter.acquire('PollForActivityTask', 'domain')
+        sleep.assert_not_called()
+        limiter.acquire('PollForActivityTask', 'domain')
+        sleep.assert_called_once()
+        stats = limiter.stats['PollForActivityTask']
+        self.assertEqual(2, stats['calls'])
+        self.assertEqual(1, stats['throttled'])
+        self.assertAlmostEqual(1000, stats['wait'], places=0)
+
+    @patch('swf.ratelimit.logger')
+    def test_stats_are_logged_periodically(self, logger, sleep):
+        limiter = RateLimiter({'PollForActivityTask': (1, 1)}, log_interval=60)
+        limiter.acquire('PollForActivityTask', 'domain')
+        logger.info.assert_not_called()
+
+        limiter._logged_at -= 60
+        limiter.acquire('PollForActivityTask', 'domain')
+        logger.info.assert_called_once_with('rate limits: PollForActivityTask calls=2 throttled=1 wait=1.000s')
+        limiter.acquire('PollForActivityTask', 'domain')
+        logger.info.assert_called_once()
+
+
+class TestConfiguration(unittest.TestCase):
+    def setUp(self):
+        ratelimit._rate_limiter = None
+
+    def tearDown(self):
+        ratelimit._rate_limiter = None
+
+    @patch.dict('os.environ', {'SWF_RATE_LIMITS': '*=5', 'SWF_RATE_LIMITS_LOG_INTERVAL': '0'})
+    def test_from_env(self):
+        limiter = ratelimit.get_rate_limiter()
+        self.assertEqual({'*': (5., None)}, limiter.limits)
+        self.assertEqual(0, limiter.log_interval)
+        self.assertIs(limiter, ratelimit.get_rate_limiter())
+
+    @patch.dict('os.environ', {'SWF_RATE_LIMITS': 'PollForActivityTask:5'})
+    def test_invalid_configuration_fails_actor_creation(self):
+        with self.assertRaisesRegexp(ValueError, 'SWF_RATE_LIMITS='):
+            ActivityWorker(Domain('domain', connection=Mock()), 'task-list')
+
+
+class TestActorThrottling(unittest.TestCase):
+    def test_worker_calls_are_throttled(self):
+        worker = ActivityWorker(Domain('domain', connection=Mock()), 'task-list')
+        worker.connection = Mock()
+        worker.rate_limiter = Mock()
+        worker.heartbeat('token')
+        worker.rate_limiter.acquire.assert_called_once_with('RecordActivityTaskHeartbeat', 'domain')
@@ -1,7 +1,7 @@
 import os
 import unittest
 
-from swf.core import ConnectedSWFObject
+from swf.core import ConnectedSWFObject, connection_pool
 from swf.settings import from_env, clear
 
 AWS_ENV_KEYS = (
@@ -17,6 +17,8 @@ class TestSettings(unittest.TestCase):
         for key in AWS_ENV_KEYS:
             self.oldies[key] = os.environ.get(key)
             os.environ.pop(key, None)
+        # Credentials from the environment are resolved when connecting
+        connection_pool.clear()
 
     def tearDown(self):
         for key in AWS_ENV_KEYS:
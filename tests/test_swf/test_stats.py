@@ -1,5 +1,8 @@
 from __future__ import absolute_import
 
+import mock
+import pytest
+
 from simpleflow.constants import HOUR, MINUTE
 from swf.models.history import builder
 
@@ -8,7 +11,7 @@ from simpleflow import (
     activity,
 )
 from simpleflow.history import History
-from simpleflow.swf.stats import WorkflowStats
+from simpleflow.swf.stats import WorkflowStats, base
 
 
 @activity.with_attributes(version='test')
@@ -78,3 +81,52 @@ def test_last_state_times():
     TIMING_PERCENTAGE = -1
     percentage = (timings[TIMING_TOTAL_TIME] / total_time) * 100.
     assert percentage == timings[TIMING_PERCENTAGE]
+
+
+def build_history(states):
+    history_builder = builder.History(ATestWorkflow)
+    for i, state in enumerate(states):
+        history_builder.add_activity_task(
+            increment,
+            decision_id=0,
+            last_state=state,
+            activity_id='activity-{}'.format(i),
+        )
+    return history_builder
+
+
+def build_stats(states):
+    return WorkflowStats(History(build_history(states)))
+
+
+def test_top():
+    stats = build_stats(['completed', 'scheduled', 'failed', 'completed'])
+    durations = stats.durations()
+
+    top = stats.top()
+    assert sorted(top) == [0, 2, 3]
+    assert [durations[i] for i in top] == sorted((durations[i] for i in top), reverse=True)
+    assert stats.top(2) == top[:2]
+
+    timings = stats.get_timings_with_percentage()
+    assert timings[1] is None
+    assert timings[0][-2] == durations[0]
+
+
+@pytest.mark.skipif(base.numpy is None, reason='numpy is not installed')
+def test_vectorized_matches_python_fallback():
+    history_builder = build_history(['completed', 'scheduled', 'failed', 'completed', 'timed_out', 'started'])
+    vectorized = WorkflowStats(History(history_builder))
+    with mock.patch.object(base, 'numpy', None):
+        fallback = WorkflowStats(History(history_builder))
+        expected_timings = fallback.get_timings_with_percentage()
+        expected_top = fallback.top()
+        expected_aggregate = fallback.timings.aggregate()
+
+    assert vectorized.get_timings_with_percentage() == expected_timings
+    assert vectorized.top() == expected_top
+    [row] = vectorized.timings.aggregate()
+    [expected_row] = expected_aggregate
+    for key in ('queue_time', 'run_time'):
+        assert list(row.pop(key).values()) == pytest.approx(list(expected_row.pop(key).values()))
+    assert row == expected_row